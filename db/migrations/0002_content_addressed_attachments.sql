@@ -0,0 +1,56 @@
+-- Attachment data is stored once per distinct content (keyed by its SHA-256).
+-- attachment rows keep the name and path and point to the shared blob.
+CREATE TABLE IF NOT EXISTS attachment_blob (
+    blob_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO attachment_blob (sha256, size, data)
+SELECT sha256(data), length(data), data
+FROM attachment;
+
+ALTER TABLE attachment ADD COLUMN blob_id INTEGER REFERENCES attachment_blob(blob_id);
+
+UPDATE attachment
+SET blob_id = (
+    SELECT b.blob_id
+    FROM attachment_blob b
+    WHERE b.sha256 = sha256(attachment.data)
+);
+
+UPDATE attachment_blob
+SET ref_count = (
+    SELECT COUNT(*)
+    FROM attachment a
+    WHERE a.blob_id = attachment_blob.blob_id
+);
+
+ALTER TABLE attachment DROP COLUMN data;
+
+CREATE INDEX IF NOT EXISTS idx_attachment_blob_id ON attachment(blob_id);
+
+-- ref_count is the number of attachment rows using the blob, unused blobs are deleted
+CREATE TRIGGER IF NOT EXISTS trg_attachment_blob_ref_insert
+AFTER INSERT ON attachment
+BEGIN
+    UPDATE attachment_blob SET ref_count = ref_count + 1 WHERE blob_id = NEW.blob_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_attachment_blob_ref_delete
+AFTER DELETE ON attachment
+BEGIN
+    UPDATE attachment_blob SET ref_count = ref_count - 1 WHERE blob_id = OLD.blob_id;
+    DELETE FROM attachment_blob WHERE blob_id = OLD.blob_id AND ref_count <= 0;
+END;
+
+-- every insert creates its own attachment row, it goes away with its last link
+CREATE TRIGGER IF NOT EXISTS trg_email_attachment_unlink
+AFTER DELETE ON email_attachment
+BEGIN
+    DELETE FROM attachment
+    WHERE attachment_id = OLD.attachment_id
+        AND NOT EXISTS (SELECT 1 FROM email_attachment WHERE attachment_id = OLD.attachment_id);
+END;
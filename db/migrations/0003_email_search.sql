@@ -0,0 +1,50 @@
+-- Full-text index of the emails, rowid = email.email_id.
+-- sender holds the sender's name and address, so it's searchable too.
+CREATE VIRTUAL TABLE IF NOT EXISTS email_fts USING fts5(
+    subject,
+    body,
+    sender,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+INSERT INTO email_fts(rowid, subject, body, sender)
+SELECT e.email_id, e.subject, e.body, trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+FROM email e
+JOIN user u ON u.user_id = e.sender_id;
+
+CREATE INDEX IF NOT EXISTS idx_email_sender_id ON email(sender_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_email_fts_insert
+AFTER INSERT ON email
+BEGIN
+    INSERT INTO email_fts(rowid, subject, body, sender)
+    SELECT NEW.email_id, NEW.subject, NEW.body, trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+    FROM user u
+    WHERE u.user_id = NEW.sender_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_fts_update
+AFTER UPDATE OF subject, body, sender_id ON email
+BEGIN
+    DELETE FROM email_fts WHERE rowid = OLD.email_id;
+
+    INSERT INTO email_fts(rowid, subject, body, sender)
+    SELECT NEW.email_id, NEW.subject, NEW.body, trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+    FROM user u
+    WHERE u.user_id = NEW.sender_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_fts_delete
+AFTER DELETE ON email
+BEGIN
+    DELETE FROM email_fts WHERE rowid = OLD.email_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_fts_sender_update
+AFTER UPDATE OF email, first_name, last_name ON user
+BEGIN
+    UPDATE email_fts
+    SET sender = trim(coalesce(NEW.first_name, '') || ' ' || coalesce(NEW.last_name, '') || ' ' || NEW.email)
+    WHERE rowid IN (SELECT email_id FROM email WHERE sender_id = NEW.user_id);
+END;
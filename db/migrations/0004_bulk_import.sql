@@ -0,0 +1,17 @@
+-- Has a row only inside a bulk import transaction (see Database.insert_parsed_emails).
+-- The row triggers skip their work then, the importer does it once per batch.
+CREATE TABLE IF NOT EXISTS bulk_import (
+    active INTEGER PRIMARY KEY CHECK (active = 1)
+);
+
+DROP TRIGGER IF EXISTS trg_email_fts_insert;
+
+CREATE TRIGGER trg_email_fts_insert
+AFTER INSERT ON email
+WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+BEGIN
+    INSERT INTO email_fts(rowid, subject, body, sender)
+    SELECT NEW.email_id, NEW.subject, NEW.body, trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+    FROM user u
+    WHERE u.user_id = NEW.sender_id;
+END;
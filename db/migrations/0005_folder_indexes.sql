@@ -0,0 +1,43 @@
+-- Composite indexes serving every folder query in index order (no sort step).
+-- Sent and Drafts: sender_id = ? AND status = ? ORDER BY sent_at DESC, email_id DESC
+-- (email_id is the rowid, every index ends with it).
+CREATE INDEX IF NOT EXISTS idx_email_sender_status_sent_at ON email(sender_id, status, sent_at);
+
+-- All Mail: ORDER BY sent_at DESC, email_id DESC
+CREATE INDEX IF NOT EXISTS idx_email_sent_at ON email(sent_at);
+
+-- The sender prefix of the composite index covers the sender lookups.
+DROP INDEX IF EXISTS idx_email_sender_id;
+
+-- Inbox: the recipient's emails are ordered by the email's sent_at, a column of
+-- the other table, so it's copied into email_recipient to get an index order.
+ALTER TABLE email_recipient ADD COLUMN sent_at TIMESTAMP;
+
+UPDATE email_recipient
+SET sent_at = (SELECT e.sent_at FROM email e WHERE e.email_id = email_recipient.email_id);
+
+CREATE INDEX IF NOT EXISTS idx_email_recipient_recipient_sent_at ON email_recipient(recipient_id, sent_at, email_id);
+
+-- The recipient prefix of the new index covers the recipient lookups.
+DROP INDEX IF EXISTS idx_email_recipient_recepient_id;
+
+-- Rows inserted without sent_at (the importer sets it) take it from their email.
+CREATE TRIGGER IF NOT EXISTS trg_email_recipient_sent_at_insert
+AFTER INSERT ON email_recipient
+WHEN NEW.sent_at IS NULL
+BEGIN
+    UPDATE email_recipient
+    SET sent_at = (SELECT e.sent_at FROM email e WHERE e.email_id = NEW.email_id)
+    WHERE email_id = NEW.email_id AND recipient_id = NEW.recipient_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_recipient_sent_at_update
+AFTER UPDATE OF sent_at ON email
+BEGIN
+    UPDATE email_recipient
+    SET sent_at = NEW.sent_at
+    WHERE email_id = NEW.email_id;
+END;
+
+-- Attachments looked up by their file path.
+CREATE INDEX IF NOT EXISTS idx_attachment_filepath ON attachment(filepath);
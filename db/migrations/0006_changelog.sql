@@ -0,0 +1,59 @@
+-- Change data capture: every write to the tables the views list appends (seq, table, op, id).
+-- The views read the changes after the sequence number they've seen (Database.fetch_changes_since)
+-- and apply only those, instead of listing the folder again.
+-- Row ids are email ids, except for the user table (user ids).
+CREATE TABLE IF NOT EXISTS changelog (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+    row_id INTEGER NOT NULL
+);
+
+-- Keeps the last 10000 changes, a view that's further behind lists its folder again.
+CREATE TRIGGER IF NOT EXISTS trg_changelog_prune
+AFTER INSERT ON changelog
+WHEN NEW.seq % 1000 = 0
+BEGIN
+    DELETE FROM changelog WHERE seq <= NEW.seq - 10000;
+END;
+
+-- A bulk import appends the changes of its batch at once (see Database.insert_parsed_emails).
+CREATE TRIGGER IF NOT EXISTS trg_email_changelog_insert
+AFTER INSERT ON email
+WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+BEGIN
+    INSERT INTO changelog(table_name, op, row_id) VALUES ('email', 'insert', NEW.email_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_changelog_update
+AFTER UPDATE ON email
+BEGIN
+    INSERT INTO changelog(table_name, op, row_id) VALUES ('email', 'update', NEW.email_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_changelog_delete
+AFTER DELETE ON email
+BEGIN
+    INSERT INTO changelog(table_name, op, row_id) VALUES ('email', 'delete', OLD.email_id);
+END;
+
+-- recipients decide which emails are in the Inbox
+CREATE TRIGGER IF NOT EXISTS trg_email_recipient_changelog_insert
+AFTER INSERT ON email_recipient
+WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+BEGIN
+    INSERT INTO changelog(table_name, op, row_id) VALUES ('email_recipient', 'insert', NEW.email_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_recipient_changelog_delete
+AFTER DELETE ON email_recipient
+BEGIN
+    INSERT INTO changelog(table_name, op, row_id) VALUES ('email_recipient', 'delete', OLD.email_id);
+END;
+
+-- the cards show the sender's name and address
+CREATE TRIGGER IF NOT EXISTS trg_user_changelog_update
+AFTER UPDATE OF email, first_name, last_name ON user
+BEGIN
+    INSERT INTO changelog(table_name, op, row_id) VALUES ('user', 'update', NEW.user_id);
+END;
@@ -0,0 +1,110 @@
+-- Email counts of the folders, kept up to date by triggers, so a folder total is a key lookup
+-- instead of a COUNT(*) over the folder (see Database.fetch_folder_counts).
+--   role 'sender':    emails sent by user_id (Sent and Drafts by status)
+--   role 'recipient': emails received by user_id (Inbox)
+--   role 'all':       every email, user_id is 0 (All Mail)
+-- A recipient is counted only while its email exists, so the counts don't depend
+-- on whether the email or its recipients are deleted first.
+CREATE TABLE IF NOT EXISTS folder_count (
+    user_id INTEGER NOT NULL,
+    role TEXT NOT NULL CHECK (role IN ('sender', 'recipient', 'all')),
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, role, status)
+) WITHOUT ROWID;
+
+INSERT INTO folder_count(user_id, role, status, count)
+SELECT sender_id, 'sender', status, count(*) FROM email GROUP BY sender_id, status;
+
+INSERT INTO folder_count(user_id, role, status, count)
+SELECT 0, 'all', status, count(*) FROM email GROUP BY status;
+
+INSERT INTO folder_count(user_id, role, status, count)
+SELECT er.recipient_id, 'recipient', e.status, count(*)
+FROM email_recipient er
+JOIN email e ON e.email_id = er.email_id
+GROUP BY er.recipient_id, e.status;
+
+-- A bulk import counts its batch at once (see Database.insert_parsed_emails).
+CREATE TRIGGER IF NOT EXISTS trg_folder_count_email_insert
+AFTER INSERT ON email
+WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+BEGIN
+    INSERT INTO folder_count(user_id, role, status, count)
+    VALUES (NEW.sender_id, 'sender', NEW.status, 1), (0, 'all', NEW.status, 1)
+    ON CONFLICT (user_id, role, status) DO UPDATE SET count = count + 1;
+
+    -- recipients inserted before their email
+    INSERT INTO folder_count(user_id, role, status, count)
+    SELECT recipient_id, 'recipient', NEW.status, 1
+    FROM email_recipient
+    WHERE email_id = NEW.email_id
+    ON CONFLICT (user_id, role, status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_folder_count_email_delete
+AFTER DELETE ON email
+BEGIN
+    UPDATE folder_count
+    SET count = count - 1
+    WHERE status = OLD.status
+      AND ((user_id = OLD.sender_id AND role = 'sender') OR (user_id = 0 AND role = 'all'));
+
+    UPDATE folder_count
+    SET count = count - 1
+    WHERE role = 'recipient'
+      AND status = OLD.status
+      AND user_id IN (SELECT recipient_id FROM email_recipient WHERE email_id = OLD.email_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_folder_count_email_update
+AFTER UPDATE OF sender_id, status ON email
+WHEN OLD.sender_id IS NOT NEW.sender_id OR OLD.status IS NOT NEW.status
+BEGIN
+    UPDATE folder_count
+    SET count = count - 1
+    WHERE status = OLD.status
+      AND ((user_id = OLD.sender_id AND role = 'sender') OR (user_id = 0 AND role = 'all'));
+
+    INSERT INTO folder_count(user_id, role, status, count)
+    VALUES (NEW.sender_id, 'sender', NEW.status, 1), (0, 'all', NEW.status, 1)
+    ON CONFLICT (user_id, role, status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_folder_count_email_status_update
+AFTER UPDATE OF status ON email
+WHEN OLD.status IS NOT NEW.status
+BEGIN
+    UPDATE folder_count
+    SET count = count - 1
+    WHERE role = 'recipient'
+      AND status = OLD.status
+      AND user_id IN (SELECT recipient_id FROM email_recipient WHERE email_id = NEW.email_id);
+
+    INSERT INTO folder_count(user_id, role, status, count)
+    SELECT recipient_id, 'recipient', NEW.status, 1
+    FROM email_recipient
+    WHERE email_id = NEW.email_id
+    ON CONFLICT (user_id, role, status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_folder_count_recipient_insert
+AFTER INSERT ON email_recipient
+WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+BEGIN
+    INSERT INTO folder_count(user_id, role, status, count)
+    SELECT NEW.recipient_id, 'recipient', status, 1
+    FROM email
+    WHERE email_id = NEW.email_id
+    ON CONFLICT (user_id, role, status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_folder_count_recipient_delete
+AFTER DELETE ON email_recipient
+BEGIN
+    UPDATE folder_count
+    SET count = count - 1
+    WHERE user_id = OLD.recipient_id
+      AND role = 'recipient'
+      AND status = (SELECT status FROM email WHERE email_id = OLD.email_id);
+END;
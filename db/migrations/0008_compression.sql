@@ -0,0 +1,33 @@
+-- Large bodies are stored compressed (a BLOB starting with a format marker), the
+-- decompress() function returns the text of either form, see src/compression.py.
+-- The existing bodies are kept as they are, they're compressed when rewritten.
+
+-- NULL for the raw data, otherwise how the data is compressed ('zlib').
+-- size and sha256 stay those of the raw data, so deduplication is unchanged.
+ALTER TABLE attachment_blob ADD COLUMN encoding TEXT;
+
+-- the search index keeps the plain text
+DROP TRIGGER IF EXISTS trg_email_fts_insert;
+
+CREATE TRIGGER trg_email_fts_insert
+AFTER INSERT ON email
+WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+BEGIN
+    INSERT INTO email_fts(rowid, subject, body, sender)
+    SELECT NEW.email_id, NEW.subject, decompress(NEW.body), trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+    FROM user u
+    WHERE u.user_id = NEW.sender_id;
+END;
+
+DROP TRIGGER IF EXISTS trg_email_fts_update;
+
+CREATE TRIGGER trg_email_fts_update
+AFTER UPDATE OF subject, body, sender_id ON email
+BEGIN
+    DELETE FROM email_fts WHERE rowid = OLD.email_id;
+
+    INSERT INTO email_fts(rowid, subject, body, sender)
+    SELECT NEW.email_id, NEW.subject, decompress(NEW.body), trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+    FROM user u
+    WHERE u.user_id = NEW.sender_id;
+END;
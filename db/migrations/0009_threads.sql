@@ -0,0 +1,147 @@
+-- Conversations. An email joins the thread of the email it replies to (in_reply_to),
+-- otherwise the thread of the latest email with its normalized subject (see normalize_subject
+-- in database.py) sent at most 30 days before it that has two participants (sender or
+-- recipients) in common with it, otherwise it starts a new one (THREAD_WINDOW_DAYS and
+-- THREAD_SHARED_PARTICIPANTS in database.py). The thread is assigned by Database.insert_email
+-- and the bulk import, the triggers below keep the message count and the latest message, so
+-- the threaded list is read in the order of idx_thread_last_sent_at.
+CREATE TABLE IF NOT EXISTS thread (
+    thread_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subject_key TEXT,  -- NULL for the threads of emails without a subject
+    email_count INTEGER NOT NULL DEFAULT 0,
+    last_email_id INTEGER,
+    last_sent_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_thread_last_sent_at ON thread(last_sent_at, last_email_id);
+-- the recent threads of a subject, the candidates an email may join
+CREATE INDEX IF NOT EXISTS idx_thread_subject_key ON thread(subject_key, last_sent_at);
+
+ALTER TABLE email ADD COLUMN thread_id INTEGER REFERENCES thread(thread_id);
+ALTER TABLE email ADD COLUMN in_reply_to INTEGER REFERENCES email(email_id);
+
+-- backfill, the existing emails are threaded by the rule above in the order they were sent
+CREATE TEMP TABLE thread_subject AS
+SELECT email_id, sent_at, nullif(normalize_subject(subject), '') AS subject_key
+FROM email;
+
+CREATE INDEX temp.idx_thread_subject ON thread_subject(subject_key, sent_at, email_id);
+
+CREATE TEMP TABLE thread_participant (email_id INTEGER, user_id INTEGER, PRIMARY KEY (email_id, user_id)) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO thread_participant
+SELECT email_id, sender_id FROM email
+UNION
+SELECT email_id, recipient_id FROM email_recipient;
+
+-- the email each one joins the thread of, NULL for the first of a thread
+CREATE TEMP TABLE thread_anchor AS
+SELECT s.email_id, (
+    SELECT a.email_id
+    FROM thread_subject a
+    WHERE a.subject_key = s.subject_key
+        AND a.sent_at >= datetime(s.sent_at, '-30 days')
+        AND (a.sent_at, a.email_id) < (s.sent_at, s.email_id)
+        AND (
+            SELECT count(*)
+            FROM thread_participant p
+            JOIN thread_participant q ON q.user_id = p.user_id
+            WHERE p.email_id = s.email_id AND q.email_id = a.email_id
+        ) >= 2
+    ORDER BY a.sent_at DESC, a.email_id DESC
+    LIMIT 1
+) AS anchor_id
+FROM thread_subject s;
+
+-- the first email of the thread of each email
+CREATE TEMP TABLE thread_root AS
+WITH RECURSIVE root(email_id, root_id) AS (
+    SELECT email_id, email_id FROM thread_anchor WHERE anchor_id IS NULL
+    UNION ALL
+    SELECT a.email_id, r.root_id FROM thread_anchor a JOIN root r ON a.anchor_id = r.email_id
+)
+SELECT email_id, root_id FROM root;
+
+-- a thread per first email, last_email_id links them until the counts below
+INSERT INTO thread(subject_key, last_email_id)
+SELECT s.subject_key, s.email_id
+FROM thread_subject s
+JOIN thread_anchor a ON a.email_id = s.email_id
+WHERE a.anchor_id IS NULL
+ORDER BY s.sent_at, s.email_id;
+
+UPDATE email
+SET thread_id = t.thread_id
+FROM thread_root r
+JOIN thread t ON t.last_email_id = r.root_id
+WHERE r.email_id = email.email_id;
+
+DROP TABLE thread_root;
+DROP TABLE thread_anchor;
+DROP TABLE thread_participant;
+DROP TABLE thread_subject;
+
+-- after the backfill, so the index serves the counts below
+CREATE INDEX IF NOT EXISTS idx_email_thread_id ON email(thread_id, sent_at, email_id);
+
+UPDATE thread
+SET email_count = (SELECT count(*) FROM email WHERE thread_id = thread.thread_id),
+    (last_sent_at, last_email_id) = (
+        SELECT sent_at, email_id
+        FROM email
+        WHERE thread_id = thread.thread_id
+        ORDER BY sent_at DESC, email_id DESC
+        LIMIT 1
+    );
+
+-- A bulk import counts its batch at once (see Database.insert_parsed_emails).
+CREATE TRIGGER IF NOT EXISTS trg_thread_email_insert
+AFTER INSERT ON email
+WHEN NEW.thread_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM bulk_import)
+BEGIN
+    UPDATE thread
+    SET email_count = email_count + 1,
+        (last_sent_at, last_email_id) = (
+            SELECT sent_at, email_id
+            FROM email
+            WHERE thread_id = NEW.thread_id
+            ORDER BY sent_at DESC, email_id DESC
+            LIMIT 1
+        )
+    WHERE thread_id = NEW.thread_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_thread_email_delete
+AFTER DELETE ON email
+WHEN OLD.thread_id IS NOT NULL
+BEGIN
+    UPDATE thread
+    SET email_count = email_count - 1,
+        (last_sent_at, last_email_id) = (
+            SELECT sent_at, email_id
+            FROM email
+            WHERE thread_id = OLD.thread_id
+            ORDER BY sent_at DESC, email_id DESC
+            LIMIT 1
+        )
+    WHERE thread_id = OLD.thread_id;
+
+    DELETE FROM thread WHERE thread_id = OLD.thread_id AND email_count = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_thread_email_update
+AFTER UPDATE OF thread_id, sent_at ON email
+BEGIN
+    UPDATE thread
+    SET email_count = email_count + (thread_id = NEW.thread_id) - (thread_id = OLD.thread_id),
+        (last_sent_at, last_email_id) = (
+            SELECT sent_at, email_id
+            FROM email
+            WHERE thread_id = thread.thread_id
+            ORDER BY sent_at DESC, email_id DESC
+            LIMIT 1
+        )
+    WHERE thread_id IN (OLD.thread_id, NEW.thread_id);
+
+    DELETE FROM thread WHERE thread_id = OLD.thread_id AND email_count = 0;
+END;
@@ -0,0 +1,7 @@
+-- Start of the body (whitespace collapsed), computed when the body is written, so the
+-- list views read EmailSummary rows (database.EMAIL_SUMMARY_COLUMNS) without the bodies.
+ALTER TABLE email ADD COLUMN snippet TEXT NOT NULL DEFAULT '';
+
+UPDATE email
+SET snippet = body_snippet(decompress(body))
+WHERE body IS NOT NULL AND body <> '';
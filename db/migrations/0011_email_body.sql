@@ -0,0 +1,65 @@
+-- The bodies move into their own table, so the scans of the email table (folders,
+-- threads, counts) don't pull them through the page cache. They're read only when
+-- an email is opened (Database.fetch_email_body).
+
+-- stored like email.body was: the text, or a compressed BLOB (see src/compression.py)
+CREATE TABLE IF NOT EXISTS email_body (
+    email_id INTEGER PRIMARY KEY,
+    body TEXT NOT NULL,
+    FOREIGN KEY (email_id) REFERENCES email(email_id) ON DELETE CASCADE
+);
+
+INSERT INTO email_body(email_id, body)
+SELECT email_id, body
+FROM email;
+
+-- the search triggers read the body of the email row, a column used by a trigger can't be dropped
+DROP TRIGGER IF EXISTS trg_email_fts_insert;
+DROP TRIGGER IF EXISTS trg_email_fts_update;
+
+ALTER TABLE email DROP COLUMN body;
+
+-- the email row is written first, the search index is filled once its body follows
+CREATE TRIGGER IF NOT EXISTS trg_email_body_fts_insert
+AFTER INSERT ON email_body
+WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+BEGIN
+    INSERT INTO email_fts(rowid, subject, body, sender)
+    SELECT e.email_id, e.subject, decompress(NEW.body), trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+    FROM email e
+    JOIN user u ON u.user_id = e.sender_id
+    WHERE e.email_id = NEW.email_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_body_fts_update
+AFTER UPDATE OF body ON email_body
+WHEN OLD.body IS NOT NEW.body
+BEGIN
+    DELETE FROM email_fts WHERE rowid = OLD.email_id;
+
+    INSERT INTO email_fts(rowid, subject, body, sender)
+    SELECT e.email_id, e.subject, decompress(NEW.body), trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+    FROM email e
+    JOIN user u ON u.user_id = e.sender_id
+    WHERE e.email_id = NEW.email_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_email_fts_update
+AFTER UPDATE OF subject, sender_id ON email
+WHEN OLD.subject IS NOT NEW.subject OR OLD.sender_id IS NOT NEW.sender_id
+BEGIN
+    DELETE FROM email_fts WHERE rowid = OLD.email_id;
+
+    INSERT INTO email_fts(rowid, subject, body, sender)
+    SELECT NEW.email_id, NEW.subject, decompress(b.body), trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+    FROM email_body b
+    JOIN user u ON u.user_id = NEW.sender_id
+    WHERE b.email_id = NEW.email_id;
+END;
+
+-- foreign keys aren't enforced, the body goes with its email by a trigger
+CREATE TRIGGER IF NOT EXISTS trg_email_body_delete
+AFTER DELETE ON email
+BEGIN
+    DELETE FROM email_body WHERE email_id = OLD.email_id;
+END;
@@ -0,0 +1,45 @@
+-- Emails older than a cutoff are moved into one SQLite file per year (schema in
+-- db/scripts/archive_schema.sql), attached only when a read reaches them (see
+-- Database.archive_emails_before). The main database keeps where they went.
+
+-- filename is relative to the directory of the main database
+CREATE TABLE IF NOT EXISTS archive (
+    year INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    email_count INTEGER NOT NULL DEFAULT 0,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- the archive of every moved email, so the preview of an archived email attaches only its year
+CREATE TABLE IF NOT EXISTS archived_email (
+    email_id INTEGER PRIMARY KEY,
+    year INTEGER NOT NULL
+);
+
+-- Archiving moves emails, it doesn't delete them: the folder pages and the search continue
+-- into the archives, so the views keep their cards. The email and recipient deletes of a
+-- moved batch aren't logged, the conversations it changed are, as ('thread', 'update' or
+-- 'delete', thread_id) rows (the conversations are those of the main database).
+
+-- Has a row only inside an archive transaction (see Database._archive_batch).
+CREATE TABLE IF NOT EXISTS archive_move (
+    active INTEGER PRIMARY KEY CHECK (active = 1)
+);
+
+DROP TRIGGER IF EXISTS trg_email_changelog_delete;
+
+CREATE TRIGGER trg_email_changelog_delete
+AFTER DELETE ON email
+WHEN NOT EXISTS (SELECT 1 FROM archive_move)
+BEGIN
+    INSERT INTO changelog(table_name, op, row_id) VALUES ('email', 'delete', OLD.email_id);
+END;
+
+DROP TRIGGER IF EXISTS trg_email_recipient_changelog_delete;
+
+CREATE TRIGGER trg_email_recipient_changelog_delete
+AFTER DELETE ON email_recipient
+WHEN NOT EXISTS (SELECT 1 FROM archive_move)
+BEGIN
+    INSERT INTO changelog(table_name, op, row_id) VALUES ('email_recipient', 'delete', OLD.email_id);
+END;
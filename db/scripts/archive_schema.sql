@@ -0,0 +1,75 @@
+-- Schema of an archive file (one per year, see Database.archive_emails_before).
+-- The tables mirror the main database, ids are kept (email_id, attachment_id), the
+-- users and the threads stay in the main database. Archives are only appended to,
+-- so only the indexes of the folder queries and the blob reference counting are kept.
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS email (
+    email_id INTEGER PRIMARY KEY,
+    sender_id INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sent_at TIMESTAMP NOT NULL,
+    thread_id INTEGER,
+    in_reply_to INTEGER,
+    snippet TEXT NOT NULL DEFAULT ''
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_sender_status_sent_at ON email(sender_id, status, sent_at);
+CREATE INDEX IF NOT EXISTS idx_email_sent_at ON email(sent_at);
+
+-- stored like in the main database (text or a compressed BLOB)
+CREATE TABLE IF NOT EXISTS email_body (
+    email_id INTEGER PRIMARY KEY,
+    body TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS email_recipient (
+    email_id INTEGER NOT NULL,
+    recipient_id INTEGER NOT NULL,
+    sent_at TIMESTAMP,
+    PRIMARY KEY (email_id, recipient_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_recipient_recipient_sent_at ON email_recipient(recipient_id, sent_at, email_id);
+
+-- the blobs of the archive get their own ids, they're matched by sha256
+CREATE TABLE IF NOT EXISTS attachment_blob (
+    blob_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    encoding TEXT
+);
+
+CREATE TABLE IF NOT EXISTS attachment (
+    attachment_id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    filepath TEXT NOT NULL,
+    create_at TIMESTAMP,
+    blob_id INTEGER NOT NULL REFERENCES attachment_blob(blob_id)
+);
+
+CREATE TABLE IF NOT EXISTS email_attachment (
+    email_id INTEGER NOT NULL,
+    attachment_id INTEGER NOT NULL,
+    PRIMARY KEY (email_id, attachment_id)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_attachment_blob_ref_insert
+AFTER INSERT ON attachment
+BEGIN
+    UPDATE attachment_blob SET ref_count = ref_count + 1 WHERE blob_id = NEW.blob_id;
+END;
+
+-- copied from the main search index, searched once the main database runs out of matches
+CREATE VIRTUAL TABLE IF NOT EXISTS email_fts USING fts5(
+    subject,
+    body,
+    sender,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+PRAGMA user_version = 1;
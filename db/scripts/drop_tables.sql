@@ -1,6 +1,16 @@
 DROP TABLE IF EXISTS user;
 DROP TABLE IF EXISTS email;
+DROP TABLE IF EXISTS email_body;
+DROP TABLE IF EXISTS email_fts;
 DROP TABLE IF EXISTS email_recipient;
 DROP TABLE IF EXISTS attachment;
+DROP TABLE IF EXISTS attachment_blob;
 DROP TABLE IF EXISTS email_attachment;
-
+DROP TABLE IF EXISTS bulk_import;
+DROP TABLE IF EXISTS changelog;
+DROP TABLE IF EXISTS folder_count;
+DROP TABLE IF EXISTS thread;
+DROP TABLE IF EXISTS archive;
+DROP TABLE IF EXISTS archived_email;
+DROP TABLE IF EXISTS archive_move;
+DROP TABLE IF EXISTS schema_version;
@@ -9,8 +9,10 @@ VALUES
     ('david.wilson@example.com', 'David', 'Wilson'),
     ('emma.taylor@example.com', 'Emma', 'Taylor');
 
--- Insert more emails  
-INSERT INTO email (sender_id, subject, body, status) 
+-- Insert more emails, each starting its own conversation (no two share a subject)
+CREATE TEMP TABLE seed_email (sender_id INTEGER, subject TEXT, snippet TEXT, status TEXT);
+
+INSERT INTO seed_email (sender_id, subject, snippet, status) 
 VALUES
     (1, 'Project Update', 'Here is the latest update on the project.', 'sent'),
     (2, 'Meeting Reminder', 'Don’t forget our meeting tomorrow.', 'sent'),
@@ -21,6 +23,30 @@ VALUES
     (1, 'Product Launch', 'Exciting news! Our product is launching soon.', 'sent'),
     (3, 'Collaboration Request', 'Would you be interested in collaborating?', 'draft');
 
+INSERT INTO thread (thread_id, subject_key)
+SELECT rowid, normalize_subject(subject)
+FROM seed_email
+ORDER BY rowid;
+
+-- the thread triggers count the emails as they're inserted
+INSERT INTO email (sender_id, subject, snippet, status, thread_id)
+SELECT s.sender_id, s.subject, s.snippet, s.status, s.rowid
+FROM seed_email s
+ORDER BY s.rowid;
+
+DROP TABLE seed_email;
+
+INSERT INTO email_body (email_id, body) 
+VALUES
+    (1, 'Here is the latest update on the project.'),
+    (2, 'Don’t forget our meeting tomorrow.'),
+    (3, 'Please find the invoice attached.'),
+    (4, 'Please review the attached weekly report.'),
+    (5, 'Following up on our last conversation.'),
+    (6, 'Scheduled team meeting for next Monday.'),
+    (7, 'Exciting news! Our product is launching soon.'),
+    (8, 'Would you be interested in collaborating?');
+
 -- Insert additional recipients (including tra0163@vsb.cz)  
 INSERT INTO email_recipient (email_id, recipient_id) 
 VALUES
@@ -36,8 +62,10 @@ VALUES
     (8, 2), -- Jane Smith receives "Collaboration Request"
     (8, 4); -- Michael Brown receives "Collaboration Request"
 
--- Insert more attachments  
-INSERT INTO attachment (filename, filepath, data) 
+-- Insert more attachments (identical contents share one attachment_blob)
+CREATE TEMP TABLE seed_attachment (filename TEXT, filepath TEXT, data BLOB);
+
+INSERT INTO seed_attachment (filename, filepath, data) 
 VALUES
     ('report.pdf', '/attachments/report.pdf', X'89504E470D0A1A0A0000'),
     ('invoice.pdf', '/attachments/invoice.pdf', X'255044462D312E350D0A25E2E3'),
@@ -48,6 +76,18 @@ VALUES
     ('agenda.pdf', '/attachments/agenda.pdf', X'505944462D312E350D0A25E2E3'),
     ('logo.png', '/attachments/logo.png', X'89504E470D0A1A0A0000');
 
+INSERT OR IGNORE INTO attachment_blob (sha256, size, data)
+SELECT sha256(data), length(data), data
+FROM seed_attachment;
+
+INSERT INTO attachment (filename, filepath, blob_id)
+SELECT s.filename, s.filepath, b.blob_id
+FROM seed_attachment s
+JOIN attachment_blob b ON b.sha256 = sha256(s.data)
+ORDER BY s.rowid;
+
+DROP TABLE seed_attachment;
+
 -- Link additional attachments to emails  
 INSERT INTO email_attachment (email_id, attachment_id) 
 VALUES
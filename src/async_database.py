@@ -0,0 +1,147 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from tkinter import Misc
+from typing import Any, Callable, Optional, TypeVar
+
+from database import Database, READ_POOL_SIZE
+from lib.logger import log
+from lib.types import Singleton
+
+
+T = TypeVar("T")
+
+ResultCallback = Callable[[Any], None]
+ErrorCallback = Callable[[BaseException], None]
+
+# how often the Tk main loop picks up finished queries
+DELIVERY_POLL_MS = 15
+
+
+class AsyncDatabase(Singleton):
+    """
+    Runs Database queries on worker threads, so a slow query doesn't freeze the window.
+
+    Every call returns a Future. The optional on_result/on_error callbacks are
+    always called on the Tk main loop (never on a worker thread), so they can
+    safely touch widgets.
+
+        AsyncDatabase().fetch_all_users(on_result=self.show_users)
+        AsyncDatabase().submit(self._fetch_inbox, on_result=self._add_emails)
+        AsyncDatabase().submit_write(Database().save_draft, draft_id, ..., on_error=self.show_error)
+    """
+
+    executor: ThreadPoolExecutor
+    write_executor: ThreadPoolExecutor
+    tk_instance: Optional[Misc]
+
+    def __init__(self):
+        # one worker per read connection, more workers would only wait for the pool
+        self.executor = ThreadPoolExecutor(max_workers=READ_POOL_SIZE, thread_name_prefix="database")
+        # a single writer, the writes wait for the writer lock here and not on a read worker
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database-writer")
+        self.tk_instance = None
+        self._main_thread: Optional[int] = None
+        self._finished: "queue.SimpleQueue[tuple[Future, Optional[ResultCallback], Optional[ErrorCallback]]]" = queue.SimpleQueue()
+        self._calls: "queue.SimpleQueue[Callable[[], None]]" = queue.SimpleQueue()
+
+    def attach(self, tk_instance: Misc):
+        """
+        Starts delivering the results on the main loop of the given Tk instance. The events
+        of transactions committed on a worker thread are published on the main loop too.
+        """
+        self.tk_instance = tk_instance
+        self._main_thread = threading.get_ident()
+        Database().event_dispatcher = self.call_on_main_loop
+        self.tk_instance.after(DELIVERY_POLL_MS, self._deliver_finished)
+
+    def submit(
+        self,
+        query: Callable[..., T],
+        *args,
+        on_result: Optional[ResultCallback] = None,
+        on_error: Optional[ErrorCallback] = None,
+        **kwargs
+    ) -> "Future[T]":
+        """Runs any callable (usually a Database method) on a worker thread."""
+        future = self.executor.submit(query, *args, **kwargs)
+        future.add_done_callback(lambda f: self._finished.put((f, on_result, on_error)))
+        return future
+
+    def submit_write(
+        self,
+        write: Callable[..., T],
+        *args,
+        on_result: Optional[ResultCallback] = None,
+        on_error: Optional[ErrorCallback] = None,
+        **kwargs
+    ) -> "Future[T]":
+        """
+        Runs a write (usually a Database method with its own transaction) on the writer
+        thread. The writes run one at a time, in the order they were submitted, so one
+        waiting for an import or a backup doesn't freeze the window.
+        """
+        future = self.write_executor.submit(write, *args, **kwargs)
+        future.add_done_callback(lambda f: self._finished.put((f, on_result, on_error)))
+        return future
+
+    def call_on_main_loop(self, callback: Callable[[], None]):
+        """Calls the callback on the Tk main loop, right away when called from it (or before attach)."""
+        if self._main_thread is None or threading.get_ident() == self._main_thread:
+            callback()
+            return
+        self._calls.put(callback)
+
+    def __getattr__(self, name: str):
+        """Async version of the Database fetch methods."""
+        if not name.startswith("fetch_"):
+            raise AttributeError(name)
+
+        query = getattr(Database(), name)
+
+        def submit_query(*args, on_result: Optional[ResultCallback] = None, on_error: Optional[ErrorCallback] = None, **kwargs):
+            return self.submit(query, *args, on_result=on_result, on_error=on_error, **kwargs)
+
+        return submit_query
+
+    def _deliver_finished(self):
+        # the events of a write are queued before its result
+        while True:
+            try:
+                callback = self._calls.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                callback()
+            except Exception as e:
+                log.exception(f"Call on the main loop failed: {e!r}")
+
+        while True:
+            try:
+                future, on_result, on_error = self._finished.get_nowait()
+            except queue.Empty:
+                break
+
+            if future.cancelled():
+                continue
+
+            error = future.exception()
+            try:
+                if error is None:
+                    if on_result:
+                        on_result(future.result())
+                elif on_error:
+                    on_error(error)
+                else:
+                    log.error(f"Database query failed: {error!r}")
+            except Exception as e:
+                log.exception(f"Callback of a database query failed: {e!r}")
+
+        assert self.tk_instance
+        self.tk_instance.after(DELIVERY_POLL_MS, self._deliver_finished)
+
+    def shutdown(self):
+        """Drops the pending reads, the submitted writes are finished."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.write_executor.shutdown(wait=True)
@@ -0,0 +1,168 @@
+"""
+Online backups of the mailbox.
+
+The live database is copied into a snapshot file by the SQLite backup API a few
+pages per step (see Database.backup_to), on a worker thread, so the window and the
+writes go on during the copy. The last snapshots are kept in db/backup/ next to the
+main database, the older ones are removed.
+
+    python3 ./src/dev.py backup
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Optional
+
+from debug import BACKUP_KEEP
+from lib.logger import log
+from lib.types import Singleton
+
+if TYPE_CHECKING:
+    # imported where it's used, the database is opened on import
+    from database import Database
+
+
+# snapshots are kept in this directory next to the main database
+BACKUP_DIRECTORY = "backup"
+
+# microseconds, so two backups in the same second get their own snapshots
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+# a snapshot is written under this suffix and renamed once complete
+PARTIAL_SUFFIX = ".part"
+
+
+@dataclass
+class BackupProgress:
+    pages_copied: int
+    total_pages: int
+    elapsed_seconds: float
+
+    @property
+    def fraction(self) -> float:
+        return self.pages_copied / self.total_pages if self.total_pages else 0.0
+
+
+ProgressCallback = Callable[[BackupProgress], None]
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+def backup_directory(db: "Database") -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db.db_file)), BACKUP_DIRECTORY)
+
+
+def snapshot_paths(db: "Database") -> list[str]:
+    """Complete snapshots of the database, oldest first."""
+    directory = backup_directory(db)
+    if not os.path.isdir(directory):
+        return []
+
+    prefix = os.path.splitext(os.path.basename(db.db_file))[0] + "-"
+    # the timestamps in the names sort like the times
+    names = sorted(n for n in os.listdir(directory) if n.startswith(prefix) and n.endswith(".db"))
+    return [os.path.join(directory, n) for n in names]
+
+
+def backup_database(db: "Database", keep: int = BACKUP_KEEP, on_progress: Optional[ProgressCallback] = None) -> str:
+    """
+    Copies the database into a new snapshot (db/backup/emails-20240131-235959-123456.db) and
+    removes all but the last keep snapshots. Returns the path of the new snapshot.
+    """
+    if keep < 1:
+        raise ValueError(f"At least one snapshot must be kept, not {keep}.")
+
+    directory = backup_directory(db)
+    os.makedirs(directory, exist_ok=True)
+
+    name = os.path.splitext(os.path.basename(db.db_file))[0]
+    path = os.path.join(directory, f"{name}-{datetime.now().strftime(SNAPSHOT_TIME_FORMAT)}.db")
+    partial_path = path + PARTIAL_SUFFIX
+    # the clock may not have moved since the last backup, a snapshot is never replaced
+    if os.path.exists(path):
+        raise FileExistsError(f"The snapshot '{path}' already exists.")
+
+    start = time.perf_counter()
+
+    def progress(pages_copied: int, total_pages: int):
+        if on_progress:
+            on_progress(BackupProgress(pages_copied, total_pages, time.perf_counter() - start))
+
+    try:
+        db.backup_to(partial_path, on_progress=progress)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    for old_path in snapshot_paths(db)[:-keep]:
+        os.remove(old_path)
+
+    log.debug(f"Backed up '{db.db_file}' into '{path}' in {time.perf_counter() - start:.1f} s")
+    return path
+
+
+class BackupService(Singleton):
+    """
+    Runs the backups on their own worker thread, one at a time, so a long copy
+    doesn't take a worker of AsyncDatabase. The progress of the running backup is
+    kept in 'progress' for the window to poll, the result is in the returned Future.
+
+        future = BackupService().start()
+        ...
+        BackupService().progress  # BackupProgress or None
+    """
+
+    executor: ThreadPoolExecutor
+    progress: Optional[BackupProgress]
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        self.progress = None
+        self._running: Optional["Future[str]"] = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    def is_running(self) -> bool:
+        return self._running is not None and not self._running.done()
+
+    def start(self, keep: int = BACKUP_KEEP, on_progress: Optional[ProgressCallback] = None) -> "Future[str]":
+        """
+        Starts a backup, or returns the running one. on_progress is called on the
+        worker thread, use 'progress' to show it in the window.
+        """
+        from database import Database
+
+        with self._lock:
+            if self._running is not None and self.is_running():
+                return self._running
+
+            self.progress = None
+            self._cancel.clear()
+
+            def set_progress(progress: BackupProgress):
+                # raised out of the copy step, the backup API stops and the partial file is removed
+                if self._cancel.is_set():
+                    raise BackupCancelled()
+                self.progress = progress
+                if on_progress:
+                    on_progress(progress)
+
+            self._running = self.executor.submit(backup_database, Database(), keep, set_progress)
+            return self._running
+
+    def cancel(self):
+        """Stops the running backup after its current step, its Future fails with BackupCancelled."""
+        self._cancel.set()
+
+    def shutdown(self):
+        """Cancels the running backup and waits for it to clean up."""
+        self.cancel()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,654 @@
+"""
+Benchmarks run by 'python3 ./src/dev.py bench <name>'.
+
+Each benchmark prints its measurements and returns False if the expectation it checks failed.
+"""
+
+import gc
+import mailbox
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, fields, make_dataclass
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from database import Database
+from debug import DEFAULT_LOGGED_IN_EMAIL
+from mailbox_generator import BODY_WORDS, WORDS
+import database
+from query_profiler import FullTableScanError, full_scans_of, temp_sorts_of
+from row_factory import rows_of
+from compression import decode_body
+from models import EmailModel, EmailStatus, EmailSummary, Folder, UserModel
+
+
+class StatementCounter:
+    """Trace callback counting the SELECT statements executed."""
+
+    def __init__(self):
+        self.selects = 0
+
+    def __call__(self, statement: str):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.selects += 1
+
+    def reset(self):
+        self.selects = 0
+
+
+def seed_benchmark_mailbox(db: Database, email_count: int, user_count: int = 50, seed: int = 0):
+    """Fills the database with emails sent to and from the logged-in user."""
+    rnd = random.Random(seed)
+
+    with db.transaction():
+        me = db.insert_users([DEFAULT_LOGGED_IN_EMAIL])[0]
+        others = db.insert_users([f"user{i}@example.com" for i in range(user_count)])
+
+        for i in range(email_count):
+            if rnd.random() < 0.6:
+                sender, recipients, status = rnd.choice(others), [me], EmailStatus.SENT
+            else:
+                sender, recipients = me, rnd.sample(others, rnd.randint(1, 3))
+                status = EmailStatus.DRAFT if rnd.random() < 0.2 else EmailStatus.SENT
+
+            subject = f"Benchmark email {i} " + " ".join(rnd.choices(WORDS, k=3))
+            body = " ".join(rnd.choices(BODY_WORDS, k=40))
+            email = db.insert_email(sender.user_id, subject, body, status=status)
+            db.insert_email_recipients(email.email_id, [r.user_id for r in recipients])
+
+
+def bench_folder_queries(db: Database, email_count: int = 2000, page_sizes=(10, 50, 200)) -> bool:
+    """Query count of loading one folder page must not depend on the page size."""
+    seed_benchmark_mailbox(db, email_count)
+
+    user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+    assert user
+
+    counter = StatementCounter()
+    db.set_trace_callback(counter)
+
+    ok = True
+    print(f"{'folder':<12}{'page size':>10}{'rows':>8}{'queries':>9}{'ms':>9}")
+
+    for folder in Folder:
+        for page_size in page_sizes:
+            counter.reset()
+            start = time.perf_counter()
+            rows = db.fetch_folder_page(folder, user.user_id, None, page_size)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            print(f"{folder:<12}{page_size:>10}{len(rows):>8}{counter.selects:>9}{elapsed_ms:>9.2f}")
+            ok = ok and counter.selects == 1
+
+    # for comparison, the per-email sender lookup the views used to do
+    print("\nper-email sender lookup (N+1):")
+    for page_size in page_sizes:
+        emails = [email for _, email in db.fetch_folder_page(Folder.ALL, user.user_id, None, page_size)]
+        # the identity map would serve the senders without a query
+        db.users.clear()
+        counter.reset()
+        for email in emails:
+            db.fetch_user_by_id(email.sender_id)
+        print(f"{'all_mail':<12}{page_size:>10}{'':>8}{counter.selects:>9}")
+
+    db.set_trace_callback(None)
+
+    print("\nOK: one query per page" if ok else "\nFAILED: query count depends on the page size")
+    return ok
+
+
+def bench_search(db: Database, email_count: int = 50_000, max_first_page_ms: float = 50.0) -> bool:
+    """First page of a search must come back within tens of milliseconds."""
+    seed_benchmark_mailbox(db, email_count)
+
+    user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+    assert user
+
+    searches = ["invoice", "inv", "budget review", "project deadline launch", "word42", "user7", "no-such-word"]
+
+    ok = True
+    print(f"{'folder':<12}{'search':<26}{'rows':>6}{'ms':>9}")
+
+    for folder in Folder:
+        for text in searches:
+            start = time.perf_counter()
+            rows = db.fetch_folder_search_page(folder, user.user_id, text, 0, database.DEFAULT_PAGE_SIZE)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            print(f"{folder:<12}{text:<26}{len(rows):>6}{elapsed_ms:>9.2f}")
+            ok = ok and elapsed_ms <= max_first_page_ms
+
+    print(f"\nOK: every first page under {max_first_page_ms} ms" if ok else f"\nFAILED: a first page took over {max_first_page_ms} ms")
+    return ok
+
+
+def bench_user_lookups(db: Database, email_count: int = 2000, rounds: int = 5) -> bool:
+    """Repeated sender lookups must be served by the user identity map, not by SQL."""
+    seed_benchmark_mailbox(db, email_count)
+    emails = db.fetch_all_email()
+    sender_ids = [email.sender_id for email in emails]
+
+    counter = StatementCounter()
+    db.set_trace_callback(counter)
+    db.users.clear()
+
+    print(f"{'round':<8}{'lookups':>9}{'queries':>9}{'ms':>9}")
+    queries_per_round = []
+    for i in range(rounds):
+        counter.reset()
+        start = time.perf_counter()
+        for sender_id in sender_ids:
+            db.fetch_user_by_id(sender_id)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{i + 1:<8}{len(sender_ids):>9}{counter.selects:>9}{elapsed_ms:>9.2f}")
+        queries_per_round.append(counter.selects)
+
+    db.set_trace_callback(None)
+
+    # the first round reads every distinct sender once, the others are all hits
+    ok = queries_per_round[0] <= len(set(sender_ids)) and all(q == 0 for q in queries_per_round[1:])
+    print("\nOK: repeated lookups hit the identity map" if ok else "\nFAILED: repeated lookups reached the database")
+    return ok
+
+
+def write_benchmark_mbox(path: str, message_count: int, user_count: int = 500, seed: int = 0):
+    """Generates an mbox of plain messages, every 20th with a small attachment."""
+    rnd = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    box = mailbox.mbox(path)
+    box.lock()
+    try:
+        for i in range(message_count):
+            message = EmailMessage()
+            message["From"] = f"User {i % user_count} <user{rnd.randrange(user_count)}@example.com>"
+            message["To"] = ", ".join(f"user{rnd.randrange(user_count)}@example.com" for _ in range(rnd.randint(1, 3)))
+            message["Subject"] = f"Imported {i} " + " ".join(rnd.choices(WORDS, k=3))
+            message["Date"] = format_datetime(start + timedelta(minutes=i))
+            message.set_content(" ".join(rnd.choices(BODY_WORDS, k=40)))
+            if i % 20 == 0:
+                message.add_attachment(f"report {i % 50}".encode(), maintype="application", subtype="octet-stream", filename=f"report{i % 50}.txt")
+            box.add(message)
+        box.flush()
+    finally:
+        box.unlock()
+        box.close()
+
+
+def bench_import(
+    db: Database,
+    message_count: int = 20_000,
+    min_writer_messages_per_second: float = 5_000.0,
+) -> bool:
+    """
+    Import of an mbox. The end-to-end rate (parsing in a process pool, batched writes)
+    depends on the CPU count and is only reported. The writer (insert_parsed_emails on
+    already parsed batches) must stay well above the one email at a time path (about
+    1k msg/s on a single slow core, where the writer makes 7-9k msg/s). Most of its time
+    is the search index with its prefix indexes, then the email and recipient rows.
+    """
+    import importer
+
+    path = os.path.join(tempfile.mkdtemp(prefix="email-client-mbox-"), "bench.mbox")
+    write_benchmark_mbox(path, message_count)
+    print(f"mbox of {message_count} messages: {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+    def on_progress(p):
+        print(f"{p.messages_read:>9} read {p.imported:>9} imported {p.messages_per_second:>9.0f} msg/s")
+
+    progress = importer.import_mailbox(db, path, on_progress=on_progress)
+
+    counts = db.conn.execute("SELECT (SELECT COUNT(*) FROM email), (SELECT COUNT(*) FROM user), (SELECT COUNT(*) FROM attachment_blob)").fetchone()
+    print(f"\nemails {counts[0]}, users {counts[1]}, distinct attachments {counts[2]}")
+    print(f"end to end: {progress.messages_per_second:.0f} msg/s")
+
+    # the same messages again, parsed up front so only the writer is timed
+    parsed = [p for p in importer.parse_messages(list(importer.iter_raw_messages(path))) if p is not None]
+    user_ids: dict[str, int] = {}
+    imported = 0
+    start = time.perf_counter()
+    for i in range(0, len(parsed), importer.WRITE_BATCH_SIZE):
+        imported += len(db.insert_parsed_emails(parsed[i:i + importer.WRITE_BATCH_SIZE], user_ids))
+    writer_rate = imported / (time.perf_counter() - start)
+    print(f"writer: {writer_rate:.0f} msg/s in batches of {importer.WRITE_BATCH_SIZE}")
+
+    ok = progress.imported == message_count and imported == message_count and writer_rate >= min_writer_messages_per_second
+    print(f"\nOK: the writer imports {writer_rate:.0f} msg/s" if ok else f"\nFAILED: {progress.imported} + {imported} imported, the writer at {writer_rate:.0f} msg/s (at least {min_writer_messages_per_second:.0f})")
+    return ok
+
+
+def bench_model_memory(db: Database, email_count: int = 100_000) -> bool:
+    """
+    Bytes per loaded email: slotted models from the row factory against dataclasses with a __dict__
+    built by splatting, and against the bare row tuples. Most of the bytes are the column values
+    every form shares, so the objects themselves are measured too (built from rows already loaded).
+    """
+    from mailbox_generator import MailboxSpec, generate_mailbox
+
+    generate_mailbox(db, MailboxSpec(emails=email_count, attachment_share=0))
+
+    # EmailModel as it was before the models were slotted
+    DictEmailModel = make_dataclass("DictEmailModel", [(f.name, f.type) for f in fields(EmailModel)])
+
+    def load_rows():
+        return db.conn.execute("SELECT * FROM email").fetchall()
+
+    def load_dict_models():
+        return [DictEmailModel(*row) for row in load_rows()]
+
+    def measure(load) -> tuple[float, float]:
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        emails = load()
+        elapsed = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(emails) == email_count
+        return size / email_count, elapsed * 1000
+
+    print(f"{email_count} emails")
+    print(f"{'loaded as':<28}{'bytes/email':>12}{'ms':>9}")
+    rows_bytes, rows_ms = measure(load_rows)
+    print(f"{'row tuples':<28}{rows_bytes:>12.0f}{rows_ms:>9.0f}")
+    dict_bytes, dict_ms = measure(load_dict_models)
+    print(f"{'dataclass + __dict__':<28}{dict_bytes:>12.0f}{dict_ms:>9.0f}")
+    slotted_bytes, slotted_ms = measure(db.fetch_all_email)
+    print(f"{'slotted, row factory':<28}{slotted_bytes:>12.0f}{slotted_ms:>9.0f}")
+
+    def load_summaries():
+        with db._reader(row_factory=rows_of(EmailSummary)) as cursor:
+            cursor.execute(f"SELECT {database.EMAIL_SUMMARY_COLUMNS} FROM email e")
+            return cursor.fetchall()
+
+    # what the list views load; the body is in email_body, so it has the columns of EmailModel
+    summary_bytes, summary_ms = measure(load_summaries)
+    print(f"{'summaries (list views)':<28}{summary_bytes:>12.0f}{summary_ms:>9.0f}")
+
+    # the objects alone, their values are held by the rows
+    rows = load_rows()
+    dict_object_bytes, _ = measure(lambda: [DictEmailModel(*row) for row in rows])
+    slotted_object_bytes, _ = measure(lambda: [EmailModel(*row) for row in rows])
+    del rows
+    print(f"\n{'objects only':<28}{'bytes/email':>12}")
+    print(f"{'dataclass + __dict__':<28}{dict_object_bytes:>12.0f}")
+    print(f"{'slotted':<28}{slotted_object_bytes:>12.0f}")
+    values_share = (slotted_bytes - slotted_object_bytes) / slotted_bytes
+    print(f"the column values are about {values_share:.0%} of a loaded email")
+
+    # the row factory builds the models without a tuple per row and the slots without a dict per model
+    problems = []
+    if slotted_bytes > rows_bytes:
+        problems.append("the slotted models cost more than the bare rows")
+    if slotted_object_bytes >= dict_object_bytes:
+        problems.append("the slotted objects are no smaller than the dataclasses with a __dict__")
+
+    ok = not problems
+    print(
+        f"\nOK: {dict_object_bytes - slotted_object_bytes:.0f} bytes less per model object, "
+        f"{rows_bytes - slotted_bytes:.0f} bytes less per email than the row tuples" if ok
+        else "\nFAILED: " + "; ".join(problems)
+    )
+    return ok
+
+
+def bench_compression(db: Database, email_count: int = 20_000, max_stored_share: float = 0.75) -> bool:
+    """Stored size of the bodies against their text, and the cost of decompressing them on read."""
+    from mailbox_generator import MailboxSpec, generate_mailbox
+
+    generate_mailbox(db, MailboxSpec(emails=email_count, attachment_share=0))
+
+    compressed, text_bytes, stored_bytes = db.conn.execute("""
+        SELECT count(*) FILTER (WHERE typeof(body) = 'blob'),
+               sum(length(CAST(decompress(body) AS BLOB))),
+               sum(length(CAST(body AS BLOB)))
+        FROM email_body
+    """).fetchone()
+
+    stored_bodies = [row[0] for row in db.conn.execute("SELECT body FROM email_body")]
+    start = time.perf_counter()
+    for stored in stored_bodies:
+        decode_body(stored)
+    decode_ms = (time.perf_counter() - start) * 1000
+
+    share = stored_bytes / text_bytes
+    print(f"{email_count} emails, {compressed} bodies compressed")
+    print(f"body text {text_bytes / 1024 / 1024:.1f} MiB, stored {stored_bytes / 1024 / 1024:.1f} MiB ({share:.0%})")
+    print(f"decoding every body: {decode_ms:.0f} ms ({decode_ms * 1000 / email_count:.1f} us per email)")
+
+    ok = share <= max_stored_share
+    print("\nOK" if ok else f"\nFAILED: the stored bodies take more than {max_stored_share:.0%} of the text")
+    return ok
+
+
+def bench_archive(db: Database, email_count: int = 20_000, hot_years: int = 2) -> bool:
+    """
+    Archives all but the last years of a generated mailbox, then reads through the archives
+    with the strict profiler: the folders list the same emails in the same order, the searches
+    find the same emails, the preview of an archived email is complete and the counts don't change.
+    The move logs no email deletes and leaves no conversation without emails.
+    """
+    from mailbox_generator import MailboxSpec, generate_mailbox
+
+    spec = MailboxSpec(emails=email_count)
+    generate_mailbox(db, spec)
+    user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+    assert user
+
+    cutoff = (spec.end_date - timedelta(days=365 * hot_years)).strftime("%Y-%m-%d %H:%M:%S")
+    searches = ["invoice", "word42"]
+
+    def list_folder(folder: Folder) -> list[int]:
+        email_ids, cursor = [], None
+        while rows := db.fetch_folder_page(folder, user.user_id, cursor):
+            email_ids += [email.email_id for _, email in rows]
+            cursor = database.page_cursor_of(rows[-1][1])
+        return email_ids
+
+    def search_folder(folder: Folder, text: str) -> set[int]:
+        email_ids, offset = [], 0
+        while rows := db.fetch_folder_search_page(folder, user.user_id, text, offset):
+            email_ids += [email.email_id for _, email in rows]
+            offset += len(rows)
+        assert len(email_ids) == len(set(email_ids)), "a search page repeated an email"
+        return set(email_ids)
+
+    def preview(email_id: int) -> tuple:
+        metas = db.fetch_attachment_metas_by_email_id(email_id)
+        return (
+            db.fetch_email_body(email_id),
+            sorted(u.email for u in db.fetch_recipients_by_email_id(email_id)),
+            sorted((m.attachment_id, m.filename, m.size) for m in metas),
+            sorted(b"".join(db.read_attachment_chunks(m.attachment_id)) for m in metas),
+        )
+
+    listed = {folder: list_folder(folder) for folder in Folder}
+    found = {(folder, text): search_folder(folder, text) for folder in Folder for text in searches}
+    counts = db.fetch_folder_counts(user.user_id)
+    row = db.conn.execute("""
+        SELECT ea.email_id
+        FROM email_attachment ea
+        JOIN email e ON e.email_id = ea.email_id
+        WHERE e.sent_at < ? AND e.status <> ?
+        LIMIT 1
+    """, (cutoff, EmailStatus.DRAFT)).fetchone()
+    previewed = {email_id: preview(email_id) for email_id in ([row[0]] if row else [])}
+
+    last_seq = db.fetch_last_change_seq()
+    start = time.perf_counter()
+    archived = db.archive_emails_before(cutoff)
+    elapsed = time.perf_counter() - start
+    kept = db.conn.execute("SELECT count(*) FROM email").fetchone()[0]
+    # a move, the views must not take the archived emails for deleted ones
+    logged_deletes = db.conn.execute("""
+        SELECT count(*)
+        FROM changelog
+        WHERE seq > ? AND table_name IN ('email', 'email_recipient') AND op = 'delete'
+    """, (last_seq, )).fetchone()[0]
+    empty_threads = db.conn.execute("SELECT count(*) FROM thread WHERE email_count = 0").fetchone()[0]
+
+    print(f"{email_count} emails, archived {archived} sent before {cutoff} in {elapsed:.1f} s ({archived / elapsed:.0f} emails/s), {kept} kept")
+    for archive in db.fetch_archives():
+        print(f"{archive.year}  {archive.email_count:>7} emails  {archive.filename}")
+
+    problems = []
+    profiler = db.enable_profiling(strict=True, allow_full_scan=FULL_SCAN_QUERIES)
+    try:
+        print(f"\n{'folder':<12}{'first page ms':>14}")
+        for folder in Folder:
+            start = time.perf_counter()
+            db.fetch_folder_page(folder, user.user_id)
+            print(f"{folder:<12}{(time.perf_counter() - start) * 1000:>14.2f}")
+
+        for folder in Folder:
+            if list_folder(folder) != listed[folder]:
+                problems.append(f"{folder} lists other emails")
+            for text in searches:
+                if search_folder(folder, text) != found[folder, text]:
+                    problems.append(f"searching '{text}' in {folder} finds other emails")
+        for email_id, expected in previewed.items():
+            if preview(email_id) != expected:
+                problems.append(f"the preview of the archived email {email_id} differs")
+        if db.fetch_folder_counts(user.user_id) != counts:
+            problems.append("the folder counts changed")
+        if logged_deletes:
+            problems.append(f"{logged_deletes} email deletes were logged")
+        if empty_threads:
+            problems.append(f"{empty_threads} conversations were left without emails")
+    except FullTableScanError as e:
+        problems.append(str(e))
+    finally:
+        db.disable_profiling()
+
+    ok = archived > 0 and not problems
+    print("\nOK: the archived emails read the same" if ok else "\nFAILED: " + ("; ".join(problems) or "nothing was archived"))
+    return ok
+
+
+def bench_backup(db: Database, email_count: int = 20_000, step_delay_ms: float = 20.0, max_write_ms: float = 500.0) -> bool:
+    """
+    Backs up a generated mailbox on the backup worker (each step delayed like on a slow disk)
+    while the main thread keeps writing and reading. The writes must not wait for the copy,
+    the copy must not restart because of them, and the snapshot holds the mailbox as it
+    was when the backup started.
+    """
+    import sqlite3
+    from backup import BackupProgress, BackupService
+    from mailbox_generator import MailboxSpec, generate_mailbox
+
+    generate_mailbox(db, MailboxSpec(emails=email_count))
+    user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+    assert user
+    emails_before = db.conn.execute("SELECT count(*) FROM email").fetchone()[0]
+
+    steps: list[BackupProgress] = []
+
+    def on_progress(progress: BackupProgress):
+        steps.append(progress)
+        time.sleep(step_delay_ms / 1000)
+
+    future = BackupService().start(on_progress=on_progress)
+
+    write_ms, read_ms = [], []
+    while not future.done():
+        start = time.perf_counter()
+        db.insert_email(user.user_id, "written during the backup", " ".join(BODY_WORDS[:50]))
+        write_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        db.fetch_folder_page(Folder.INBOX, user.user_id)
+        read_ms.append((time.perf_counter() - start) * 1000)
+
+    path = future.result()
+    snapshot = sqlite3.connect(path)
+    try:
+        snapshot_emails = snapshot.execute("SELECT count(*) FROM email").fetchone()[0]
+        integrity = snapshot.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        snapshot.close()
+
+    last = steps[-1]
+    print(f"{email_count} emails, {last.total_pages} pages backed up in {len(steps)} steps, {last.elapsed_seconds:.1f} s")
+    print(f"{len(write_ms)} writes during the backup, slowest {max(write_ms):.1f} ms; slowest first inbox page {max(read_ms):.1f} ms")
+    print(f"snapshot: {snapshot_emails} emails (mailbox had {emails_before}), integrity {integrity}, '{path}'")
+
+    problems = []
+    if any(a.pages_copied > b.pages_copied for a, b in zip(steps, steps[1:])):
+        problems.append("the copy restarted")
+    if snapshot_emails != emails_before:
+        problems.append("the snapshot isn't the mailbox as it was when the backup started")
+    if integrity != "ok":
+        problems.append(f"the snapshot is damaged ({integrity})")
+    if max(write_ms) > max_write_ms:
+        problems.append(f"a write waited {max(write_ms):.1f} ms (limit {max_write_ms} ms)")
+
+    ok = bool(write_ms) and not problems
+    print("\nOK: the mailbox was written during the backup" if ok else "\nFAILED: " + ("; ".join(problems) or "no write ran during the backup"))
+    return ok
+
+
+# reads that list whole tables on purpose
+FULL_SCAN_QUERIES = ("fetch_all_users", "fetch_all_email", "fetch_archives")
+
+
+def run_hot_queries(db: Database, pages: int = 3):
+    """The reads the views run while browsing: folder pages, searches and the preview."""
+    user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+    assert user
+
+    for folder in Folder:
+        cursor = None
+        for _ in range(pages):
+            rows = db.fetch_folder_page(folder, user.user_id, cursor)
+            if not rows:
+                break
+            cursor = database.page_cursor_of(rows[-1][1])
+
+            email_ids = [email.email_id for _, email in rows]
+            db.fetch_folder_emails_by_ids(folder, user.user_id, email_ids[:5])
+            for email_id in email_ids[:5]:
+                db.fetch_email_with_sender(email_id)
+                db.fetch_recipients_by_email_id(email_id)
+                db.fetch_attachment_metas_by_email_id(email_id)
+
+        for text in ("invoice", "budget review"):
+            db.fetch_folder_search_page(folder, user.user_id, text)
+            db.fetch_folder_emails_by_ids(folder, user.user_id, [1, 2, 3], search_text=text)
+
+    db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+    db.fetch_user_by_id(user.user_id)
+
+
+def profile_hot_queries(db: Database, strict: bool = False, json_path: str | None = None, email_count: int = 5000) -> bool:
+    """Profiles the hot queries. In strict mode a full table scan in any of them fails."""
+    seed_benchmark_mailbox(db, email_count)
+
+    profiler = db.enable_profiling(strict=strict, allow_full_scan=FULL_SCAN_QUERIES)
+    ok = True
+    try:
+        run_hot_queries(db)
+    except FullTableScanError as e:
+        print(f"FAILED: {e}\n")
+        ok = False
+    finally:
+        db.disable_profiling()
+
+    print(f"{'query':<36}{'calls':>7}{'rows':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}  full scans")
+    for r in profiler.report():
+        print(f"{r['name']:<36}{r['calls']:>7}{r['rows']:>8}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['max_ms']:>9.2f}  {', '.join(r['full_scans'])}")
+
+    if json_path:
+        profiler.dump_json(json_path)
+        print(f"\nReport written to '{json_path}'")
+
+    return ok
+
+
+@dataclass
+class PlanCase:
+    query: str  # the fetch_* method
+    run: Callable[[Database, UserModel], Any]
+    # the query sorts a few rows picked by id or ranks them, it has no index order to follow
+    may_sort: bool = False
+
+
+# a cursor older than anything in the mailbox, so the paged queries plan their keyset condition
+OLD_CURSOR = ("2000-01-01 00:00:00", 1)
+
+PLAN_CASES = [
+    PlanCase("fetch_all_users", lambda db, me: db.fetch_all_users()),
+    PlanCase("fetch_all_email", lambda db, me: db.fetch_all_email()),
+    PlanCase("fetch_user_by_email", lambda db, me: db.fetch_user_by_email(me.email)),
+    PlanCase("fetch_user_by_id", lambda db, me: db.fetch_user_by_id(me.user_id)),
+    PlanCase("fetch_email_from_user", lambda db, me: db.fetch_email_from_user(me.user_id)),
+    PlanCase("fetch_email_by_id", lambda db, me: db.fetch_email_by_id(1)),
+    PlanCase("fetch_email_with_sender", lambda db, me: db.fetch_email_with_sender(1)),
+    PlanCase("fetch_email_body", lambda db, me: db.fetch_email_body(1)),
+    PlanCase("fetch_emails_from_user", lambda db, me: db.fetch_emails_from_user(me.user_id, EmailStatus.SENT)),
+    # without a status the sender's emails come from both the sent and the draft part of the index
+    PlanCase("fetch_emails_from_user", lambda db, me: db.fetch_emails_from_user(me.user_id), may_sort=True),
+    PlanCase("fetch_emails_for_user", lambda db, me: db.fetch_emails_for_user(me.user_id)),
+    *(
+        case
+        for folder in Folder
+        for case in (
+            PlanCase("fetch_folder_page", lambda db, me, f=folder: db.fetch_folder_page(f, me.user_id)),
+            PlanCase("fetch_folder_page", lambda db, me, f=folder: db.fetch_folder_page(f, me.user_id, OLD_CURSOR)),
+            PlanCase("fetch_folder_emails_by_ids", lambda db, me, f=folder: db.fetch_folder_emails_by_ids(f, me.user_id, [1, 2, 3]), may_sort=True),
+            PlanCase("fetch_folder_search_page", lambda db, me, f=folder: db.fetch_folder_search_page(f, me.user_id, "invoice"), may_sort=True),
+        )
+    ),
+    PlanCase("fetch_folder_counts", lambda db, me: db.fetch_folder_counts(me.user_id)),
+    PlanCase("fetch_thread_page", lambda db, me: db.fetch_thread_page()),
+    PlanCase("fetch_thread_page", lambda db, me: db.fetch_thread_page(OLD_CURSOR)),
+    PlanCase("fetch_threads_by_ids", lambda db, me: db.fetch_threads_by_ids([1, 2, 3]), may_sort=True),
+    PlanCase("fetch_thread_ids_by_email_ids", lambda db, me: db.fetch_thread_ids_by_email_ids([1, 2, 3])),
+    PlanCase("fetch_recipients_by_email_id", lambda db, me: db.fetch_recipients_by_email_id(1)),
+    PlanCase("fetch_attachments_by_email_id", lambda db, me: db.fetch_attachments_by_email_id(1)),
+    PlanCase("fetch_attachment_metas_by_email_id", lambda db, me: db.fetch_attachment_metas_by_email_id(1)),
+    PlanCase("fetch_last_change_seq", lambda db, me: db.fetch_last_change_seq()),
+    PlanCase("fetch_changes_since", lambda db, me: db.fetch_changes_since(1)),
+    PlanCase("fetch_attachments_by_filepath", lambda db, me: db.fetch_attachments_by_filepath("/tmp/report.pdf")),
+    PlanCase("fetch_archives", lambda db, me: db.fetch_archives()),
+]
+
+
+def check_query_plans(db: Database, email_count: int = 2000) -> bool:
+    """
+    Plan regression check of every fetch_* method: no full table scan (except
+    FULL_SCAN_QUERIES) and no sort step, the rows must come in index order.
+    """
+    seed_benchmark_mailbox(db, email_count)
+    me = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+    assert me
+
+    ok = True
+    unchecked = {name for name in dir(Database) if name.startswith("fetch_")} - {case.query for case in PLAN_CASES}
+    for name in sorted(unchecked):
+        print(f"FAILED: {name} has no plan case")
+        ok = False
+
+    profiler = db.enable_profiling()
+    try:
+        for case in PLAN_CASES:
+            profiler.reset()
+            # the identity map would serve the user lookups without a query
+            db.users.clear()
+            case.run(db, me)
+
+            stats = profiler.stats.get(case.query)
+            if stats is None:
+                print(f"FAILED: {case.query} ran no query")
+                ok = False
+                continue
+
+            for sql, plan in stats.plans.items():
+                problems = [] if case.query in FULL_SCAN_QUERIES else full_scans_of(plan)
+                problems += [] if case.may_sort else temp_sorts_of(plan)
+
+                print(f"{'FAILED' if problems else 'ok':<8}{case.query:<36}{' | '.join(plan)}")
+                if problems:
+                    print(f"        {'; '.join(problems)}:\n{sql.strip()}\n")
+                    ok = False
+    finally:
+        db.disable_profiling()
+
+    return ok
+
+
+BENCHMARKS = {
+    "folder-queries": bench_folder_queries,
+    "search": bench_search,
+    "user-lookups": bench_user_lookups,
+    "import": bench_import,
+    "model-memory": bench_model_memory,
+    "compression": bench_compression,
+    "archive": bench_archive,
+    "backup": bench_backup,
+}
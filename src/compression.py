@@ -0,0 +1,149 @@
+"""
+Transparent zlib compression of the email bodies and the attachment blobs.
+
+Bodies are stored as TEXT while they are small or don't compress well,
+otherwise as a BLOB of the format marker followed by the zlib stream. The
+column type tells the two apart, the marker leaves room for other formats:
+
+    stored = encode_body(text)   # str or b"zl1:" + zlib data
+    text = decode_body(stored)   # also the decompress() SQL function
+
+Attachment blobs have an encoding column instead (NULL for the raw data).
+Files that are compressed already (images, archives, office documents, ...)
+are stored raw, see should_compress_attachment.
+"""
+
+import mimetypes
+import zlib
+from typing import IO, Iterable, Iterator, Optional, Union
+
+
+# compressed bodies start with it
+BODY_ZLIB_MARKER = b"zl1:"
+
+# encoding of the compressed attachment blobs
+ATTACHMENT_ZLIB_ENCODING = "zlib"
+
+# smaller data isn't worth the decompression on read
+BODY_MIN_SIZE = 512
+ATTACHMENT_MIN_SIZE = 1024
+
+# the compressed form is kept only if it's at most this share of the original
+MAX_COMPRESSED_RATIO = 0.9
+
+COMPRESSION_LEVEL = 6
+
+# media types whose content is compressed already, by their main type or the full type
+INCOMPRESSIBLE_MAIN_TYPES = ("image", "audio", "video", "font")
+INCOMPRESSIBLE_TYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.rar",
+    "application/zstd",
+    "application/pdf",
+    "application/epub+zip",
+    "application/java-archive",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "application/vnd.oasis.opendocument.text",
+    "application/vnd.oasis.opendocument.spreadsheet",
+    "application/vnd.oasis.opendocument.presentation",
+}
+# exceptions of INCOMPRESSIBLE_MAIN_TYPES (text based formats)
+COMPRESSIBLE_TYPES = {"image/svg+xml", "image/bmp", "image/x-ms-bmp"}
+
+StoredBody = Union[str, bytes]
+
+
+def _worth_it(compressed_size: int, size: int) -> bool:
+    return compressed_size <= size * MAX_COMPRESSED_RATIO
+
+
+def encode_body(text: Optional[str]) -> Optional[StoredBody]:
+    """Stored form of the body, the text itself unless compressing it pays off."""
+    if text is None or len(text) < BODY_MIN_SIZE:
+        return text
+
+    data = text.encode("utf-8")
+    compressed = zlib.compress(data, COMPRESSION_LEVEL)
+    if not _worth_it(len(BODY_ZLIB_MARKER) + len(compressed), len(data)):
+        return text
+    return BODY_ZLIB_MARKER + compressed
+
+
+def decode_body(stored: Optional[StoredBody]) -> Optional[str]:
+    """Text of a stored body, also registered as the decompress() SQL function."""
+    if stored is None or isinstance(stored, str):
+        return stored
+    if stored.startswith(BODY_ZLIB_MARKER):
+        return zlib.decompress(stored[len(BODY_ZLIB_MARKER):]).decode("utf-8")
+    raise ValueError(f"Unknown body format {stored[:len(BODY_ZLIB_MARKER)]!r}")
+
+
+def should_compress_attachment(filename: str, size: int) -> bool:
+    """Per media type policy, guessed from the file name (unknown types are compressed)."""
+    if size < ATTACHMENT_MIN_SIZE:
+        return False
+
+    media_type, content_encoding = mimetypes.guess_type(filename, strict=False)
+    if content_encoding is not None:
+        # 'archive.tar.gz' and the like
+        return False
+    if media_type is None or media_type in COMPRESSIBLE_TYPES:
+        return True
+    if media_type in INCOMPRESSIBLE_TYPES:
+        return False
+    return media_type.partition("/")[0] not in INCOMPRESSIBLE_MAIN_TYPES
+
+
+def encode_attachment(filename: str, data: bytes) -> tuple[bytes, Optional[str]]:
+    """Stored data of the attachment and its encoding (None for the raw data)."""
+    if not should_compress_attachment(filename, len(data)):
+        return data, None
+
+    compressed = zlib.compress(data, COMPRESSION_LEVEL)
+    if not _worth_it(len(compressed), len(data)):
+        return data, None
+    return compressed, ATTACHMENT_ZLIB_ENCODING
+
+
+def compress_stream(source: IO[bytes], target: IO[bytes], chunk_size: int) -> Iterator[bytes]:
+    """Writes the compressed source into the target, yields the raw chunks as they are read (for hashing)."""
+    compressor = zlib.compressobj(COMPRESSION_LEVEL)
+    while chunk := source.read(chunk_size):
+        target.write(compressor.compress(chunk))
+        yield chunk
+    target.write(compressor.flush())
+
+
+def decode_attachment(data: Optional[bytes], encoding: Optional[str]) -> Optional[bytes]:
+    """Raw data of a stored attachment blob, also registered as the decode_attachment() SQL function."""
+    if data is None or encoding is None:
+        return data
+    if encoding == ATTACHMENT_ZLIB_ENCODING:
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown attachment encoding '{encoding}'")
+
+
+def decoded_chunks(chunks: Iterable[bytes], encoding: Optional[str], chunk_size: int) -> Iterator[bytes]:
+    """Raw data of the stored blob read in chunks, decompressed incrementally into chunks of at most chunk_size."""
+    if encoding is None:
+        yield from chunks
+        return
+    if encoding != ATTACHMENT_ZLIB_ENCODING:
+        raise ValueError(f"Unknown attachment encoding '{encoding}'")
+
+    decompressor = zlib.decompressobj()
+    for chunk in chunks:
+        while chunk:
+            if data := decompressor.decompress(chunk, chunk_size):
+                yield data
+            chunk = decompressor.unconsumed_tail
+    if data := decompressor.flush():
+        yield data
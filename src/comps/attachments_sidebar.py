@@ -7,11 +7,11 @@ from tkinterdnd2.TkinterDnD import DnDEvent
 
 from comps import email_editor, email_preview_toolbar
 from comps.component import Component
-from database import Database
+from async_database import AsyncDatabase
 from lib import event_bus as eb
 from lib.image_manager import ImageManager
 from lib.logger import log
-from models import EmailModel, EmailStatus
+from models import AttachmentMeta, EmailStatus, EmailSummary
 from stores.email_with_attachments_store import (
     AttachmentsState,
     EmailWithAttachmentsStore,
@@ -94,12 +94,16 @@ class AttachmentSidebar(Component):
         # show attachs of the current draft email in the tree
         
         email = e.data["email"]
-        assert isinstance(email, EmailModel) and email.status == EmailStatus.DRAFT
+        assert isinstance(email, EmailSummary) and email.status == EmailStatus.DRAFT
 
-        db = Database()
-        attchs = db.fetch_attachments_by_email_id(email.email_id)
+        AsyncDatabase().fetch_attachment_metas_by_email_id(
+            email.email_id,
+            on_result=lambda attchs, e=email: self._show_draft_attachments(e, attchs)
+        )
+        return False
 
-        log.info(f"Attachments of email {email}:")
+    def _show_draft_attachments(self, email: EmailSummary, attchs: list[AttachmentMeta]):
+        log.info(f"Attachments of email {email.email_id}:")
         log.info(attchs)
 
         self.tree.delete(*self.tree.get_children())
@@ -107,7 +111,6 @@ class AttachmentSidebar(Component):
             self.tree.insert("", "end", text=a.filepath)
         
         log.info("-------------------------------------------")
-        return False
 
     def _on_popup_menu_open_click(self, e: eb.Event):
         selected_ids = self.tree.selection()
@@ -1,20 +1,33 @@
 from lib.image_manager import ImageManager
 from lib import event_bus as eb
+from lib.logger import log
+from async_database import AsyncDatabase
 from comps.component import Component
+from debug import DEFAULT_LOGGED_IN_EMAIL
+from models import Folder
 from tkinter import Misc, ttk
 import tkinter as tk
+import database
 
 
 NOT_SELECTED = "notselected"
 SELECTED = "selected"
 
 
+def item_text(name: str, count: int = 0) -> str:
+    text = "  " + " ".join([n.capitalize() for n in name.split("_")])
+    return f"{text} ({count})" if count else text
+
+
 class CategoryList(Component):
     selected_item_id: int = 0
+    item_ids: dict[str, str]  # item name -> tree item id
 
     def __init__(self, parent: Misc):
         Component.__init__(self, parent, label=__name__)
 
+        self.item_ids = {}
+
         self.category_tree = ttk.Treeview(self, selectmode="browse", show="tree")
 
         tree_items = {
@@ -33,11 +46,37 @@ class CategoryList(Component):
 
         for name, (tags, icon) in tree_items.items():
             tags_with_name = (name, *tags)
-            self.category_tree.insert("", tk.END, 
-                text="  " + " ".join([n.capitalize() for n in name.split("_")]), tags=tags_with_name, 
+            self.item_ids[name] = self.category_tree.insert("", tk.END, 
+                text=item_text(name), tags=tags_with_name, 
                 image=ImageManager().get(icon))
 
         self.category_tree.bind("<<TreeviewSelect>>", self.on_category_select)
+
+        eb.bus.subscribe(database.EventNames.TRANSACTION_COMMIT, self._on_db_transaction_commit)
+        self.refresh_counts()
+
+    def _on_db_transaction_commit(self, _: eb.Event):
+        self.refresh_counts()
+        return False
+
+    def refresh_counts(self):
+        """Shows the email counts of the folders (read from the trigger-maintained folder counts)."""
+        def fetch() -> dict[Folder, int]:
+            db = database.Database()
+            user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+            assert user, "Logged-in not in the database."
+            return db.fetch_folder_counts(user.user_id)
+
+        def on_result(counts: dict[Folder, int]):
+            for folder, count in counts.items():
+                item_id = self.item_ids.get(folder.value)
+                if item_id:
+                    self.category_tree.item(item_id, text=item_text(folder.value, count))
+
+        def on_error(error: BaseException):
+            log.error(f"Failed to count the emails of the folders: {error!r}")
+
+        AsyncDatabase().submit(fetch, on_result=on_result, on_error=on_error)
        
     def on_category_select(self, e: tk.Event):
         """Update selection state and ensure persistent highlighting."""
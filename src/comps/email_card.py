@@ -1,6 +1,7 @@
 from enum import StrEnum
 from comps.component import Component
-from models import UserModel, EmailModel
+from typing import Optional
+from models import EmailSummary, ThreadModel, UserModel
 from tkinter import ttk, Misc
 from lib import event_bus as eb
 
@@ -11,13 +12,15 @@ class EventNames(StrEnum):
 
 class EmailCard(Component):
     sender: UserModel
-    email: EmailModel
+    email: EmailSummary
+    thread: Optional[ThreadModel]  # set when the card stands for the conversation of the email (its latest message)
 
-    def __init__(self, parent: Misc, sender: UserModel, email: EmailModel):
+    def __init__(self, parent: Misc, sender: UserModel, email: EmailSummary, thread: Optional[ThreadModel] = None):
         Component.__init__(self, parent, label=__name__)
 
         self.sender = sender
         self.email = email
+        self.thread = thread
 
         # sender name and email at top
         top_frame = ttk.Frame(self)
@@ -41,9 +44,16 @@ class EmailCard(Component):
         bottom_frame.grid_rowconfigure(0, weight=1)
         bottom_frame.grid_columnconfigure(0, weight=1)
 
-        subject_label = ttk.Label(bottom_frame, text=email.subject, wraplength=300, anchor="w")
+        subject = email.subject
+        if thread is not None and thread.email_count > 1:
+            subject += f" ({thread.email_count})"
+        subject_label = ttk.Label(bottom_frame, text=subject, wraplength=300, anchor="w")
         subject_label.grid(row=0, column=0, padx=(0, 10), sticky="nsew")
 
+        if email.snippet:
+            snippet_label = ttk.Label(bottom_frame, text=email.snippet, wraplength=300, anchor="w", foreground="gray")
+            snippet_label.grid(row=1, column=0, padx=(0, 10), sticky="nsew")
+
         preview_button = ttk.Button(
             bottom_frame, 
             text="Preview", 
@@ -52,7 +62,7 @@ class EmailCard(Component):
                 "email": e
             })
         )
-        preview_button.grid(row=0, column=1, padx=(10, 0), pady=10, sticky="nsew")
+        preview_button.grid(row=0, column=1, rowspan=2, padx=(10, 0), pady=10, sticky="nsew")
    
 
     def render(self):
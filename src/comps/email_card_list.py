@@ -1,25 +1,31 @@
 from enum import StrEnum
 import tkinter as tk
 from tkinter import Misc, ttk
-from typing import Literal
+from typing import Literal, Optional
 from comps.component import Component
 from database import Database
-from models import UserModel, EmailModel
+from models import ThreadModel, UserModel, EmailSummary
 from lib import event_bus as eb
+from lib.observer import Observable
 from comps.email_card import EmailCard
 
 
 CANVAS_BORDER_SIZE = 0
 
+# scrolled past this fraction of the list, the next page should be loaded
+SCROLL_NEAR_END_FRACTION = 0.9
+
 
 class EmailCardList(Component):
     cards: dict[int, EmailCard]  # key: email.email_id 
+    scrolled_near_end: Observable  # notified when the view shows the end of the list
 
     def __init__(self, parent: Misc):
         Component.__init__(self, parent, label=__name__, show_label=False, show_border=False)
 
         # member variables
         self.cards = {}
+        self.scrolled_near_end = Observable()
 
         # create a frame to hold the cards
         self.list_frame = Component(self, label="list_frame", show_border=True, show_label=False)
@@ -38,7 +44,7 @@ class EmailCardList(Component):
     
         # scrollbar
         self.canvas_scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical", command=self.list_canvas.yview)
-        self.list_canvas.configure(yscrollcommand=self.canvas_scrollbar.set)
+        self.list_canvas.configure(yscrollcommand=self._on_canvas_yscroll)
         
         # events
         self.list_canvas.bind("<Configure>", lambda _: self._resize_frame())
@@ -51,42 +57,66 @@ class EmailCardList(Component):
         self.list_frame.grid_rowconfigure(0, weight=1)
         self.list_canvas.pack(side="left", fill="both", expand=True, padx=(2,4), pady=0)
 
-    def add_card(self, sender: UserModel, email: EmailModel, index: int):
-        """Add an email card to the list. Optional index (including negative)"""
+    def add_card(self, sender: UserModel, email: EmailSummary, index: int = -1, thread: Optional[ThreadModel] = None):
+        """Add an email card to the list. Optional index (including negative, -1 appends)"""
+        self._add_card(sender, email, index, thread)
+        self._resize_frame()
+
+    def add_cards(self, rows: list[tuple[UserModel, EmailSummary]], threads: Optional[dict[int, ThreadModel]] = None):
+        """Append many cards at once, the list is resized only once. threads maps email ids to their conversations."""
+        for sender, email in rows:
+            self._add_card(sender, email, -1, threads.get(email.email_id) if threads else None)
+        self._resize_frame()
+
+    def _add_card(self, sender: UserModel, email: EmailSummary, index: int, thread: Optional[ThreadModel] = None):
         if email.email_id in self.cards:
             # raise ValueError("Email already in the email card list!")
             return
 
-        new_card = EmailCard(self.cards_frame, sender, email)
+        if index < 0:
+            index += len(self.cards) + 1
+
+        # the card packs itself at the end of the list
+        new_card = EmailCard(self.cards_frame, sender, email, thread)
+
+        if index >= len(self.cards):
+            self.cards[email.email_id] = new_card
+            return
 
         card_list = [ (key, value) for key, value in self.cards.items() ]
+        next_card = card_list[index][1]
         card_list.insert(index, (email.email_id, new_card))
         
         self.cards = { key:value for key, value in card_list } 
 
-        self._rerender()
-        self._resize_frame()
+        new_card.pack(fill="x", padx=2, pady=2, side="top", expand=False, before=next_card)
+
+    def replace_card(self, sender: UserModel, email: EmailSummary, thread: Optional[ThreadModel] = None):
+        """Rebuilds the card of the email at its position, with the new content."""
+        old_card = self.cards.get(email.email_id)
+        if old_card is None:
+            return
+
+        new_card = EmailCard(self.cards_frame, sender, email, thread)
+        new_card.pack(fill="x", padx=2, pady=2, side="top", expand=False, before=old_card)
+
+        # the dict keeps the position of an existing key
+        self.cards[email.email_id] = new_card
+        old_card.destroy()
 
     def remove_card(self, email_id: int):
         if email_id not in self.cards:
             return
 
-        self.cards.pop(email_id)
-        self._rerender()
+        self.cards.pop(email_id).destroy()
         self._resize_frame()
 
     def contains_card(self, email_id: int):
         return email_id in self.cards
     
-    def _rerender(self):
-        for _, card in self.cards.items():
-            card.pack_forget()
-            card.pack(fill="x", padx=2, pady=2, side="top", expand=False)
-
-
     def clear_all(self):
         for _, c in self.cards.items():
-            c.pack_forget()
+            c.destroy()
         self.cards = {}
         self._resize_frame()
 
@@ -131,6 +161,11 @@ class EmailCardList(Component):
         # update the canvas scroll region
         self.list_canvas.configure(scrollregion=self.list_canvas.bbox("all"))
 
+    def _on_canvas_yscroll(self, first: str, last: str):
+        self.canvas_scrollbar.set(first, last)
+        if float(last) >= SCROLL_NEAR_END_FRACTION:
+            self.scrolled_near_end.notifyObservers()
+
     def _on_mousewheel(self, _: tk.Event, amount: int): 
         """Handle mouse wheel scrolling on the the canvas"""
         self.list_canvas.yview_scroll(amount, "units")
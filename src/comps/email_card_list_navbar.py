@@ -1,5 +1,6 @@
+from typing import Callable, Optional
 from comps.component import Component
-from tkinter import Misc, ttk, StringVar, IntVar
+from tkinter import BooleanVar, Misc, ttk, StringVar, IntVar
 
 
 class EmailCardListNavbar(Component):
@@ -7,20 +8,37 @@ class EmailCardListNavbar(Component):
         super().__init__(parent, label=__name__, show_label=False, show_border=True)
 
         self.total_email_count_var = IntVar(value=0)
+        self.loaded_email_count_var = IntVar(value=0)
         self.total_email_count_string_var = StringVar(value="")
         
-        self.total_email_count_var.trace_add(
-            "write", 
-            lambda a, b, c: self.total_email_count_string_var.set(f"Email count of {self.total_email_count_var.get()}")
-        )
+        self.total_email_count_var.trace_add("write", lambda a, b, c: self._update_text())
+        self.loaded_email_count_var.trace_add("write", lambda a, b, c: self._update_text())
 
         self.total_email_count_label = ttk.Label(self, textvariable=self.total_email_count_string_var)
 
+        self.threaded_var = BooleanVar(value=False)
+        self.threads_toggle = ttk.Checkbutton(self, text="Conversations", variable=self.threaded_var)
+
     def render(self):
         self.total_email_count_label.pack()
 
-    def set_email_count(self, count: int):
-        self.total_email_count_var.set(count)
+    def show_threads_toggle(self, on_toggle: Callable[[bool], None]):
+        """Shows the switch between listing the emails and listing the conversations."""
+        self.threads_toggle.configure(command=lambda: on_toggle(self.threaded_var.get()))
+        self.threads_toggle.pack(side="right", padx=4)
+
+    def _update_text(self):
+        total = self.total_email_count_var.get()
+        loaded = self.loaded_email_count_var.get()
+        text = f"Email count of {total}"
+        if loaded < total:
+            text += f" ({loaded} loaded)"
+        self.total_email_count_string_var.set(text)
+
+    def set_email_count(self, count: int, total: Optional[int] = None):
+        """count of the loaded cards, total of the whole folder (if it isn't known, the loaded count is shown)."""
+        self.loaded_email_count_var.set(count)
+        self.total_email_count_var.set(count if total is None else max(total, count))
 
         
         
@@ -21,6 +21,7 @@ from comps import search_bar
 class EmailList(Component):
     list_views: dict[str, EmailListView] 
     current_list_view: EmailListView 
+    search_text: str
 
     def __init__(self, parent: Misc):
         Component.__init__(self, parent, label=__name__)
@@ -40,9 +41,11 @@ class EmailList(Component):
 
         # default to inbox
         self.current_list_view = self.list_views["inbox"]
+        self.search_text = ""
         
         # events
         eb.bus.subscribe("category_list.item#click", self._on_view_item_click)
+        eb.bus.subscribe(search_bar.EventNames.SEARCH, self._on_search)
         # eb.bus.subscribe(search_bar.EventNames.FILTER, self._on_view_filter)
         # eb.bus.subscribe(search_bar.EventNames.SORT, self._on_sort_filter)
 
@@ -57,10 +60,17 @@ class EmailList(Component):
         self.sort_frame.grid()
         return False
 
+    def _on_search(self, e: eb.Event):
+        # only the shown view searches, the others catch up when switched to
+        self.search_text = e.data["text"]
+        self.current_list_view.set_search_text(self.search_text)
+        return True
+
     def _on_view_item_click(self, e: eb.Event):
         view_name = e.data["item_name"]
         self.current_list_view.grid_remove()
         self.current_list_view = self.list_views[view_name]
+        self.current_list_view.set_search_text(self.search_text)
         self.current_list_view.grid(row=2, column=0, padx=0, pady=0, sticky="nsew")
 
         return True
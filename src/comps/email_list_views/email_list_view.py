@@ -1,45 +1,105 @@
-from abc import abstractmethod
+from dataclasses import dataclass, field
 from tkinter import Misc
+from typing import Any, Optional
 
 from lib import event_bus as eb
 from comps.component import Component
 from comps.email_card_list import EmailCardList
 from debug import DEFAULT_LOGGED_IN_EMAIL
-from models import EmailModel, UserModel
+from models import ChangeOp, EmailSummary, Folder, ThreadModel, UserModel
 import database
+from async_database import AsyncDatabase
 from lib.logger import log
 from comps.email_card_list_navbar import EmailCardListNavbar
 
 
+# cards loaded per page (first paint and every scroll to the end)
+PAGE_SIZE = database.DEFAULT_PAGE_SIZE
+
+# changelog tables whose row ids are email ids (the user and thread rows have ids of their own)
+EMAIL_CHANGE_TABLES = ("email", "email_recipient")
+
+
+@dataclass
+class FolderChanges:
+    """Changes of a folder's cards since a changelog seq, see EmailListView.sync_changes."""
+    last_seq: int
+    removed_ids: set[int]  # deleted emails and the ones that left the folder (or stopped matching the search)
+    rows: list[tuple[UserModel, EmailSummary]]  # inserted or changed emails of the folder, with their senders
+    has_more: bool  # there are more changes after last_seq
+    threads: dict[int, ThreadModel] = field(default_factory=dict)  # listing conversations: email_id of a row -> its thread
+
+
 class EmailListView(Component):
+    folder: Optional[Folder] = None  # the folder listed by the view (None lists nothing)
+    supports_threads: bool = False  # the view can list conversations instead of emails (the thread index covers All Mail)
+    search_text: str  # lists only the emails matching the text (empty lists all)
+    threaded: bool  # lists one card per conversation, its latest message (searches still list emails)
     email_card_list: EmailCardList
+    _population_id: int
+    _next_page_cursor: Optional[database.PageCursor]
+    _search_offset: int
+    _has_more_pages: bool
+    _is_loading_page: bool
+    _change_seq: Optional[int]  # last changelog seq applied to the cards, None until the first page is read
+    _folder_total: Optional[int]  # emails in the whole folder (folder_count), not only the loaded pages
+    _is_syncing: bool
+    _sync_pending: bool
 
     def __init__(self, parent: Misc, label: str):
         super().__init__(parent, label=label, show_label=False, show_border=False)
 
+        self.search_text = ""
+        self.threaded = False
+        self._population_id = 0
+        self._next_page_cursor = None
+        self._search_offset = 0
+        self._has_more_pages = False
+        self._is_loading_page = False
+        self._change_seq = None
+        self._folder_total = None
+        self._is_syncing = False
+        self._sync_pending = False
+
         self.email_card_list = EmailCardList(self)
         self.email_card_list_navbar = EmailCardListNavbar(self)
 
-        eb.bus.subscribe(database.EventNames.EMAIL_UPDATE, self._on_db_email_update)
+        self.email_card_list.scrolled_near_end.addCallback(self.load_next_page)
+        if self.supports_threads:
+            self.email_card_list_navbar.show_threads_toggle(self.set_threaded)
+
+        eb.bus.subscribe(database.EventNames.TRANSACTION_COMMIT, self._on_db_transaction_commit)
+
+    @property
+    def is_listing_threads(self) -> bool:
+        return self.threaded and not self.search_text
 
     def update_email_count(self):
-        self.email_card_list_navbar.set_email_count(len(self.email_card_list.cards))
+        # search results and conversations are counted only as far as they're loaded
+        total = None if self.search_text or self.is_listing_threads else self._folder_total
+        self.email_card_list_navbar.set_email_count(len(self.email_card_list.cards), total)
 
-    def _on_db_email_update(self, e: eb.Event):
-        log.warning("EMAIL LIST VIEW updating email")
+    def refresh_folder_total(self):
+        """Reads the folder's total from the folder counts (a key lookup, not a COUNT(*))."""
+        if self.folder is None:
+            return
 
-        email = e.data["email"]
-        assert isinstance(email, EmailModel)
+        folder = self.folder
 
-        db = database.Database()
-        sender = db.fetch_user_by_id(email.sender_id)
-        assert sender
+        def fetch() -> int:
+            db = database.Database()
+            user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+            assert user, "Logged-in not in the database."
+            return db.fetch_folder_counts(user.user_id)[folder]
 
-        if self.email_card_list.contains_card(email.email_id):
-            log.warning("REMOVING AND ADDING")
-            self.email_card_list.clear_all()
-            self.populate_list()
+        def on_result(total: int):
+            self._folder_total = total
+            self.update_email_count()
 
+        AsyncDatabase().submit(fetch, on_result=on_result)
+
+    def _on_db_transaction_commit(self, _: eb.Event):
+        self.sync_changes()
         return False
 
     def render(self):
@@ -47,15 +107,267 @@ class EmailListView(Component):
         self.email_card_list.pack(padx=0, pady=0)
         self.email_card_list_navbar.pack(padx=1, pady=1, expand=False)
 
-    def add_email(self, sender: UserModel, email: EmailModel, index=-1):
+    def add_email(self, sender: UserModel, email: EmailSummary, index=-1):
         self.email_card_list.add_card(sender, email, index)
         self.update_email_count()
 
+    def add_emails(self, rows: list[tuple[UserModel, EmailSummary]], threads: Optional[dict[int, ThreadModel]] = None):
+        self.email_card_list.add_cards(rows, threads)
+        self.update_email_count()
+
     def clear_list(self):
+        # results of queries still running are for the old content
+        self._population_id += 1
+        self._next_page_cursor = None
+        self._search_offset = 0
+        self._has_more_pages = False
+        self._is_loading_page = False
+        self._is_syncing = False
+        self._sync_pending = False
         self.email_card_list.clear_all()
         self.update_email_count()
 
-    @abstractmethod
     def populate_list(self):
-        pass
+        """Starts over with the first page, the rest is loaded while scrolling."""
+        self.clear_list()
+        self._change_seq = None
+        self._has_more_pages = True
+        self.load_next_page(first_page=True)
+        self.refresh_folder_total()
+
+    def sync_changes(self):
+        """
+        Applies the changes committed since the last sync (see Database.fetch_changes_since).
+        Only the cards of the changed emails are added, rebuilt or removed, the list isn't
+        populated again (unless the view fell behind the kept changelog).
+        """
+        if self.folder is None:
+            return
+        # the changes are applied once the first page tells from which one
+        if self._is_syncing or self._change_seq is None:
+            self._sync_pending = True
+            return
+
+        self._is_syncing = True
+        population_id = self._population_id
+        # senders of the cards, a change of the user rebuilds their cards
+        card_senders = {email_id: card.sender.user_id for email_id, card in self.email_card_list.cards.items()}
+        # conversations of the cards, a change of any of their emails rebuilds the card
+        card_threads = {email_id: card.email.thread_id for email_id, card in self.email_card_list.cards.items()}
+
+        def on_result(changes: Optional[FolderChanges]):
+            if population_id != self._population_id:
+                return
+
+            self._is_syncing = False
+            if changes is None:
+                self.populate_list()
+                return
+
+            self._apply_changes(changes)
+            if changes.has_more or self._sync_pending:
+                self._sync_pending = False
+                self.sync_changes()
+
+        def on_error(error: BaseException):
+            if population_id == self._population_id:
+                self._is_syncing = False
+            log.error(f"Failed to sync the changes of {self.comp_label}: {error!r}")
+
+        if self.is_listing_threads:
+            AsyncDatabase().submit(self.fetch_thread_changes, self._change_seq, card_senders, card_threads, on_result=on_result, on_error=on_error)
+        else:
+            AsyncDatabase().submit(self.fetch_changes, self._change_seq, self.search_text, card_senders, on_result=on_result, on_error=on_error)
+
+    def _apply_changes(self, changes: FolderChanges):
+        for email_id in changes.removed_ids:
+            self.email_card_list.remove_card(email_id)
+
+        for sender, email in changes.rows:
+            thread = changes.threads.get(email.email_id)
+            card = self.email_card_list.cards.get(email.email_id)
+            if card is not None and card.email.sent_at == email.sent_at:
+                self.email_card_list.replace_card(sender, email, thread)
+                continue
+
+            # new in the folder, or moved by its date
+            self.email_card_list.remove_card(email.email_id)
+            index = self._card_index_of(email)
+            if index is not None:
+                self.email_card_list.add_card(sender, email, index, thread)
+
+        self._change_seq = changes.last_seq
+        self.update_email_count()
+        if changes.rows or changes.removed_ids:
+            self.refresh_folder_total()
+
+    def _card_index_of(self, email: EmailSummary) -> Optional[int]:
+        """Position of a new card, None if it belongs to a page that isn't loaded yet."""
+        if self.search_text:
+            # the ranking isn't known here, new matches go first
+            return 0
+
+        key = database.page_cursor_of(email)
+        for index, card in enumerate(self.email_card_list.cards.values()):
+            if database.page_cursor_of(card.email) < key:
+                return index
+
+        # older than every card, it comes with the next pages (if any)
+        return None if self._has_more_pages else -1
+
+    def fetch_changes(self, since_seq: int, search_text: str, card_senders: dict[int, int]) -> Optional[FolderChanges]:
+        """Reads the changes after since_seq, None if the view has to be populated again. Runs on a database worker thread."""
+        if self.folder is None:
+            return FolderChanges(since_seq, set(), [], False)
+
+        db = database.Database()
+        changes = db.fetch_changes_since(since_seq)
+        if changes is None:
+            return None
+
+        user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+        if not user:
+            raise ValueError(f"ERROR: User with email '{DEFAULT_LOGGED_IN_EMAIL}' isnt in the database!")
+
+        deleted_ids = {c.row_id for c in changes if c.table_name == "email" and c.op == ChangeOp.DELETE}
+        changed_ids = {c.row_id for c in changes if c.table_name in EMAIL_CHANGE_TABLES} - deleted_ids
+
+        changed_user_ids = {c.row_id for c in changes if c.table_name == "user"}
+        changed_ids |= {email_id for email_id, sender_id in card_senders.items() if sender_id in changed_user_ids}
+
+        rows = db.fetch_folder_emails_by_ids(self.folder, user.user_id, changed_ids, search_text=search_text) if changed_ids else []
+        in_folder_ids = {email.email_id for _, email in rows}
+
+        return FolderChanges(
+            last_seq=changes[-1].seq if changes else since_seq,
+            removed_ids=deleted_ids | (changed_ids - in_folder_ids),
+            rows=rows,
+            has_more=len(changes) == database.CHANGES_PAGE_SIZE,
+        )
+
+    def fetch_thread_changes(self, since_seq: int, card_senders: dict[int, int], card_threads: dict[int, Optional[int]]) -> Optional[FolderChanges]:
+        """
+        Like fetch_changes for the conversations: every thread with a changed email is read
+        again and replaces its card (the latest message can be another email now).
+        Runs on a database worker thread.
+        """
+        db = database.Database()
+        changes = db.fetch_changes_since(since_seq)
+        if changes is None:
+            return None
+
+        deleted_ids = {c.row_id for c in changes if c.table_name == "email" and c.op == ChangeOp.DELETE}
+        changed_ids = {c.row_id for c in changes if c.table_name in EMAIL_CHANGE_TABLES} - deleted_ids
+        changed_user_ids = {c.row_id for c in changes if c.table_name == "user"}
+
+        # deleted emails have no thread anymore, the cards know the threads of theirs
+        thread_ids = set(db.fetch_thread_ids_by_email_ids(changed_ids).values())
+        # archiving logs the conversations it changed, their archived emails aren't in the main database
+        thread_ids |= {c.row_id for c in changes if c.table_name == "thread"}
+        thread_ids |= {card_threads[email_id] for email_id in deleted_ids | changed_ids if email_id in card_threads}
+        thread_ids |= {card_threads[email_id] for email_id, sender_id in card_senders.items() if sender_id in changed_user_ids}
+        thread_ids.discard(None)
+
+        rows = db.fetch_threads_by_ids(thread_ids)
+
+        return FolderChanges(
+            last_seq=changes[-1].seq if changes else since_seq,
+            removed_ids=deleted_ids | {email_id for email_id, thread_id in card_threads.items() if thread_id in thread_ids},
+            rows=[(sender, email) for sender, email, _ in rows],
+            has_more=len(changes) == database.CHANGES_PAGE_SIZE,
+            threads={email.email_id: thread for _, email, thread in rows},
+        )
+
+    def set_threaded(self, threaded: bool):
+        """Lists one card per conversation instead of one per email."""
+        if threaded == self.threaded:
+            return
+
+        self.threaded = threaded
+        self.populate_list()
+
+    def set_search_text(self, text: str):
+        """Lists only the emails matching the text, ranked by relevance (empty text lists all)."""
+        if text == self.search_text:
+            return
+
+        self.search_text = text
+        self.populate_list()
+
+    def load_next_page(self, first_page: bool = False):
+        if self._is_loading_page or not self._has_more_pages:
+            return
+
+        self._is_loading_page = True
+        population_id = self._population_id
+
+        def on_result(rows: list[tuple[UserModel, EmailSummary]], threads: Optional[dict[int, ThreadModel]] = None):
+            if population_id != self._population_id:
+                return
+
+            self._is_loading_page = False
+            self._has_more_pages = len(rows) == PAGE_SIZE
+            self._search_offset += len(rows)
+            if rows:
+                self._next_page_cursor = database.page_cursor_of(rows[-1][1])
+
+            self.add_emails(rows, threads)
+
+        def on_thread_result(rows: list[tuple[UserModel, EmailSummary, ThreadModel]]):
+            on_result([(sender, email) for sender, email, _ in rows], {email.email_id: thread for _, email, thread in rows})
+
+        def on_error(error: BaseException):
+            if population_id == self._population_id:
+                self._is_loading_page = False
+            log.error(f"Failed to load a page of {self.comp_label}: {error!r}")
+
+        if self.search_text:
+            fetch, args, deliver = self.fetch_search_page, (self.search_text, self._search_offset, PAGE_SIZE), on_result
+        elif self.is_listing_threads:
+            fetch, args, deliver = database.Database().fetch_thread_page, (self._next_page_cursor, PAGE_SIZE), on_thread_result
+        else:
+            fetch, args, deliver = self.fetch_page, (self._next_page_cursor, PAGE_SIZE), on_result
+
+        def fetch_with_change_seq() -> tuple[Optional[int], Any]:
+            # read before the page, so the page already contains the changes up to it
+            change_seq = database.Database().fetch_last_change_seq() if first_page else None
+            return change_seq, fetch(*args)
+
+        def on_page(result: tuple[Optional[int], Any]):
+            change_seq, rows = result
+            deliver(rows)
+            if change_seq is None or population_id != self._population_id:
+                return
+
+            self._change_seq = change_seq
+            if self._sync_pending:
+                self._sync_pending = False
+                self.sync_changes()
+
+        AsyncDatabase().submit(fetch_with_change_seq, on_result=on_page, on_error=on_error)
+
+    def fetch_page(self, after_cursor: Optional[database.PageCursor], limit: int) -> list[tuple[UserModel, EmailSummary]]:
+        """Fetches the (sender, email) pairs of one page. Runs on a database worker thread."""
+        if self.folder is None:
+            return []
+
+        db = database.Database()
+        user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+
+        if not user:
+            raise ValueError(f"ERROR: User with email '{DEFAULT_LOGGED_IN_EMAIL}' isnt in the database!")
+
+        return db.fetch_folder_page(self.folder, user.user_id, after_cursor, limit)
+
+    def fetch_search_page(self, search_text: str, offset: int, limit: int) -> list[tuple[UserModel, EmailSummary]]:
+        """Fetches one page of the search results, best match first. Runs on a database worker thread."""
+        if self.folder is None:
+            return []
+
+        db = database.Database()
+        user = db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL)
+
+        if not user:
+            raise ValueError(f"ERROR: User with email '{DEFAULT_LOGGED_IN_EMAIL}' isnt in the database!")
 
+        return db.fetch_folder_search_page(self.folder, user.user_id, search_text, offset, limit)
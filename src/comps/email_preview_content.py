@@ -1,14 +1,20 @@
 from enum import StrEnum
+import os
+import tempfile
 import tkinter as tk
+import webbrowser
+from pathlib import Path
+from tkinter import filedialog
 from typing import Dict, Optional
 from tkinter import BooleanVar, ttk, Misc, StringVar, Text, font
 from comps.component import Component
-from models import EmailModel, UserModel
+from models import AttachmentMeta, EmailSummary, UserModel
 from lib import event_bus as eb
 from lib.image_manager import ImageManager
 from comps.utils import hover_popup as hp
 from comps import email_card
-from database import Database
+from database import AttachmentHandle, Database
+from async_database import AsyncDatabase
 from debug import DEFAULT_LOGGED_IN_EMAIL
 
 
@@ -19,7 +25,7 @@ class EventNames(StrEnum):
 class EmailPreviewContent(Component):
     has_rendered_content = False
     sender: Optional[UserModel] = None
-    email: Optional[EmailModel] = None
+    email: Optional[EmailSummary] = None
 
     def __init__(self, parent: Misc):
         Component.__init__(self, parent, label=__name__)
@@ -78,9 +84,12 @@ class EmailPreviewContent(Component):
         self.attachments_tree.configure(yscrollcommand=attachments_tree_scrollbar.set)
         self.attachments_tree.pack(side="left", fill="x", expand=True, pady=0)
 
+        # tree item id -> attachment shown by the item
+        self.attachment_items: Dict[str, AttachmentMeta] = {}
+
         self.attachemnt_tree_popup_menu = tk.Menu(self.attachments_tree)
-        self.attachemnt_tree_popup_menu.add_command(label="Open")
-        self.attachemnt_tree_popup_menu.add_command(label="Download")
+        self.attachemnt_tree_popup_menu.add_command(label="Open", command=self._on_attachment_open_click)
+        self.attachemnt_tree_popup_menu.add_command(label="Download", command=self._on_attachment_download_click)
 
         def on_attachments_show_var_write():
             if self.attachments_show_var.get():
@@ -101,6 +110,31 @@ class EmailPreviewContent(Component):
             self.attachments_tree.selection_set(identifier)
             self.attachemnt_tree_popup_menu.tk_popup(e.x_root + 10, e.y_root + 10)
 
+    def _selected_attachment(self) -> Optional[AttachmentMeta]:
+        selection = self.attachments_tree.selection()
+        return self.attachment_items.get(selection[0]) if selection else None
+
+    def _on_attachment_open_click(self):
+        meta = self._selected_attachment()
+        if meta is None:
+            return
+
+        # the data is loaded only now, into a temporary copy the system opens
+        filepath = os.path.join(tempfile.mkdtemp(prefix="email-attachment-"), os.path.basename(meta.filename))
+        AsyncDatabase().submit(
+            AttachmentHandle(meta).save_to, filepath,
+            on_result=lambda _: webbrowser.open(Path(filepath).as_uri())
+        )
+
+    def _on_attachment_download_click(self):
+        meta = self._selected_attachment()
+        if meta is None:
+            return
+
+        filepath = filedialog.asksaveasfilename(parent=self, initialfile=os.path.basename(meta.filename))
+        if filepath:
+            AsyncDatabase().submit(AttachmentHandle(meta).save_to, filepath)
+
     def render(self):
         if self.sender and self.email and not self.has_rendered_content:
             self.has_rendered_content = True
@@ -143,7 +177,7 @@ class EmailPreviewContent(Component):
         email = e.data["email"]
 
         assert isinstance(sender, UserModel)
-        assert isinstance(email, EmailModel)
+        assert isinstance(email, EmailSummary)
 
         self.sender = sender
         self.email = email 
@@ -154,8 +188,41 @@ class EmailPreviewContent(Component):
             sender_name = sender.email
         sender_info = "From " + sender_name + " on " + email.sent_at
 
+        # the header is known, the body (the list has only the snippet), recipients and attachments arrive later
+        self.header_vars["sender"].set(sender_info)
+        self.header_vars["recipient"].set("")
+        self.header_vars["all_recipients"].set("")
+        self.header_vars["subject"].set(email.subject)
+        self.header_vars["email"].set(sender.email)
+        self.body_text_var.set(email.snippet)
+        self.attachments_tree.delete(*self.attachments_tree.get_children())
+        self.attachment_items = {}
+
+        AsyncDatabase().submit(
+            self._fetch_details, 
+            email.email_id,
+            on_result=lambda result, e=email: self._on_details_fetched(e, *result)
+        )
+
+        # render changes 
+        self.render()
+
+        # notify
+        eb.bus.publish(EventNames.PREVIEW_FRAME_CHANGE)
+
+        return False
+
+    def _fetch_details(self, email_id: int):
+        """Body, recipients and attachments of the email. Runs on a database worker thread."""
         db = Database() 
-        recipients = db.fetch_recipients_by_email_id(email.email_id)
+        return db.fetch_email_body(email_id), db.fetch_recipients_by_email_id(email_id), db.fetch_attachment_metas_by_email_id(email_id)
+
+    def _on_details_fetched(self, email: EmailSummary, body: Optional[str], recipients: list[UserModel], attachments: list[AttachmentMeta]):
+        # another email has been previewed in the meantime
+        if self.email is not email:
+            return
+
+        self.body_text_var.set(body or "")
 
         logged_user = None
 
@@ -182,28 +249,16 @@ class EmailPreviewContent(Component):
                 recipient_info = "No recipients"
                 all_recipients = "no recipients"
 
-        attachments = db.fetch_attachments_by_email_id(email.email_id)
-
         # update the state
-        self.header_vars["sender"].set(sender_info)
         self.header_vars["recipient"].set(recipient_info)
         self.header_vars["all_recipients"].set(all_recipients)
-        self.header_vars["subject"].set(email.subject)
-        self.header_vars["email"].set(sender.email)
-        self.body_text_var.set(email.body)
 
         # clear everything from the tree and insert the fetched ones
         self.attachments_tree.delete(*self.attachments_tree.get_children())
+        self.attachment_items = {}
         for a in attachments:
-            self.attachments_tree.insert("", "end", text=a.filepath)
-
-        # render changes 
-        self.render()
-
-        # notify
-        eb.bus.publish(EventNames.PREVIEW_FRAME_CHANGE)
-
-        return False
+            item_id = self.attachments_tree.insert("", "end", text=a.filepath)
+            self.attachment_items[item_id] = a
 
     def _update_content(self):
 
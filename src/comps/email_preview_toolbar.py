@@ -8,7 +8,7 @@ from lib.image_manager import ImageManager
 from comps.utils.hover_popup import HoverPopupText
 from preferences import FontBuilder
 from lib import event_bus as eb
-from models import EmailModel, EmailStatus
+from models import EmailStatus, EmailSummary
 from comps import email_card
 from stores.email_with_attachments_store import EmailWithAttachmentsStore
 
@@ -28,7 +28,7 @@ class ButtonSettings():
 
 
 class EmailPreviewToolbar(Component):
-    email: Optional[EmailModel] = None
+    email: Optional[EmailSummary] = None
 
     def __init__(self, parent: Misc):
         Component.__init__(self, parent, label=__name__, show_border=True, show_label=False)
@@ -66,12 +66,23 @@ class EmailPreviewToolbar(Component):
         def on_edit_click():
             ewa = EmailWithAttachmentsStore()
             assert self.email, "Can click on edit iff some email is in the preview"
+            ewa.clear_replying_to_email_id()
             ewa.set_editing_email_id(self.email.email_id)
             eb.bus.publish(EventNames.EDIT, data={
                 "email": self.email
             })
 
+        def on_reply_click():
+            ewa = EmailWithAttachmentsStore()
+            assert self.email, "Can click on reply iff some email is in the preview"
+            ewa.clear_editing_email_id()
+            ewa.set_replying_to_email_id(self.email.email_id)
+            eb.bus.publish(EventNames.REPLY, data={
+                "email": self.email
+            })
+
         self.buttons["edit"].configure(command=on_edit_click)
+        self.buttons["reply"].configure(command=on_reply_click)
 
         eb.bus.subscribe(email_card.EventNames.PREVIEW, self._on_preview_button_click)
 
@@ -86,7 +97,7 @@ class EmailPreviewToolbar(Component):
 
     def _on_preview_button_click(self, e: eb.Event):
         self.email = e.data["email"] 
-        assert isinstance(self.email, EmailModel)
+        assert isinstance(self.email, EmailSummary)
 
         for btn in self.buttons.values():
             btn.configure(state="enabled")
@@ -57,6 +57,7 @@ class LayoutSidebar(Component):
         self.logout_btn = PublishingButton("Log-Out", ButtonConfig(self, EventNames.LOG_OUT, "icon_logout"))
 
         eb.bus.subscribe(email_preview_toolbar.EventNames.EDIT, self._on_email_preview_toolbar_edit_click)
+        eb.bus.subscribe(email_preview_toolbar.EventNames.REPLY, self._on_email_preview_toolbar_edit_click)
 
         eb.bus.subscribe(EventNames.MAIL, self._on_sidebar_button_click)
         eb.bus.subscribe(EventNames.COMPOSE, self._on_sidebar_button_click)
@@ -9,12 +9,14 @@ from comps.log_viewer import LogViewer
 
 
 class EventNames(StrEnum):
+    FILE_BACKUP         = "menu_bar.file_menu.backup_button#click"
     FILE_QUIT           = "menu_bar.file_menu.quit_button#click"
     EDIT_PREFERENCES    = "menu_bar.edit_menu.preferences_button#click"
 
     DEBUG_PRINT_HIERARCHY = "menu_bar.debug_menu.print_hierarchy_button#click"
     DEBUG_SHOW_HIERARCHY = "menu_bar.debug_menu.show_hierarchy_button#click"
     DEBUG_SHOW_WIDGET_DETAIL = "menu_bar.debug_menu.print_comp_detail_button#click"
+    DEBUG_SHOW_QUERY_PROFILE = "menu_bar.debug_menu.show_query_profile_button#click"
 
 
 class MenuBar(Component):
@@ -29,6 +31,8 @@ class MenuBar(Component):
         view_menu = Menu(self.menu, tearoff=False)
         debug_menu = Menu(self.menu, tearoff=False)
 
+        file_menu.add_command(label="Back Up Mailbox", command=lambda: eb.bus.publish(EventNames.FILE_BACKUP))
+        file_menu.add_separator()
         file_menu.add_command(label="Quit", command=lambda: eb.bus.publish(EventNames.FILE_QUIT))
 
         edit_menu.add_command(label="Preferences", command=lambda: eb.bus.publish(EventNames.EDIT_PREFERENCES))
@@ -37,6 +41,7 @@ class MenuBar(Component):
         debug_menu.add_command(label="Show Hierarchy", command=lambda: eb.bus.publish(EventNames.DEBUG_SHOW_HIERARCHY))
         debug_menu.add_command(label="Show Widget Detail", command=lambda: eb.bus.publish(EventNames.DEBUG_SHOW_WIDGET_DETAIL))
         debug_menu.add_command(label="Open Log Viewer", command=lambda: LogViewer(parent_window, log.get_logger()))
+        debug_menu.add_command(label="Show Query Profile", command=lambda: eb.bus.publish(EventNames.DEBUG_SHOW_QUERY_PROFILE))
 
         self.menu.add_cascade(label="File", menu=file_menu)
         self.menu.add_cascade(label="Edit", menu=edit_menu)
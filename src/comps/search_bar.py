@@ -1,5 +1,6 @@
 from enum import StrEnum
 from tkinter import StringVar, ttk, Misc
+from typing import Optional
 from comps.component import Component
 from lib.image_manager import ImageManager
 from comps.utils.hover_popup import HoverPopupText
@@ -9,14 +10,23 @@ from lib import event_bus as eb
 class EventNames(StrEnum):
     FILTER = "search_bar.filter_button#click"
     SORT = "search_bar.sort_button#click"
+    SEARCH = "search_bar.search_entry#change"
+
+
+# the search runs once the typing pauses for this long
+SEARCH_DEBOUNCE_MS = 150
 
 
 class SearchBar(Component):
     search_string: StringVar
+    _search_after_id: Optional[str]
+    _published_search: str
 
     def __init__(self, parent: Misc):
         Component.__init__(self, parent, label=__name__)
         self.search_string = StringVar()
+        self._search_after_id = None
+        self._published_search = ""
 
         img = ImageManager()
 
@@ -42,6 +52,23 @@ class SearchBar(Component):
         HoverPopupText(self.filter_button, "Filter Mail")
         HoverPopupText(self.sort_button, "Sort Mail")
 
+        self.search_string.trace_add("write", lambda *_: self._schedule_search())
+
+    def _schedule_search(self):
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(SEARCH_DEBOUNCE_MS, self._publish_search)
+
+    def _publish_search(self):
+        self._search_after_id = None
+
+        text = self.search_string.get().strip()
+        if text == self._published_search:
+            return
+
+        self._published_search = text
+        eb.bus.publish(EventNames.SEARCH, data={"text": text})
+
     def render(self):
         self.search_icon.pack(side="left", padx=(10, 0), pady=4)
         self.search_entry.pack(side="left", fill="x", expand=True, padx=10, pady=4)
@@ -1,5 +1,17 @@
+from tkinter import Misc, StringVar, ttk
+
 from comps.component import Component
 
 
 class StatusBar(Component):
-    pass
+    def __init__(self, parent: Misc):
+        super().__init__(parent, label=__name__, show_label=False, show_border=True)
+
+        self.text_var = StringVar(value="")
+        self.text_label = ttk.Label(self, textvariable=self.text_var)
+
+    def render(self):
+        self.text_label.pack(side="left", padx=4)
+
+    def set_text(self, text: str):
+        self.text_var.set(text)
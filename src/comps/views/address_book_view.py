@@ -1,7 +1,8 @@
 from tkinter import ttk, Misc
 from comps.component import Component
-from database import Database
+from async_database import AsyncDatabase
 from lib import event_bus as eb
+from models import UserModel
 import database as db
 
 class AddressBookView(Component):
@@ -24,13 +25,13 @@ class AddressBookView(Component):
 
         self.frame.pack(fill="both", expand=True, padx=10)
 
-        eb.bus.subscribe(db.EventNames.USER_INSERT, lambda _: self.repopulate())
+        # once per transaction, not per inserted recipient
+        eb.bus.subscribe(db.EventNames.USER_INSERT, lambda _: self.repopulate(), batch=True)
 
         self.populate()
 
     def repopulate(self):
         print("REPOPULATE")
-        self.clear()
         self.populate()
         self.update_idletasks()
 
@@ -40,8 +41,10 @@ class AddressBookView(Component):
         self.treeview.delete(*self.treeview.get_children())
 
     def populate(self):
-        db = Database()
+        # the list is replaced once the users arrive
+        AsyncDatabase().fetch_all_users(on_result=self._show_users)
 
-        users = db.fetch_all_users()
+    def _show_users(self, users: list[UserModel]):
+        self.clear()
         for user in users:
             self.treeview.insert("", "end", values=(user.email, user.first_name, user.last_name))
@@ -5,11 +5,18 @@ from comps.attachments_sidebar import AttachmentSidebar
 from comps.email_editor import EmailEditor
 from lib.image_manager import ImageManager 
 from comps import email_preview_toolbar
-from models import EmailModel
+from models import AttachmentMeta, EmailSummary, UserModel
 from database import Database
+from async_database import AsyncDatabase
+from typing import Optional
+import re
 import tkinter as tk
 
 
+# subjects of replies already start with it
+REPLY_SUBJECT_PATTERN = re.compile(r"^\s*re\s*:", re.IGNORECASE)
+
+
 class EventNames:
     OPEN_IN_NEW_WINDOW = "email_editor.open_in_new_window_button#click"
 
@@ -46,10 +53,14 @@ class ComposeView(Component):
         self.right_weight = 4
 
         self.paned_window.pack(fill="both", expand=True)
+
+        # email the editor is being filled from, the lookups of an older click are dropped
+        self._loading_email: Optional[EmailSummary] = None
         
         # events
         eb.bus.subscribe(EventNames.OPEN_IN_NEW_WINDOW, self._on_open_in_new_window_button_click)
         eb.bus.subscribe(email_preview_toolbar.EventNames.EDIT, self._on_email_preview_toolbar_edit_click)
+        eb.bus.subscribe(email_preview_toolbar.EventNames.REPLY, self._on_email_preview_toolbar_reply_click)
         self.paned_window.bind("<Configure>", self.on_resize)
 
     def on_resize(self, e: tk.Event):
@@ -72,16 +83,35 @@ class ComposeView(Component):
     def _on_email_preview_toolbar_edit_click(self, e: eb.Event):
         email = e.data["email"]
 
-        assert isinstance(email, EmailModel)
+        assert isinstance(email, EmailSummary)
 
-        db = Database()
+        # the previewed email is a summary, the body is read only now
+        self._loading_email = email
+        AsyncDatabase().submit(
+            self._fetch_draft,
+            email,
+            on_result=lambda result, e=email: self._on_draft_fetched(e, *result)
+        )
 
-        sender = db.fetch_user_by_id(email.sender_id)
-        assert sender
+        return False
 
-        recs = db.fetch_recipients_by_email_id(email.email_id)
+    def _fetch_draft(self, email: EmailSummary):
+        """Sender, recipients, attachments and body of the edited email. Runs on a database worker thread."""
+        db = Database()
+        return (
+            db.fetch_user_by_id(email.sender_id),
+            db.fetch_recipients_by_email_id(email.email_id),
+            db.fetch_attachment_metas_by_email_id(email.email_id),
+            db.fetch_email_body(email.email_id),
+        )
+
+    def _on_draft_fetched(self, email: EmailSummary, sender: Optional[UserModel], recs: list[UserModel], attchs: list[AttachmentMeta], body: Optional[str]):
+        # another email has been edited or replied to in the meantime
+        if self._loading_email is not email:
+            return
+        self._loading_email = None
 
-        attchs = db.fetch_attachments_by_email_id(email.email_id)
+        assert sender
 
         self.email_editor.insert_entries({
             "sender": sender.email,
@@ -89,14 +119,45 @@ class ComposeView(Component):
             "subject": email.subject,
         })
 
-        self.email_editor.insert_body(email.body)
+        self.email_editor.insert_body(body or "")
 
         self.attach_sidebar.add_attachments([a.filepath for a in attchs])
         
         self.email_editor.is_editing_draft_email(True)
 
+
+    def _on_email_preview_toolbar_reply_click(self, e: eb.Event):
+        email = e.data["email"]
+
+        assert isinstance(email, EmailSummary)
+
+        self._loading_email = email
+        AsyncDatabase().fetch_user_by_id(
+            email.sender_id,
+            on_result=lambda sender, e=email: self._on_reply_sender_fetched(e, sender)
+        )
+
         return False
 
+    def _on_reply_sender_fetched(self, email: EmailSummary, sender: Optional[UserModel]):
+        if self._loading_email is not email:
+            return
+        self._loading_email = None
+
+        assert sender
+
+        # the reply joins the email's thread through in_reply_to (see EmailWithAttachmentsStore)
+        subject = email.subject if REPLY_SUBJECT_PATTERN.match(email.subject) else f"Re: {email.subject}"
+
+        self.email_editor.insert_entries({
+            "recipients": [sender.email],
+            "subject": subject,
+        })
+
+        self.email_editor.insert_body("")
+        self.attach_sidebar.clear_attachment_list()
+        self.email_editor.is_editing_draft_email(False)
+
 
     def _on_open_in_new_window_button_click(self, _: eb.Event):
         """Move the email editor to a new window. Data in the compose view is persistent."""
@@ -155,7 +216,7 @@ class ComposeView(Component):
 
             # set the events of the main window back
             for sub in main_window_event_subs:
-                eb.bus.subscribe(sub.event_name, sub.event_callback)
+                eb.bus.subscribe(sub.event_name, sub.event_callback, batch=sub.batch)
             
             # reenable the widgets inside them
             self.email_editor.enable()
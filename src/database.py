@@ -1,21 +1,157 @@
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from bisect import bisect_right, insort
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from enum import StrEnum
-from os import wait
+import hashlib
+import os
+import queue
+import re
 import sqlite3
-from typing import Any, Iterable, Optional, get_type_hints, overload
+import sys
+import tempfile
+import threading
+from typing import IO, Any, Callable, Iterable, Iterator, Optional, get_type_hints, overload
+import debug
+import migrations
+from compression import (
+    ATTACHMENT_ZLIB_ENCODING, MAX_COMPRESSED_RATIO, compress_stream, decode_attachment, decode_body,
+    decoded_chunks, encode_attachment, encode_body, should_compress_attachment,
+)
+from query_profiler import ProfiledCursor, QueryProfiler
+from row_factory import ModelRowFactory, rows_of
+from lib.lru import LRUCache
 from lib.types import Singleton
-from models import AttachmentModel, EmailAttachmentModel, UserModel, EmailModel, EmailRecipientModel, EmailStatus
+from models import ArchiveModel, AttachmentMeta, AttachmentModel, ChangeModel, EmailAttachmentModel, EmailSummary, Folder, ParsedEmail, ThreadModel, UserModel, EmailModel, EmailRecipientModel, EmailStatus
 from lib import event_bus as eb
 from lib.logger import log
 
 
 SQL_SCRIPT_DROP_TABLES_PATH = "db/scripts/drop_tables.sql"
-SQL_SCRIPT_CREATE_TABLES_PATH = "db/scripts/create_tables.sql"
 SQL_SCRIPT_INSERT_TABLES_PATH = "db/scripts/insert_tables.sql"
+SQL_SCRIPT_ARCHIVE_SCHEMA_PATH = "db/scripts/archive_schema.sql"
+
+# emails are listed newest first and paged by (sent_at, email_id) of the last row
+PageCursor = tuple[str, int]
+DEFAULT_PAGE_SIZE = 50
+
+# read-only connections, so list views can read while an insert is running
+READ_POOL_SIZE = 4
+BUSY_TIMEOUT_SECONDS = 5.0
+
+# changes returned by one fetch_changes_since
+CHANGES_PAGE_SIZE = 1000
+
+# users kept in the identity map (senders and recipients of the listed emails)
+USER_CACHE_SIZE = 1024
+
+# bm25 weights of the email_fts columns (subject, body, sender)
+SEARCH_RANK_WEIGHTS = "10.0, 1.0, 5.0"
+
+# attachments are streamed to and from their blobs in chunks of this size
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+
+# compressed attachments larger than this are spooled to disk before they're stored (one chunk stays the memory bound)
+ATTACHMENT_SPOOL_SIZE = ATTACHMENT_CHUNK_SIZE
+
+# an email that doesn't reply to a known one joins the thread of the latest email with its subject
+# sent at most this many days before it, if the two have at least this many participants in common
+# (the owner of the mailbox takes part in every email, one shared participant would join any 'Hello')
+THREAD_WINDOW_DAYS = 30
+THREAD_SHARED_PARTICIPANTS = 2
+
+# characters of the body kept in email.snippet
+SNIPPET_LENGTH = 160
+
+# the shape of EmailSummary, the list views never read the bodies
+EMAIL_SUMMARY_COLUMNS = "e.email_id, e.sender_id, e.subject, e.snippet, e.status, e.sent_at, e.thread_id, e.in_reply_to"
+
+# archive files are kept in this directory next to the main database, one per year
+ARCHIVE_DIRECTORY = "archive"
+ARCHIVE_SCHEMA_VERSION = 1
+
+# emails moved into an archive per transaction
+ARCHIVE_BATCH_SIZE = 5000
+
+# archives attached to a read connection at once (SQLite allows 10), the least recently used is detached
+MAX_ATTACHED_ARCHIVES = 8
+
+# pages copied by one step of a backup (4 MiB of the default 4 KiB pages), see Database.backup_to
+BACKUP_PAGES_PER_STEP = 1024
+
+# reply and forward prefixes stripped from the subjects before threading ('Re: Fwd: RE[2]: ...')
+SUBJECT_PREFIX_PATTERN = re.compile(r"^(\s*(re|fwd?|aw|wg|sv|vs|tr)(\s*\[\d+\])?\s*:)+\s*", re.IGNORECASE)
+
+# attachments without their data, the blob table is joined only for the size
+ATTACHMENT_META_SELECT_FROM = """
+    SELECT a.attachment_id, a.filename, a.filepath, b.size, a.create_at
+    FROM {schema}.attachment a
+    JOIN {schema}.attachment_blob b ON b.blob_id = a.blob_id
+"""
+ATTACHMENT_META_SELECT = ATTACHMENT_META_SELECT_FROM.format(schema="main")
+
+# attachments including their (decompressed) data, the shape of AttachmentModel
+ATTACHMENT_SELECT = """
+    SELECT a.attachment_id, a.filename, a.filepath, decode_attachment(b.data, b.encoding), a.create_at
+    FROM attachment a
+    JOIN attachment_blob b ON b.blob_id = a.blob_id
+"""
+
+
+def sha256_hex(data: Optional[bytes]) -> Optional[str]:
+    """Content key of attachment blobs, also registered as the sha256() SQL function."""
+    if data is None:
+        return None
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_subject(subject: Optional[str]) -> str:
+    """Thread key of the subject, empty if it has none. Also registered as the normalize_subject() SQL function."""
+    if not subject:
+        return ""
+    return " ".join(SUBJECT_PREFIX_PATTERN.sub("", subject).split()).casefold()
+
+
+def body_snippet(body: Optional[str]) -> str:
+    """Start of the body with the whitespace collapsed, also registered as the body_snippet() SQL function."""
+    if not body:
+        return ""
+    # a few times the length, collapsing the whitespace only shortens it
+    words = body[:SNIPPET_LENGTH * 4].split()
+    snippet = " ".join(words)
+    if len(snippet) <= SNIPPET_LENGTH and len(body) <= SNIPPET_LENGTH * 4:
+        return snippet
+    return snippet[:SNIPPET_LENGTH - 1].rstrip() + "…"
+
+
+def sent_order(email: tuple) -> tuple[str, int]:
+    """Sort key of (sent_at, email_id, ...) tuples, the order the emails were sent in."""
+    return email[0], email[1]
+
+
+def archive_schema_name(year: int) -> str:
+    """Name the archive of the year is attached under."""
+    return f"archive_{year}"
+
+
+def year_of(sent_at: str) -> int:
+    return int(sent_at[:4])
+
+
+def register_sql_functions(conn: sqlite3.Connection):
+    """Application functions used by the migrations and the queries."""
+    conn.create_function("sha256", 1, sha256_hex, deterministic=True)
+    conn.create_function("decompress", 1, decode_body, deterministic=True)
+    conn.create_function("decode_attachment", 2, decode_attachment, deterministic=True)
+    conn.create_function("normalize_subject", 1, normalize_subject, deterministic=True)
+    conn.create_function("body_snippet", 1, body_snippet, deterministic=True)
 
 
 
 class EventNames(StrEnum):
     USER_INSERT                                  = "db.user#insert"
+    USER_UPDATE                                  = "db.user#update"
     EMAIL_INSERT                                 = "db.email#insert"
     EMAIL_RECIPIENT_INSERT                       = "db.email_recipient#insert"
     ATTACHMENT_INSERT                            = "db.attachment#insert"
@@ -30,54 +166,384 @@ class EventNames(StrEnum):
     EMAIL_RECIPIENTS_OF_EMAIL_DELETE = "db.email_recipients_of_email#delete"
     EMAIL_ATTACHMENTS_OF_EMAIL_DELETE = "db.email_attachments_of_email#delete"
 
+    # published once per committed transaction, after its events (which it also carries),
+    # data: {"seq": last change in the changelog, "ids": {"email": [...], "user": [...], "attachment": [...]}, "events": [...]}
+    TRANSACTION_COMMIT = "db.transaction#commit"
+
+def page_cursor_of(email: EmailModel | EmailSummary) -> PageCursor:
+    """Cursor for fetching the page that follows the email."""
+    return (email.sent_at, email.email_id)
+
+
+def fts_match_query(text: str) -> Optional[str]:
+    """
+    FTS5 query matching emails that contain every word of the typed text.
+    The words are quoted (the text can't break the query syntax) and the last
+    one is matched as a prefix, so results show up while the word is being typed.
+    """
+    words = text.split()
+    if not words:
+        return None
+
+    terms = ['"' + w.replace('"', '""') + '"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+@dataclass
+class PreparedAttachment:
+    """A file hashed (and compressed) for storing, before the write lock is taken (see Database.insert_attachment_from_file)."""
+    filepath: str
+    file: IO[bytes]
+    size: int
+    sha256: str
+    # the compressed data, None if the file isn't compressed
+    compressed: Optional[IO[bytes]]
+
+
+class AttachmentHandle:
+    """Lazy handle of an attachment, its data is fetched only when opened or saved."""
+
+    meta: AttachmentMeta
+
+    def __init__(self, meta: AttachmentMeta):
+        self.meta = meta
+
+    def chunks(self, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[bytes]:
+        return Database().read_attachment_chunks(self.meta.attachment_id, chunk_size)
+
+    def read(self) -> bytes:
+        """Whole data at once, prefer chunks or save_to for large attachments."""
+        return b"".join(self.chunks())
+
+    def save_to(self, filepath: str):
+        with open(filepath, "wb") as f:
+            for chunk in self.chunks():
+                f.write(chunk)
+
+
 class EventPublishingQueue():
-    queue: list[eb.EventPublishment]
+    queue: deque[eb.EventPublishment]
 
     def __init__(self):
-        self.queue = []
+        self.queue = deque()
 
     def front(self):
         return self.queue[0]
 
     def pop_front(self) -> eb.EventPublishment:
-        first = self.queue[0]
-        self.queue = self.queue[1:]
-        return first
+        return self.queue.popleft()
 
     def push(self, publishment: eb.EventPublishment):
         self.queue.append(publishment)
 
+    def clear(self):
+        self.queue.clear()
+
     def empty(self) -> bool:
         return len(self.queue) == 0
 
     def publish_front(self):
         eb.bus.publish(self.pop_front())
 
+    def pop_all(self) -> list[eb.EventPublishment]:
+        publishments = list(self.queue)
+        self.queue.clear()
+        return publishments
+
     def publish_all(self):
-        while not self.empty():
-            pub = self.pop_front()
-            eb.bus.publish(pub)
+        """Publishes the queued events as one batch (see EventBus.publish_batch)."""
+        eb.bus.publish_batch(self.pop_all())
+
+
+# model fields holding the ids of the rows an event is about, by the kind of the rows
+AFFECTED_ID_FIELDS = {
+    "email": ("email_id", ),
+    "user": ("user_id", "recepient_id"),
+    "attachment": ("attachment_id", ),
+}
+
+
+def affected_ids_of(publishments: Iterable[eb.EventPublishment]) -> dict[str, list[int]]:
+    """Ids of the emails, users and attachments the events carry (models or lists of them), by kind."""
+    ids: dict[str, set[int]] = {kind: set() for kind in AFFECTED_ID_FIELDS}
+    for publishment in publishments:
+        for value in publishment.data.values():
+            for model in value if isinstance(value, list) else [value]:
+                for kind, fields in AFFECTED_ID_FIELDS.items():
+                    for field in fields:
+                        model_id = getattr(model, field, None)
+                        if model_id is not None:
+                            ids[kind].add(model_id)
+
+    return {kind: sorted(kind_ids) for kind, kind_ids in ids.items()}
+
+
+
+class UserIdentityMap:
+    """
+    Bounded (LRU) map of the users looked up by id or by email address,
+    so a user read once is served from memory and is always the same object.
+    Shared by the worker threads, so every access holds the lock.
+
+    Every invalidation bumps the generation. A read passes the generation it
+    saw before its snapshot started to add, and a user read in an older
+    generation isn't mapped: its snapshot may predate the change.
+    """
+
+    _by_id: LRUCache[int, UserModel]
+    _id_by_email: dict[str, int]
+    generation: int
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE):
+        self._by_id = LRUCache(max_size)
+        self._id_by_email = {}
+        self._lock = threading.Lock()
+        self.generation = 0
 
+    def get_by_id(self, user_id: int) -> Optional[UserModel]:
+        with self._lock:
+            return self._by_id.get(user_id)
+
+    def get_by_email(self, email: str) -> Optional[UserModel]:
+        with self._lock:
+            user_id = self._id_by_email.get(email)
+            return self._by_id.get(user_id) if user_id is not None else None
+
+    def add(self, user: UserModel, generation: Optional[int] = None) -> UserModel:
+        """
+        Returns the mapped user with the same id if there is one, otherwise maps this one
+        (unless it was read in an older generation than the current one).
+        """
+        with self._lock:
+            mapped = self._by_id.get(user.user_id)
+            if mapped is not None:
+                return mapped
+            if generation is not None and generation != self.generation:
+                return user
+
+            evicted = self._by_id.put(user.user_id, user)
+            self._id_by_email[user.email] = user.user_id
+            if evicted:
+                self._id_by_email.pop(evicted[1].email, None)
+            return user
+
+    def invalidate(self, user_id: Optional[int] = None, email: Optional[str] = None):
+        with self._lock:
+            self.generation += 1
+            if email is not None and user_id is None:
+                user_id = self._id_by_email.get(email)
+            if user_id is None:
+                return
+
+            user = self._by_id.pop(user_id)
+            if user is not None:
+                self._id_by_email.pop(user.email, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._by_id.clear()
+            self._id_by_email.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._by_id)
 
 
 class Database(Singleton):
     DATABASE_INITIALIZED = False
 
     event_publishment_queue: EventPublishingQueue
-
-    def __init__(self, db_file="db/emails.db"):
+    # runs the publication of a committed transaction's events, None publishes them
+    # right away on the committing thread (see AsyncDatabase.attach)
+    event_dispatcher: Optional[Callable[[Callable[[], None]], None]]
+    conn: sqlite3.Connection
+    _read_pool: "queue.Queue[sqlite3.Connection]"
+    _transaction_depth: int
+    _transaction_owner: Optional[int]
+    profiler: Optional[QueryProfiler]
+    users: UserIdentityMap
+    # year -> path of the archive files, newest first
+    _archives: dict[int, str]
+    # archives attached to each read connection
+    _attached_archives: dict[sqlite3.Connection, LRUCache[int, str]]
+
+    def __init__(self, db_file: Optional[str] = None):
         if self.DATABASE_INITIALIZED:
             return
 
         self.DATABASE_INITIALIZED = True
 
         self.event_publishment_queue = EventPublishingQueue()
+        self.event_dispatcher = None
+        self._transaction_depth = 0
+        self._transaction_owner = None
+        self._write_lock = threading.RLock()
+        self.profiler = QueryProfiler() if debug.PROFILE_QUERIES else None
+        self.users = UserIdentityMap()
+        # generation of the user map seen by the read running on the thread (see _map_user)
+        self._read_state = threading.local()
+        self._last_change_seq = 0
+
+        if db_file is None:
+            db_file = os.environ.get(debug.DATABASE_FILE_ENV, debug.DEFAULT_DATABASE_FILE)
+
+        db_directory = os.path.dirname(db_file)
+        if db_directory:
+            os.makedirs(db_directory, exist_ok=True)
+
+        self.db_file = db_file
+
+        # the single writer connection
+        self.conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        register_sql_functions(self.conn)
+
+        # warm start only checks the schema version, the data is kept
+        self._migrate()
+
+        self._read_pool = queue.Queue()
+        self._attached_archives = {}
+        for _ in range(READ_POOL_SIZE):
+            conn = self._open_read_connection()
+            self._attached_archives[conn] = LRUCache(MAX_ATTACHED_ARCHIVES)
+            self._read_pool.put(conn)
 
-        self.conn = sqlite3.connect(db_file)
-        self.cursor = self.conn.cursor()
-        self._drop_tables()
-        self._create_tables()
-        self._insert_dummy_data()
+    ########################################################
+    #### Transaction #######################################
+    ########################################################
+
+    def in_transaction(self) -> bool:
+        """True if the calling thread is inside 'with db.transaction():'."""
+        return self._transaction_depth > 0 and self._transaction_owner == threading.get_ident()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work. Every write inside the block is committed once at the end,
+        or rolled back as a whole if anything raises. The queued events are published
+        only after the commit succeeded. Nested transactions join the outermost one.
+        """
+        # single writer, other threads wait for the running unit of work to finish
+        with self._write_lock:
+            outermost = self._transaction_depth == 0
+            if outermost:
+                self._transaction_owner = threading.get_ident()
+
+            self._transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                if outermost:
+                    self.conn.rollback()
+                    self.event_publishment_queue.clear()
+                    # users read inside the transaction may have been rolled back
+                    self.users.clear()
+                raise
+            finally:
+                self._transaction_depth -= 1
+                if outermost:
+                    self._transaction_owner = None
+
+            if outermost:
+                try:
+                    last_change_seq = self._fetch_last_change_seq()
+                    self.conn.commit()
+                except BaseException:
+                    self.conn.rollback()
+                    self.event_publishment_queue.clear()
+                    self.users.clear()
+                    raise
+
+                # one event per transaction, the views read the changes from the changelog
+                queued = self.event_publishment_queue
+                if last_change_seq != self._last_change_seq or not queued.empty():
+                    self._last_change_seq = last_change_seq
+                    events = list(queued.queue)
+                    queued.push(eb.EventPublishment(EventNames.TRANSACTION_COMMIT, data={
+                        "seq": last_change_seq,
+                        "ids": affected_ids_of(events),
+                        "events": events,
+                    }))
+                publishments = queued.pop_all()
+
+                # the map right after the commit, reads whose snapshot predates it don't map their user (see UserIdentityMap)
+                self._invalidate_users_of(publishments)
+
+                if self.event_dispatcher is None:
+                    eb.bus.publish_batch(publishments)
+                else:
+                    self.event_dispatcher(lambda: eb.bus.publish_batch(publishments))
+
+    @contextmanager
+    def _reader(self, name: Optional[str] = None, row_factory: Optional[ModelRowFactory] = None, archive: Optional[int] = None):
+        """
+        Cursor for a read. Each read takes a connection from the read-only pool
+        and runs in its own snapshot, so it never waits for the writer and
+        sees only committed data. Reads issued inside a transaction go through
+        the writer so they see its uncommitted rows.
+
+        With profiling enabled the statements are recorded under the name
+        (by default the name of the calling method, e.g. 'fetch_folder_page').
+        The rows are built by the row factory if one is given (see row_factory.rows_of).
+
+        The archive of the given year is attached to the connection first, under
+        archive_schema_name(year). Such reads always go through the pool (a database
+        can't be attached inside a transaction), the archives are never written by
+        the application's transactions.
+        """
+        profiler = self.profiler
+        if profiler is not None and name is None:
+            # 0 = this generator, 1 = contextmanager's __enter__, 2 = the caller
+            name = sys._getframe(2).f_code.co_name
+
+        # before the snapshot starts, a user changed after this can't be mapped by the read
+        previous_generation = getattr(self._read_state, "user_generation", None)
+        self._read_state.user_generation = self.users.generation
+
+        if self.in_transaction() and archive is None:
+            cursor = self.conn.cursor()
+            conn = None
+        else:
+            conn = self._read_pool.get()
+            cursor = conn.cursor()
+
+        try:
+            if conn is not None:
+                if archive is not None:
+                    self._attach_archive(conn, archive)
+                cursor.execute("BEGIN")
+            cursor.row_factory = row_factory
+
+            if profiler is None:
+                yield cursor
+            else:
+                assert name
+                profiled = ProfiledCursor(cursor, profiler, name)
+                yield profiled  # type: ignore[misc]
+                profiled.finish()
+        finally:
+            self._read_state.user_generation = previous_generation
+            cursor.close()
+            if conn is not None:
+                try:
+                    if conn.in_transaction:
+                        conn.execute("COMMIT")
+                finally:
+                    self._read_pool.put(conn)
+
+    def enable_profiling(self, strict: bool = False, allow_full_scan: Iterable[str] = ()) -> QueryProfiler:
+        """
+        Starts recording the reads (see query_profiler). A strict profiler raises
+        FullTableScanError from a read planned as a full table scan.
+        """
+        self.profiler = QueryProfiler(strict=strict, allow_full_scan=allow_full_scan)
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
 
     ########################################################
     #### Insert ############################################
@@ -85,203 +551,403 @@ class Database(Singleton):
 
     """
     These will raise sqlite3 errors. (they dont catch exceptions)
+    Each write is its own transaction unless called inside 'with db.transaction():'.
     """
 
-    def insert_user(self, email: str, first_name: Optional[str] = None, last_name: Optional[str] = None, commit = True) -> UserModel:
+    def insert_user(self, email: str, first_name: Optional[str] = None, last_name: Optional[str] = None) -> UserModel:
         """Inserts a new user into the database."""
-        self.cursor.execute("""
-            INSERT INTO user(email, first_name, last_name)
-            VALUES (?, ?, ?)
-            RETURNING *
-        """, (email, first_name, last_name))
+        with self.transaction():
+            cursor = self.conn.execute("""
+                INSERT INTO user(email, first_name, last_name)
+                VALUES (?, ?, ?)
+                RETURNING *
+            """, (email, first_name, last_name))
+
+            user = UserModel(*cursor.fetchone())
+
+            pub = eb.EventPublishment(EventNames.USER_INSERT, data={ 
+                "user": user 
+            })
+            self.event_publishment_queue.push(pub)
 
-        user = UserModel(*self.cursor.fetchone())
+        return user
 
-        pub = eb.EventPublishment(EventNames.USER_INSERT, data={ 
-            "user": user 
-        })
-        self.event_publishment_queue.push(pub)
+    def insert_users(self, emails: Iterable[str]) -> list[UserModel]:
+        """Returns the users with the given emails, inserting the missing ones in one batch."""
+        emails = list(dict.fromkeys(emails))  # unique, keeps the order
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front() 
+        with self.transaction():
+            users = {u.email: u for u in self._fetch_users_by_emails(emails)}
 
-        return user
+            missing = [e for e in emails if e not in users]
+            if missing:
+                self.conn.executemany("""
+                    INSERT INTO user(email)
+                    VALUES (?)
+                """, [(e, ) for e in missing])
 
-    def insert_email(self, sender_id: int, subject: str, body: str, status = "sent", commit = True) -> EmailModel:
-        """Inserts a new user into the database."""
-        self.cursor.execute("""
-            INSERT INTO email(sender_id, subject, body, status)
-            VALUES (?, ?, ?, ?)
-            RETURNING *
-        """, (sender_id, subject, body, status))
+                for user in self._fetch_users_by_emails(missing):
+                    users[user.email] = user
 
-        email = EmailModel(*self.cursor.fetchone())
+                    pub = eb.EventPublishment(EventNames.USER_INSERT, data={
+                        "user": user
+                    })
+                    self.event_publishment_queue.push(pub)
 
-        pub = eb.EventPublishment(EventNames.EMAIL_INSERT, data={
-            "email": email
-        })
-        self.event_publishment_queue.push(pub)
+        return [users[e] for e in emails]
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front() 
+    def insert_email(
+        self, sender_id: int, subject: str, body: str, status = "sent",
+        in_reply_to: Optional[int] = None,
+        recipient_ids: Iterable[int] = (),
+    ) -> EmailModel:
+        """
+        Inserts a new email into its thread (see _thread_id_for). The recipients are
+        only used for threading, they're inserted by insert_email_recipients.
+        """
+        with self.transaction():
+            thread_id = self._thread_id_for(subject, in_reply_to, [sender_id, *recipient_ids])
+            cursor = self.conn.execute("""
+                INSERT INTO email(sender_id, subject, snippet, status, thread_id, in_reply_to)
+                VALUES (?, ?, ?, ?, ?, ?)
+                RETURNING *
+            """, (sender_id, subject, body_snippet(body), status, thread_id, in_reply_to))
+
+            email = EmailModel(*cursor.fetchone())
+
+            # after the email row, its trigger indexes the email for search
+            self.conn.execute("""
+                INSERT INTO email_body(email_id, body)
+                VALUES (?, ?)
+            """, (email.email_id, encode_body(body)))
+
+            pub = eb.EventPublishment(EventNames.EMAIL_INSERT, data={
+                "email": email
+            })
+            self.event_publishment_queue.push(pub)
 
         return email 
 
-    def insert_email_recipient(self, email_id: int, recipient_id: int, commit = True) -> EmailRecipientModel:
+    def _thread_id_for(
+        self,
+        subject: Optional[str],
+        in_reply_to: Optional[int],
+        participant_ids: Iterable[int],
+        email_id: Optional[int] = None,
+    ) -> int:
+        """
+        Thread of the replied email. Otherwise the thread of the latest email with the same
+        subject sent in the last THREAD_WINDOW_DAYS that has THREAD_SHARED_PARTICIPANTS of the
+        participants (sender and recipients) in common. A new thread if neither exists.
+        An updated email passes its id, so it isn't matched with itself.
+        """
+        if in_reply_to is not None:
+            row = self.conn.execute("SELECT thread_id FROM email WHERE email_id = ?", (in_reply_to, )).fetchone()
+            if row and row[0] is not None:
+                return row[0]
+
+        subject_key = normalize_subject(subject) or None
+        participant_ids = list(dict.fromkeys(participant_ids))
+        if subject_key is not None and len(participant_ids) >= THREAD_SHARED_PARTICIPANTS:
+            window = f"-{THREAD_WINDOW_DAYS} days"
+            placeholders = ", ".join("?" * len(participant_ids))
+            row = self.conn.execute(f"""
+                SELECT e.thread_id
+                FROM thread t
+                JOIN email e ON e.thread_id = t.thread_id
+                WHERE t.subject_key = ?
+                    AND t.last_sent_at >= datetime('now', ?)
+                    AND e.sent_at >= datetime('now', ?)
+                    AND e.email_id IS NOT ?
+                    AND (e.sender_id IN ({placeholders})) + (
+                        SELECT count(*)
+                        FROM email_recipient r
+                        WHERE r.email_id = e.email_id AND r.recipient_id <> e.sender_id AND r.recipient_id IN ({placeholders})
+                    ) >= ?
+                ORDER BY e.sent_at DESC, e.email_id DESC
+                LIMIT 1
+            """, (subject_key, window, window, email_id, *participant_ids, *participant_ids, THREAD_SHARED_PARTICIPANTS)).fetchone()
+            if row:
+                return row[0]
+
+        cursor = self.conn.execute("""
+            INSERT INTO thread(subject_key)
+            VALUES (?)
+            RETURNING thread_id
+        """, (subject_key, ))
+        return cursor.fetchone()[0]
+
+    def _participant_ids_of(self, email_id: int) -> list[int]:
+        """Sender and recipients of the email."""
+        cursor = self.conn.execute("""
+            SELECT sender_id FROM email WHERE email_id = ?
+            UNION
+            SELECT recipient_id FROM email_recipient WHERE email_id = ?
+        """, (email_id, email_id))
+        return [row[0] for row in cursor.fetchall()]
+
+    def insert_email_recipient(self, email_id: int, recipient_id: int) -> EmailRecipientModel:
         """Inserts an email-recipient relationship."""
-        self.cursor.execute("""
-            INSERT INTO email_recipient(email_id, recipient_id)
-            VALUES (?, ?)
-            RETURNING *
-        """, (email_id, recipient_id))
-
-        email_recipient = EmailRecipientModel(*self.cursor.fetchone())
-
-        pub = eb.EventPublishment(EventNames.EMAIL_RECIPIENT_INSERT, data={
-            "email_recipient": email_recipient 
-        })
-        self.event_publishment_queue.push(pub)
-
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front() 
-
-        return email_recipient
+        return self.insert_email_recipients(email_id, [recipient_id])[0]
+
+    def insert_email_recipients(self, email_id: int, recipient_ids: Iterable[int]) -> list[EmailRecipientModel]:
+        """Inserts the email-recipient relationships in one batch."""
+        email_recipients = [EmailRecipientModel(email_id, r) for r in dict.fromkeys(recipient_ids)]
+
+        with self.transaction():
+            self.conn.executemany("""
+                INSERT INTO email_recipient(email_id, recipient_id)
+                VALUES (?, ?)
+            """, [(er.email_id, er.recepient_id) for er in email_recipients])
+
+            for email_recipient in email_recipients:
+                pub = eb.EventPublishment(EventNames.EMAIL_RECIPIENT_INSERT, data={
+                    "email_recipient": email_recipient 
+                })
+                self.event_publishment_queue.push(pub)
+
+        return email_recipients
+
+    def insert_attachment(self, filename, filepath, data) -> AttachmentModel:
+        with self.transaction():
+            blob_id = self._fetch_blob_id_by_sha256(sha256_hex(data))
+            if blob_id is None:
+                stored, encoding = encode_attachment(filename, data)
+                cursor = self.conn.execute("""
+                    INSERT INTO attachment_blob(sha256, size, data, encoding)
+                    VALUES (?, ?, ?, ?)
+                    RETURNING blob_id
+                """, (sha256_hex(data), len(data), stored, encoding))
+                blob_id = cursor.fetchone()[0]
+
+            meta = self._insert_attachment_row(filename, filepath, blob_id, len(data))
+
+        return AttachmentModel(meta.attachment_id, meta.filename, meta.filepath, data, meta.created_at)
+
+    def insert_email_attachment(self, email_id, attachment_id) -> EmailAttachmentModel:
+        return self.insert_email_attachments(email_id, [attachment_id])[0]
+
+    def insert_email_attachments(self, email_id: int, attachment_ids: Iterable[int]) -> list[EmailAttachmentModel]:
+        """Links the attachments to the email in one batch."""
+        email_attachments = [EmailAttachmentModel(email_id, a) for a in dict.fromkeys(attachment_ids)]
+
+        with self.transaction():
+            self.conn.executemany("""
+                INSERT INTO email_attachment(email_id, attachment_id)
+                VALUES (?, ?)
+            """, [(ea.email_id, ea.attachment_id) for ea in email_attachments])
+
+            for email_attachment in email_attachments:
+                pub = eb.EventPublishment(EventNames.EMAIL_ATTACHMENT_INSERT, data={
+                    "email_attachment": email_attachment 
+                })
+                self.event_publishment_queue.push(pub)
+
+        return email_attachments
+
+    def insert_attachment_from_file(self, filepath: str, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> AttachmentMeta:
+        """
+        Stores the file as an attachment. The file is hashed in a first pass,
+        so content that is already stored only gets linked (the existing blob
+        is never read). New content is streamed into a zeroblob chunk by chunk,
+        so the file is never held in memory whole. Files the compression policy
+        allows are compressed in the hashing pass into a spooled temporary file.
+        The hashing pass runs before the transaction, it doesn't hold the writer.
+        """
+        with self._prepared_attachment(filepath, chunk_size) as prepared, self.transaction():
+            return self._insert_prepared_attachment(prepared, chunk_size)
+
+    @contextmanager
+    def _prepared_attachment(self, filepath: str, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[PreparedAttachment]:
+        """Hashes the file (compressing it if the policy allows), the file stays open for storing."""
+        with open(filepath, "rb") as f, tempfile.SpooledTemporaryFile(ATTACHMENT_SPOOL_SIZE) as compressed:
+            size = os.fstat(f.fileno()).st_size
+            should_compress = should_compress_attachment(filepath, size)
+
+            digest = hashlib.sha256()
+            chunks = compress_stream(f, compressed, chunk_size) if should_compress else iter(lambda: f.read(chunk_size), b"")
+            for chunk in chunks:
+                digest.update(chunk)
+
+            yield PreparedAttachment(filepath, f, size, digest.hexdigest(), compressed if should_compress else None)
+
+    @contextmanager
+    def _prepared_attachments(self, filepaths: Iterable[str]) -> Iterator[list[PreparedAttachment]]:
+        with ExitStack() as stack:
+            prepared = []
+            for filepath in filepaths:
+                try:
+                    prepared.append(stack.enter_context(self._prepared_attachment(filepath)))
+                except OSError as e:
+                    raise ValueError(f"Attachment not inserted: {filepath}. Ended with error: {e}")
+            yield prepared
+
+    def _insert_prepared_attachment(self, prepared: PreparedAttachment, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> AttachmentMeta:
+        """Links the prepared file to its stored content, writing the blob if it's new."""
+        f, size, sha256, compressed = prepared.file, prepared.size, prepared.sha256, prepared.compressed
+
+        blob_id = self._fetch_blob_id_by_sha256(sha256)
+        if blob_id is None and compressed is not None and compressed.tell() <= size * MAX_COMPRESSED_RATIO:
+            compressed_size = compressed.tell()
+            blob_id = self._insert_zero_blob(sha256, size, compressed_size, ATTACHMENT_ZLIB_ENCODING)
+
+            # hashed in the same pass, the data can't differ
+            compressed.seek(0)
+            with self.conn.blobopen("attachment_blob", "data", blob_id) as blob:
+                while chunk := compressed.read(min(chunk_size, compressed_size - blob.tell())):
+                    blob.write(chunk)
+
+        elif blob_id is None:
+            blob_id = self._insert_zero_blob(sha256, size, size, None)
+
+            f.seek(0)
+            digest = hashlib.sha256()
+            with self.conn.blobopen("attachment_blob", "data", blob_id) as blob:
+                while chunk := f.read(min(chunk_size, size - blob.tell())):
+                    blob.write(chunk)
+                    digest.update(chunk)
+
+            if digest.hexdigest() != sha256:
+                raise ValueError(f"Attachment '{prepared.filepath}' changed while being stored.")
+
+        return self._insert_attachment_row(prepared.filepath, prepared.filepath, blob_id, size)
+
+    def _insert_zero_blob(self, sha256: str, size: int, stored_size: int, encoding: Optional[str]) -> int:
+        """Blob row with stored_size zero bytes of data, to be written through blobopen."""
+        cursor = self.conn.execute("""
+            INSERT INTO attachment_blob(sha256, size, data, encoding)
+            VALUES (?, ?, zeroblob(?), ?)
+            RETURNING blob_id
+        """, (sha256, size, stored_size, encoding))
+        return cursor.fetchone()[0]
+
+    def _fetch_blob_id_by_sha256(self, sha256: Optional[str]) -> Optional[int]:
+        row = self.conn.execute("""
+            SELECT blob_id
+            FROM attachment_blob
+            WHERE sha256 = ?
+        """, (sha256, )).fetchone()
+        return row[0] if row else None
 
-    def insert_attachment(self, filename, filepath, data, commit = True) -> AttachmentModel:
-        self.cursor.execute("""
-            INSERT INTO attachment(filename, filepath, data)
+    def _insert_attachment_row(self, filename: str, filepath: str, blob_id: int, size: int) -> AttachmentMeta:
+        """Attachment pointing to an already stored blob (its ref_count is bumped by a trigger)."""
+        cursor = self.conn.execute("""
+            INSERT INTO attachment(filename, filepath, blob_id)
             VALUES (?, ?, ?)
-            RETURNING *
-        """, (filename, filepath, data))
+            RETURNING attachment_id, filename, filepath, create_at
+        """, (filename, filepath, blob_id))
 
-        attachment = AttachmentModel(*self.cursor.fetchone())
+        attachment_id, filename, filepath, created_at = cursor.fetchone()
+        attachment = AttachmentMeta(attachment_id, filename, filepath, size, created_at)
 
         pub = eb.EventPublishment(EventNames.ATTACHMENT_INSERT, data={
             "attachment": attachment 
         })
         self.event_publishment_queue.push(pub)
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front() 
-
         return attachment
 
-    def insert_email_attachment(self, email_id, attachment_id, commit = True) -> EmailAttachmentModel:
-        self.cursor.execute("""
-            INSERT INTO email_attachment(email_id, attachment_id)
-            VALUES (?, ?)
-            RETURNING *
-        """, (email_id, attachment_id))
+    def insert_attachments_for_email(self, email_id: int, attachment_paths: Iterable[str]) -> list[AttachmentMeta]:
+        """Streams the files into attachments and links them to the email (hashed before the transaction)."""
+        with self._prepared_attachments(attachment_paths) as prepared, self.transaction():
+            return self._insert_prepared_attachments_for_email(email_id, prepared)
 
-        email_attachment = EmailAttachmentModel(*self.cursor.fetchone())
+    def _insert_prepared_attachments_for_email(self, email_id: int, prepared: list[PreparedAttachment]) -> list[AttachmentMeta]:
+        attachments: list[AttachmentMeta] = []
 
-        pub = eb.EventPublishment(EventNames.EMAIL_ATTACHMENT_INSERT, data={
-            "email_attachment": email_attachment 
-        })
-        self.event_publishment_queue.push(pub)
+        with self.transaction():
+            for attch in prepared:
+                try:
+                    attachments.append(self._insert_prepared_attachment(attch))
+                except (OSError, sqlite3.Error) as e:
+                    raise ValueError(f"Attachment not inserted: {attch.filepath}. Ended with error: {e}")
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front() 
+            self.insert_email_attachments(email_id, [a.attachment_id for a in attachments])
 
-        return email_attachment
+        return attachments
 
     ########################################################
     #### Delete ############################################
     ########################################################
 
-    def delete_email_with_id(self, email_id: int, commit = True) -> Optional[EmailModel]:
-        self.cursor.execute(""" 
-        DELETE FROM email
-        WHERE email_id = ?
-        RETURNING *
-        """, (email_id, ))
-
-        row = self.cursor.fetchone()
-        if not row:
-            return None
-        email = EmailModel(*row)
+    def delete_email_with_id(self, email_id: int) -> Optional[EmailModel]:
+        with self.transaction():
+            cursor = self.conn.execute(""" 
+            DELETE FROM email
+            WHERE email_id = ?
+            RETURNING *
+            """, (email_id, ))
 
-        pub = eb.EventPublishment(EventNames.EMAIL_DELETE, data={
-            "email": email
-        })
-        self.event_publishment_queue.push(pub)
+            row = cursor.fetchone()
+            if not row:
+                return None
+            email = EmailModel(*row)
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front()
+            pub = eb.EventPublishment(EventNames.EMAIL_DELETE, data={
+                "email": email
+            })
+            self.event_publishment_queue.push(pub)
 
         return email
 
 
 
-    def delete_recipients_of_email(self, email_id: int, commit=True) -> list[EmailRecipientModel]:
-        self.cursor.execute(""" 
-        DELETE FROM email_recipient
-        WHERE email_id = ?
-        RETURNING *
-        """, (email_id, ))
-       
-        rows = self.cursor.fetchall()
-        email_recipients = [EmailRecipientModel(*row) for row in rows]
-
-        pub = eb.EventPublishment(EventNames.EMAIL_RECIPIENTS_OF_EMAIL_DELETE, data={
-            "email_recipients": email_recipients 
-        })
-        self.event_publishment_queue.push(pub)
-
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front()
+    def delete_recipients_of_email(self, email_id: int) -> list[EmailRecipientModel]:
+        with self.transaction():
+            cursor = self.conn.execute(""" 
+            DELETE FROM email_recipient
+            WHERE email_id = ?
+            RETURNING email_id, recipient_id
+            """, (email_id, ))
+           
+            rows = cursor.fetchall()
+            email_recipients = [EmailRecipientModel(*row) for row in rows]
+
+            pub = eb.EventPublishment(EventNames.EMAIL_RECIPIENTS_OF_EMAIL_DELETE, data={
+                "email_recipients": email_recipients 
+            })
+            self.event_publishment_queue.push(pub)
 
         return email_recipients 
 
-    def delete_attachment_by_id(self, attachment_id: int, commit=True):
-        self.cursor.execute("""
-        DELETE attachment
-        WHERE attachment_id = ?
-        """, (attachment_id, ))
-        row = self.cursor.fetchone()
-        if not row:
-            return None
+    def delete_attachment_by_id(self, attachment_id: int) -> Optional[AttachmentMeta]:
+        with self.transaction():
+            # the blob may be deleted with the row (trigger), so the size is read first
+            row = self.conn.execute(ATTACHMENT_META_SELECT + "WHERE a.attachment_id = ?", (attachment_id, )).fetchone()
+            if not row:
+                return None
 
-        attch = AttachmentModel(*row)
+            attch = AttachmentMeta(*row)
 
-        pub = eb.EventPublishment(EventNames.ATTACHMENT_DELETE, data={
-            "attachment": attch
-        })
-        self.event_publishment_queue.push(pub)
+            self.conn.execute("""
+            DELETE FROM attachment
+            WHERE attachment_id = ?
+            """, (attachment_id, ))
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front()
+            pub = eb.EventPublishment(EventNames.ATTACHMENT_DELETE, data={
+                "attachment": attch
+            })
+            self.event_publishment_queue.push(pub)
 
         return attch
 
-    def delete_attachments_of_email(self, email_id: int, commit=True):
-        self.cursor.execute(""" 
-        DELETE FROM email_attachment
-        WHERE email_id = ?
-        RETURNING *
-        """, (email_id, ))
-
-        rows = self.cursor.fetchall()
-        deleted_email_attchs = [EmailAttachmentModel(*row) for row in rows]
+    def delete_attachments_of_email(self, email_id: int):
+        with self.transaction():
+            cursor = self.conn.execute(""" 
+            DELETE FROM email_attachment
+            WHERE email_id = ?
+            RETURNING *
+            """, (email_id, ))
 
-        pub = eb.EventPublishment(EventNames.EMAIL_ATTACHMENTS_OF_EMAIL_DELETE, data={
-            "deleted_email_attchs": deleted_email_attchs 
-        })
-        self.event_publishment_queue.push(pub)
+            rows = cursor.fetchall()
+            deleted_email_attchs = [EmailAttachmentModel(*row) for row in rows]
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front()
+            pub = eb.EventPublishment(EventNames.EMAIL_ATTACHMENTS_OF_EMAIL_DELETE, data={
+                "deleted_email_attchs": deleted_email_attchs 
+            })
+            self.event_publishment_queue.push(pub)
 
-        return [EmailAttachmentModel(*row) for row in self.cursor.fetchall()]
+        return deleted_email_attchs
 
 
 
@@ -289,41 +955,65 @@ class Database(Singleton):
     #### Update ############################################
     ########################################################
 
+    def update_user(self, user_id: int, first_name: Optional[str], last_name: Optional[str]) -> Optional[UserModel]:
+        with self.transaction():
+            cursor = self.conn.execute("""
+            UPDATE user
+            SET first_name = ?, last_name = ?
+            WHERE user_id = ?
+            RETURNING *
+            """, (first_name, last_name, user_id))
+            row = cursor.fetchone()
+            if not row:
+                return None
+
+            # reads inside this transaction must not get the old user
+            self.users.invalidate(user_id=user_id)
+            user = UserModel(*row)
+
+            pub = eb.EventPublishment(EventNames.USER_UPDATE, data={
+                "user": user
+            })
+            self.event_publishment_queue.push(pub)
+
+        return user
+
     def update_email_by_id(
         self, 
         email_id: int,
         subject: str,
         body: str,
         status: EmailStatus,
-        commit = True
     ) -> Optional[EmailModel]:
-        self.cursor.execute(""" 
-        UPDATE email 
-        SET sent_at = CURRENT_TIMESTAMP
-        WHERE email_id = ?
-        """, (email_id, ))
-
-        self.cursor.execute(""" 
-        UPDATE email 
-        SET subject = ?, body = ?, status = ?
-        WHERE email_id = ?
-        RETURNING *
-        """, (subject, body, status, email_id))
-
-
-        row = self.cursor.fetchone()
-        if not row:
-            return None
-        email = EmailModel(*row)
+        with self.transaction():
+            # a changed subject can move the email to another thread (a reply stays in its thread)
+            row = self.conn.execute("SELECT in_reply_to FROM email WHERE email_id = ?", (email_id, )).fetchone()
+            if not row:
+                return None
+            thread_id = self._thread_id_for(subject, row[0], self._participant_ids_of(email_id), email_id)
+
+            cursor = self.conn.execute(""" 
+            UPDATE email 
+            SET subject = ?, snippet = ?, status = ?, sent_at = CURRENT_TIMESTAMP, thread_id = ?
+            WHERE email_id = ?
+            RETURNING *
+            """, (subject, body_snippet(body), status, thread_id, email_id))
 
-        pub = eb.EventPublishment(EventNames.EMAIL_UPDATE, data={
-            "email": email
-        })
-        self.event_publishment_queue.push(pub)
+            row = cursor.fetchone()
+            if not row:
+                return None
+            email = EmailModel(*row)
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_front()
+            self.conn.execute("""
+            UPDATE email_body
+            SET body = ?
+            WHERE email_id = ?
+            """, (encode_body(body), email_id))
+
+            pub = eb.EventPublishment(EventNames.EMAIL_UPDATE, data={
+                "email": email
+            })
+            self.event_publishment_queue.push(pub)
 
         return email
 
@@ -339,72 +1029,108 @@ class Database(Singleton):
         recipients: Iterable[str],
         attachments: Iterable[str],
         status: EmailStatus = EmailStatus.SENT,
-        commit = True
+        in_reply_to: Optional[int] = None,
     ) -> EmailModel:
 
-        # exception not catched
-        email = self.insert_email_with_recipients(sender_email, subject, body, recipients, status=status, commit=False)
+        # exception not catched, the attachments are hashed before the transaction takes the writer
+        with self._prepared_attachments(attachments) as prepared, self.transaction():
+            return self._insert_email_with_recipients_and_prepared_attachments(
+                sender_email, subject, body, recipients, prepared, status=status, in_reply_to=in_reply_to)
 
-        for attch_path in attachments:
-            with open(attch_path, "rb") as f:
-                blob = f.read()
-                try:
-                    attch = self.insert_attachment(attch_path, attch_path, blob, commit=False)
-                    self.insert_email_attachment(email.email_id, attch.attachment_id, commit=False)
-                except sqlite3.Error as e:
-                    raise ValueError(f"Attachment not inserted: {attch_path}. Ended with error: {e}")
+    def _insert_email_with_recipients_and_prepared_attachments(
+        self, sender_email: str, subject: str, body: str,
+        recipients: Iterable[str],
+        prepared: list[PreparedAttachment],
+        status: EmailStatus = EmailStatus.SENT,
+        in_reply_to: Optional[int] = None,
+    ) -> EmailModel:
 
-        pub = eb.EventPublishment(EventNames.EMAIL_WITH_RECIPIENTS_AND_ATTACHMENTS_INSERT, data={
-            "email": email
-        })
-        self.event_publishment_queue.push(pub)
+        with self.transaction():
+            email = self.insert_email_with_recipients(sender_email, subject, body, recipients, status=status, in_reply_to=in_reply_to)
+            self._insert_prepared_attachments_for_email(email.email_id, prepared)
 
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_all()
+            pub = eb.EventPublishment(EventNames.EMAIL_WITH_RECIPIENTS_AND_ATTACHMENTS_INSERT, data={
+                "email": email
+            })
+            self.event_publishment_queue.push(pub)
 
         return email
 
+    def send_draft(
+        self, draft_id: int, sender_email: str, subject: str, body: str,
+        recipients: Iterable[str],
+        attachments: Iterable[str],
+    ) -> EmailModel:
+        """
+        Sends an edited draft. The draft becomes a sent draft without recipients and
+        attachments (it's no longer listed in Drafts) and the sent email is inserted,
+        replying to what the draft replied to. One transaction, the attachments are
+        hashed before it takes the writer.
+        """
+        with self._prepared_attachments(attachments) as prepared, self.transaction():
+            draft = self.update_email_by_id(draft_id, subject, body, status=EmailStatus.SENT_DRAFT)
+
+            self.delete_recipients_of_email(draft_id)
+            self.delete_attachments_of_email(draft_id)
+
+            return self._insert_email_with_recipients_and_prepared_attachments(
+                sender_email, subject, body, recipients, prepared,
+                status=EmailStatus.SENT, in_reply_to=draft.in_reply_to if draft else None)
+
+    def save_draft(
+        self, draft_id: int, subject: str, body: str,
+        recipients: Iterable[str],
+        attachments: Iterable[str],
+    ) -> Optional[EmailModel]:
+        """Replaces the content, recipients and attachments of the draft (hashed before the transaction)."""
+        with self._prepared_attachments(attachments) as prepared, self.transaction():
+            if self.conn.execute("SELECT 1 FROM email WHERE email_id = ?", (draft_id, )).fetchone() is None:
+                return None
+
+            # the recipients first, the update threads the draft by its new participants
+            self.delete_recipients_of_email(draft_id)
+            recipient_users = self.insert_users(recipients)
+            self.insert_email_recipients(draft_id, [r.user_id for r in recipient_users])
+
+            draft = self.update_email_by_id(draft_id, subject, body, status=EmailStatus.DRAFT)
+
+            self.delete_attachments_of_email(draft_id)
+            self._insert_prepared_attachments_for_email(draft_id, prepared)
+
+        return draft
+
 
     def insert_email_with_recipients(
         self, sender_email: str, subject: str, body: str, 
         recipients: Iterable[str], 
         status: EmailStatus = EmailStatus.SENT,
-        commit: bool = True
+        in_reply_to: Optional[int] = None,
     ) -> EmailModel:
 
         """Creates an email and assigns recipients."""
 
+        recipients = list(recipients)
+
         try:
-            sender = self.fetch_user_by_email(sender_email)
-            if sender is None:
-                raise ValueError(f"Email not inserted. Sender's email {sender_email} not found.")
-
-            email = self.insert_email(sender.user_id, subject, body, status=status, commit=commit)
-
-            for rec_email in recipients:
-                recipient = self.fetch_user_by_email(rec_email)
-
-                if not recipient:
-                    try:
-                        recipient = self.insert_user(rec_email, commit=commit)
-                    except sqlite3.Error as e:
-                        raise ValueError(f"Failed to insert user: {rec_email}. Ended with error: {e}")
-                        
-                self.insert_email_recipient(email.email_id, recipient.user_id, commit=commit)
+            with self.transaction():
+                sender = self.fetch_user_by_email(sender_email)
+                if sender is None:
+                    raise ValueError(f"Email not inserted. Sender's email {sender_email} not found.")
+
+                # before the email, the recipients take part in threading it
+                recipient_users = self.insert_users(recipients)
+                recipient_ids = [r.user_id for r in recipient_users]
+
+                email = self.insert_email(sender.user_id, subject, body, status=status, in_reply_to=in_reply_to, recipient_ids=recipient_ids)
+                self.insert_email_recipients(email.email_id, recipient_ids)
+
+                pub = eb.EventPublishment(EventNames.EMAIL_WITH_RECIPIENTS_INSERT, data={
+                    "email": email
+                })
+                self.event_publishment_queue.push(pub)
         except sqlite3.Error as e:
             raise ValueError(f"Inserting email from '{sender_email}' to recipients {recipients} failed: {e}")
 
-        pub = eb.EventPublishment(EventNames.EMAIL_WITH_RECIPIENTS_INSERT, data={
-            "emial": email
-        })
-        self.event_publishment_queue.push(pub)
-        if commit:
-            self.conn.commit()
-            self.event_publishment_queue.publish_all()
-        else:
-            self.event_publishment_queue.push(pub)
-
         log.info(f"Inserted new email with recipients: {email}")
         return email
 
@@ -413,67 +1139,129 @@ class Database(Singleton):
     #### Fetch/Select ######################################
     ########################################################
 
+    """
+    Every fetch runs on its own cursor in its own read snapshot (see _reader).
+    """
+
     def fetch_all_users(self) -> list[UserModel]:
-        self.cursor.execute("SELECT * FROM user")
-        return [UserModel(*row) for row in self.cursor.fetchall()]
+        with self._reader(row_factory=rows_of(UserModel)) as cursor:
+            cursor.execute("SELECT * FROM user")
+            return cursor.fetchall()
 
     def fetch_all_email(self) -> list[EmailModel]:
-        self.cursor.execute("SELECT * FROM email")
-        return [EmailModel(*row) for row in self.cursor.fetchall()]
+        with self._reader(row_factory=rows_of(EmailModel)) as cursor:
+            cursor.execute("SELECT * FROM email")
+            return cursor.fetchall()
+
+    def _fetch_users_by_emails(self, emails: list[str]) -> list[UserModel]:
+        users: list[UserModel] = []
+        missing: list[str] = []
+
+        for email in emails:
+            user = self.users.get_by_email(email)
+            if user is None:
+                missing.append(email)
+            else:
+                users.append(user)
+
+        if not missing:
+            return users
+
+        with self._reader(row_factory=rows_of(UserModel)) as cursor:
+            # stay well below the bound parameter limit
+            chunk_size = 500
+            for i in range(0, len(missing), chunk_size):
+                chunk = missing[i:i + chunk_size]
+                cursor.execute(f"""
+                    SELECT *
+                    FROM user
+                    WHERE email IN ({", ".join("?" * len(chunk))})
+                """, chunk)
+                users += [self._map_user(user) for user in cursor.fetchall()]
+
+        return users
 
     def fetch_user_by_email(self, email: str) -> Optional[UserModel]:
-        """Fetches a user from an email address."""
-        self.cursor.execute("""
-            SELECT * 
-            FROM user 
-            WHERE email = ?
-        """, (email,))
-        user = self.cursor.fetchone()
-        return UserModel(*user) if user else None
+        """Fetches a user from an email address (served from the identity map when it's there)."""
+        user = self.users.get_by_email(email)
+        if user is not None:
+            return user
+
+        with self._reader(row_factory=rows_of(UserModel)) as cursor:
+            cursor.execute("""
+                SELECT * 
+                FROM user 
+                WHERE email = ?
+            """, (email,))
+            user = cursor.fetchone()
+            return self._map_user(user) if user else None
 
     def fetch_email_by_id(self, email_id: int) -> Optional[EmailModel]:
-        self.cursor.execute(""" 
-            SELECT *
-            FROM email
-            WHERE email_id = ?
-        """, (email_id, ))
-        email = self.cursor.fetchone()
-        return EmailModel(*email) if email else None
-
+        with self._reader(row_factory=rows_of(EmailModel)) as cursor:
+            cursor.execute(""" 
+                SELECT *
+                FROM email
+                WHERE email_id = ?
+            """, (email_id, ))
+            return cursor.fetchone()
+
+
+    def fetch_email_body(self, email_id: int) -> Optional[str]:
+        """Text of the email's body, the list views have only the summaries (None if the email doesn't exist)."""
+        year = self._archive_of_email(email_id)
+        schema = "main" if year is None else archive_schema_name(year)
+
+        with self._reader(archive=year) as cursor:
+            cursor.execute(f"""
+                SELECT body
+                FROM {schema}.email_body
+                WHERE email_id = ?
+            """, (email_id, ))
+            row = cursor.fetchone()
+            return decode_body(row[0]) if row else None
 
     def fetch_email_from_user(self, user_id: int) -> Optional[str]:
-        self.cursor.execute("""
-            SELECT email 
-            FROM user 
-            WHERE user_id = ?
-        """, (user_id,))
-        row = self.cursor.fetchone()
-        return row[0] if row else None
+        with self._reader() as cursor:
+            cursor.execute("""
+                SELECT email 
+                FROM user 
+                WHERE user_id = ?
+            """, (user_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
 
     def fetch_user_by_id(self, user_id: int) -> Optional[UserModel]:
-        self.cursor.execute("""
-            SELECT * 
-            FROM user 
-            WHERE user_id = ?
-        """, (user_id,))
-        row = self.cursor.fetchone()
-        return UserModel(*row) if row else None
+        """Fetches a user by id (served from the identity map when it's there)."""
+        user = self.users.get_by_id(user_id)
+        if user is not None:
+            return user
+
+        with self._reader(row_factory=rows_of(UserModel)) as cursor:
+            cursor.execute("""
+                SELECT * 
+                FROM user 
+                WHERE user_id = ?
+            """, (user_id,))
+            user = cursor.fetchone()
+            return self._map_user(user) if user else None
 
     def fetch_emails_from_user(self, user_id: int, status: Optional[EmailStatus] = None) -> list[EmailModel]:
         query = """
             SELECT *
             FROM email 
             WHERE email.sender_id = ?
-            ORDER BY email.sent_at ASC
         """
 
-        params = [str(user_id)]
+        params: list[Any] = [user_id]
         if status:
-            query += "AND email.status = ?"
+            query += " AND email.status = ?"
             params.append(status)
 
-        self.cursor.execute(query, tuple(params))
-        return [EmailModel(*row) for row in self.cursor.fetchall()]
+        query += " ORDER BY email.sent_at ASC, email.email_id ASC"
+
+        with self._reader(row_factory=rows_of(EmailModel)) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
 
     def fetch_emails_for_user(self, user_id: int, status: Optional[EmailStatus] = None) -> list[tuple[UserModel, EmailModel]]:
         query = """
@@ -482,87 +1270,1076 @@ class Database(Singleton):
             JOIN email_recipient er ON e.email_id = er.email_id 
             JOIN user u ON e.sender_id = u.user_id
             WHERE er.recipient_id = ?
-            ORDER BY e.sent_at DESC
         """
 
-        params = [str(user_id)]
+        params: list[Any] = [user_id]
         if status:
-            query += "AND e.status = ?"
+            query += " AND e.status = ?"
             params.append(status)
 
-        email_field_count = len(EmailModel.__annotations__)
-        user_field_count = len(UserModel.__annotations__)
+        query += " ORDER BY er.sent_at DESC, er.email_id DESC"
 
-        self.cursor.execute(query, tuple(params))
+        with self._reader(row_factory=rows_of(UserModel, EmailModel)) as cursor:
+            cursor.execute(query, params)
+            return [self._sender_and_email(pair) for pair in cursor.fetchall()]
 
-        return [ 
-            (UserModel(*row[:user_field_count]), 
-             EmailModel(*row[user_field_count:user_field_count + email_field_count])) 
-            for row in self.cursor.fetchall()
-        ]
+    ########################################################
+    #### Folders (email + sender) ##########################
+    ########################################################
+
+    """
+    Joined queries shared by all list views. Each returns (sender, email) pairs
+    in a single statement, no matter how many rows there are.
+
+    Pages are ordered newest first. Pass the page_cursor_of() the last email of 
+    a page to get the next one. The cost of a page doesn't grow with the folder size.
+    """
+
+    @staticmethod
+    def _folder_source(folder: Folder, user_id: int, schema: str = "main") -> tuple[str, list[Any], str]:
+        """
+        FROM and WHERE clauses selecting the emails of the folder (aliases: e = email, u = sender)
+        and the alias of the table whose (sent_at, email_id) the folder is ordered by. Ordering by
+        that table's columns lets the planner follow the folder's index instead of sorting.
+        The emails are read from the schema (an attached archive), the senders from main.
+        """
+        match folder:
+            case Folder.INBOX:
+                return f"""
+                    FROM {schema}.email_recipient er
+                    JOIN {schema}.email e ON e.email_id = er.email_id
+                    JOIN main.user u ON u.user_id = e.sender_id
+                    WHERE er.recipient_id = ?
+                """, [user_id], "er"
+            case Folder.SENT | Folder.DRAFTS:
+                status = EmailStatus.SENT if folder == Folder.SENT else EmailStatus.DRAFT
+                return f"""
+                    FROM {schema}.email e
+                    JOIN main.user u ON u.user_id = e.sender_id
+                    WHERE e.sender_id = ? AND e.status = ?
+                """, [user_id, status], "e"
+            case Folder.ALL:
+                return f"""
+                    FROM {schema}.email e
+                    JOIN main.user u ON u.user_id = e.sender_id
+                    WHERE 1
+                """, [], "e"
+
+        raise ValueError(f"Unknown folder: {folder}")
+
+    @staticmethod
+    def _folder_filter(folder: Folder, user_id: int, schema: str = "main") -> tuple[str, list[Any]]:
+        """WHERE condition selecting the emails of the folder (alias: e = email of the schema)."""
+        match folder:
+            case Folder.INBOX:
+                return f"""
+                    EXISTS (
+                        SELECT 1
+                        FROM {schema}.email_recipient er
+                        WHERE er.email_id = e.email_id AND er.recipient_id = ?
+                    )
+                """, [user_id]
+            case Folder.SENT | Folder.DRAFTS:
+                status = EmailStatus.SENT if folder == Folder.SENT else EmailStatus.DRAFT
+                return "e.sender_id = ? AND e.status = ?", [user_id, status]
+            case Folder.ALL:
+                return "1", []
+
+        raise ValueError(f"Unknown folder: {folder}")
+
+    def _sender_and_email(self, pair: tuple[UserModel, Any]) -> tuple[UserModel, Any]:
+        """A (sender, email) row of rows_of(UserModel, EmailModel or EmailSummary), the sender goes through the identity map."""
+        sender, email = pair
+        return self._map_user(sender), email
+
+    def fetch_folder_page(
+        self,
+        folder: Folder,
+        user_id: int,
+        after_cursor: Optional[PageCursor] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> list[tuple[UserModel, EmailSummary]]:
+        """
+        Page of the folder's emails (without their bodies) together with their senders, newest first.
+        The page continues into the archives (newest year first) when the main database doesn't
+        fill it with emails newer than theirs, so an archive is attached only once the page reaches its year.
+        """
+        pairs: list[tuple[UserModel, EmailSummary]] = []
+
+        for year in [None, *self._archive_years_until(after_cursor)]:
+            if year is not None and len(pairs) >= limit and year_of(pairs[-1][1].sent_at) > year:
+                break
+
+            schema = "main" if year is None else archive_schema_name(year)
+            source, params, key = self._folder_source(folder, user_id, schema)
+            query = f"SELECT u.*, {EMAIL_SUMMARY_COLUMNS} " + source
+
+            if after_cursor:
+                query += f" AND ({key}.sent_at, {key}.email_id) < (?, ?)"
+                params += after_cursor
+
+            query += f" ORDER BY {key}.sent_at DESC, {key}.email_id DESC LIMIT ?"
+            params.append(limit)
+
+            with self._reader(row_factory=rows_of(UserModel, EmailSummary), archive=year) as cursor:
+                cursor.execute(query, params)
+                pairs += [self._sender_and_email(pair) for pair in cursor.fetchall()]
+
+            if year is not None:
+                # drafts and newly imported old emails are in the main database, between the archived ones
+                pairs.sort(key=lambda pair: page_cursor_of(pair[1]), reverse=True)
+                del pairs[limit:]
+
+        return pairs
+
+    def fetch_folder_emails_by_ids(
+        self, 
+        folder: Folder, 
+        user_id: int, 
+        email_ids: Iterable[int],
+        search_text: Optional[str] = None,
+    ) -> list[tuple[UserModel, EmailSummary]]:
+        """
+        The given emails (without their bodies) that belong to the folder (and match
+        the search text, if any) together with their senders, newest first.
+        """
+        email_ids = list(email_ids)
+        if not email_ids:
+            return []
+
+        source, params, _ = self._folder_source(folder, user_id)
+        query = f"SELECT u.*, {EMAIL_SUMMARY_COLUMNS} " + source + f" AND e.email_id IN ({', '.join('?' * len(email_ids))})"
+        params += email_ids
+
+        match_query = fts_match_query(search_text) if search_text else None
+        if match_query:
+            query += " AND e.email_id IN (SELECT rowid FROM email_fts WHERE email_fts MATCH ?)"
+            params.append(match_query)
+
+        query += " ORDER BY e.sent_at DESC, e.email_id DESC"
+
+        with self._reader(row_factory=rows_of(UserModel, EmailSummary)) as cursor:
+            cursor.execute(query, params)
+            return [self._sender_and_email(pair) for pair in cursor.fetchall()]
+
+    def fetch_folder_counts(self, user_id: int) -> dict[Folder, int]:
+        """Email count of every folder of the user, read from the trigger-maintained folder_count table."""
+        with self._reader() as cursor:
+            cursor.execute("""
+                SELECT role, status, count
+                FROM folder_count
+                WHERE (user_id = ? AND role IN ('sender', 'recipient')) OR (user_id = 0 AND role = 'all')
+            """, (user_id, ))
+            rows = cursor.fetchall()
+
+        counts = dict.fromkeys(Folder, 0)
+        for role, status, count in rows:
+            if role == "recipient":
+                counts[Folder.INBOX] += count
+            elif role == "all":
+                counts[Folder.ALL] += count
+            elif status == EmailStatus.SENT:
+                counts[Folder.SENT] += count
+            elif status == EmailStatus.DRAFT:
+                counts[Folder.DRAFTS] += count
+        return counts
+
+    def fetch_thread_page(
+        self,
+        after_cursor: Optional[PageCursor] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> list[tuple[UserModel, EmailSummary, ThreadModel]]:
+        """
+        Page of the conversations of All Mail, the latest message of each (without
+        its body) with its sender, newest first. The cursor is the latest message's (sent_at, email_id).
+        """
+        query = f"""
+            SELECT u.*, {EMAIL_SUMMARY_COLUMNS}, t.*
+            FROM thread t
+            JOIN email e ON e.email_id = t.last_email_id
+            JOIN user u ON u.user_id = e.sender_id
+        """
+        params: list[Any] = []
+
+        if after_cursor:
+            query += " WHERE (t.last_sent_at, t.last_email_id) < (?, ?)"
+            params += after_cursor
+
+        query += " ORDER BY t.last_sent_at DESC, t.last_email_id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._reader(row_factory=rows_of(UserModel, EmailSummary, ThreadModel)) as cursor:
+            cursor.execute(query, params)
+            return [(self._map_user(sender), email, thread) for sender, email, thread in cursor.fetchall()]
+
+    def fetch_threads_by_ids(self, thread_ids: Iterable[int]) -> list[tuple[UserModel, EmailSummary, ThreadModel]]:
+        """The given conversations (the ones that still exist) like fetch_thread_page, newest first."""
+        thread_ids = list(thread_ids)
+        if not thread_ids:
+            return []
+
+        with self._reader(row_factory=rows_of(UserModel, EmailSummary, ThreadModel)) as cursor:
+            cursor.execute(f"""
+                SELECT u.*, {EMAIL_SUMMARY_COLUMNS}, t.*
+                FROM thread t
+                JOIN email e ON e.email_id = t.last_email_id
+                JOIN user u ON u.user_id = e.sender_id
+                WHERE t.thread_id IN ({", ".join("?" * len(thread_ids))})
+                ORDER BY t.last_sent_at DESC, t.last_email_id DESC
+            """, thread_ids)
+            return [(self._map_user(sender), email, thread) for sender, email, thread in cursor.fetchall()]
+
+    def fetch_thread_ids_by_email_ids(self, email_ids: Iterable[int]) -> dict[int, int]:
+        """email_id -> thread_id of the given emails (the ones that still exist)."""
+        email_ids = list(email_ids)
+        if not email_ids:
+            return {}
+
+        with self._reader() as cursor:
+            cursor.execute(f"""
+                SELECT email_id, thread_id
+                FROM email
+                WHERE email_id IN ({", ".join("?" * len(email_ids))})
+            """, email_ids)
+            return dict(cursor.fetchall())
+
+    def fetch_folder_search_page(
+        self,
+        folder: Folder,
+        user_id: int,
+        search_text: str,
+        offset: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> list[tuple[UserModel, EmailSummary]]:
+        """
+        Page of the folder's emails (without their bodies) matching the search text together with their
+        senders, best match first (bm25, subject and sender weigh more). The ranking
+        isn't a stable key, so the pages are addressed by offset.
+
+        The matches of the archives follow those of the main database, newest year first
+        (each ranked on its own), an archive is searched only once the pages reach it.
+        """
+        match_query = fts_match_query(search_text)
+        if match_query is None:
+            return []
+
+        pairs: list[tuple[UserModel, EmailSummary]] = []
+        years = [None, *self._archive_years_until(None)]
+
+        for i, year in enumerate(years):
+            schema = "main" if year is None else archive_schema_name(year)
+            folder_filter, params = self._folder_filter(folder, user_id, schema)
+            source = f"""
+                FROM {schema}.email_fts
+                JOIN {schema}.email e ON e.email_id = email_fts.rowid
+                JOIN main.user u ON u.user_id = e.sender_id
+                WHERE email_fts MATCH ? AND {folder_filter}
+            """
+
+            with self._reader(row_factory=rows_of(UserModel, EmailSummary), archive=year) as cursor:
+                cursor.execute(f"""
+                    SELECT u.*, {EMAIL_SUMMARY_COLUMNS}
+                    {source}
+                    ORDER BY bm25(email_fts, {SEARCH_RANK_WEIGHTS})
+                    LIMIT ? OFFSET ?
+                """, [match_query, *params, limit - len(pairs), offset])
+                found = [self._sender_and_email(pair) for pair in cursor.fetchall()]
+
+            if not found and offset and i + 1 < len(years):
+                # the page starts after all the matches here, the next source skips the rest of the offset
+                with self._reader(archive=year) as cursor:
+                    cursor.execute("SELECT count(*) " + source, [match_query, *params])
+                    offset -= cursor.fetchone()[0]
+                continue
+
+            pairs += found
+            offset = 0
+            if len(pairs) >= limit:
+                break
+
+        return pairs
+
+    def fetch_email_with_sender(self, email_id: int) -> Optional[tuple[UserModel, EmailModel]]:
+        with self._reader(row_factory=rows_of(UserModel, EmailModel)) as cursor:
+            cursor.execute("""
+                SELECT u.*, e.*
+                FROM email e
+                JOIN user u ON u.user_id = e.sender_id
+                WHERE e.email_id = ?
+            """, (email_id, ))
+            pair = cursor.fetchone()
+            return self._sender_and_email(pair) if pair else None
 
     def fetch_recipients_by_email_id(self, email_id: int):
-        self.cursor.execute("""
-        SELECT u.*
-        FROM user u 
-        JOIN email_recipient er ON er.recipient_id = u.user_id
-        WHERE er.email_id = ?
-        """, (email_id, ))
+        year = self._archive_of_email(email_id)
+        schema = "main" if year is None else archive_schema_name(year)
+
+        with self._reader(row_factory=rows_of(UserModel), archive=year) as cursor:
+            cursor.execute(f"""
+            SELECT u.*
+            FROM main.user u 
+            JOIN {schema}.email_recipient er ON er.recipient_id = u.user_id
+            WHERE er.email_id = ?
+            """, (email_id, ))
 
-        recipients = self.cursor.fetchall()
-        return [UserModel(*r) for r in recipients]
+            return [self._map_user(user) for user in cursor.fetchall()]
 
     def fetch_attachments_by_email_id(self, email_id: int):
-        self.cursor.execute("""
-        SELECT a.*
-        FROM attachment a
-        JOIN email_attachment ea ON ea.attachment_id = a.attachment_id
-        WHERE ea.email_id = ?
-        """, (email_id, ))
+        """Attachments including their data, prefer fetch_attachment_metas_by_email_id."""
+        with self._reader(row_factory=rows_of(AttachmentModel)) as cursor:
+            cursor.execute(ATTACHMENT_SELECT + """
+            JOIN email_attachment ea ON ea.attachment_id = a.attachment_id
+            WHERE ea.email_id = ?
+            """, (email_id, ))
+
+            attchs = cursor.fetchall()
+
+        log.debug(f"Attachments of email with id {email_id}: {[a.attachment_id for a in attchs]}")
+        return attchs
+
+    def fetch_attachment_metas_by_email_id(self, email_id: int) -> list[AttachmentMeta]:
+        """Attachments of the email without their data, the blobs are never read."""
+        year = self._archive_of_email(email_id)
+        schema = "main" if year is None else archive_schema_name(year)
+
+        with self._reader(row_factory=rows_of(AttachmentMeta), archive=year) as cursor:
+            cursor.execute(ATTACHMENT_META_SELECT_FROM.format(schema=schema) + f"""
+            JOIN {schema}.email_attachment ea ON ea.attachment_id = a.attachment_id
+            WHERE ea.email_id = ?
+            """, (email_id, ))
+
+            return cursor.fetchall()
+
+    def read_attachment_chunks(self, attachment_id: int, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Streams the attachment data through an incremental blob handle. The read
+        snapshot is held until the generator is exhausted or closed. Attachments
+        of archived emails are looked up in the archives, newest year first.
+        """
+        for year in [None, *self._archive_years_until(None)]:
+            schema = "main" if year is None else archive_schema_name(year)
+
+            with self._reader(archive=year) as cursor:
+                cursor.execute(f"""
+                SELECT a.blob_id, b.encoding
+                FROM {schema}.attachment a
+                JOIN {schema}.attachment_blob b ON b.blob_id = a.blob_id
+                WHERE a.attachment_id = ?
+                """, (attachment_id, ))
+
+                row = cursor.fetchone()
+                if row is None:
+                    continue
+                blob_id, encoding = row
 
+                blob = cursor.connection.blobopen("attachment_blob", "data", blob_id, readonly=True, name=schema)
 
-        attchs = self.cursor.fetchall()
-        log.info(f"Attachments of email with id {email_id}:")
-        log.info(attchs)
-        return [AttachmentModel(*r) for r in attchs]
+                with blob:
+                    stored_chunks = iter(lambda: blob.read(chunk_size), b"")
+                    yield from decoded_chunks(stored_chunks, encoding, chunk_size)
+                return
 
+        raise ValueError(f"Attachment {attachment_id} doesn't exist.")
 
     def fetch_attachments_by_filepath(self, filepath: str) -> list[AttachmentModel]:
-        self.cursor.execute(""" 
-        SELECT *
-        FROM attachments
-        WHERE filepath = ?
-        """, (filepath, ))
-        
-        return [AttachmentModel(*a) for a in self.cursor.fetchall()]
+        with self._reader(row_factory=rows_of(AttachmentModel)) as cursor:
+            cursor.execute(ATTACHMENT_SELECT + """
+            WHERE a.filepath = ?
+            """, (filepath, ))
+            
+            return cursor.fetchall()
+
+    ########################################################
+    #### Changelog #########################################
+    ########################################################
+
+    """
+    Writes to email, email_recipient and user are logged by triggers (migration 0006).
+    A view remembers the last seq it has applied and fetches only the changes after it.
+    """
+
+    def _fetch_last_change_seq(self) -> int:
+        row = self.conn.execute("SELECT max(seq) FROM changelog").fetchone()
+        return row[0] or 0
+
+    def fetch_last_change_seq(self) -> int:
+        """Sequence number of the last committed change (0 if there's none)."""
+        with self._reader() as cursor:
+            cursor.execute("SELECT max(seq) FROM changelog")
+            return cursor.fetchone()[0] or 0
+
+    def fetch_changes_since(self, seq: int, limit: int = CHANGES_PAGE_SIZE) -> Optional[list[ChangeModel]]:
+        """
+        Changes after seq, oldest first (at most limit, ask again from the last one).
+        None if some of them were pruned already, the caller has to reload everything.
+        """
+        with self._reader(row_factory=rows_of(ChangeModel)) as cursor:
+            cursor.execute("""
+                SELECT *
+                FROM changelog
+                WHERE seq > ?
+                ORDER BY seq
+                LIMIT ?
+            """, (seq, limit))
+            changes = cursor.fetchall()
+
+        if changes:
+            return changes if changes[0].seq == seq + 1 else None
+
+        # the log started over (the tables were dropped and seeded again)
+        return [] if self.fetch_last_change_seq() >= seq else None
+
+
+    ########################################################
+    #### Bulk Import #######################################
+    ########################################################
+
+    def insert_parsed_emails(self, emails: list[ParsedEmail], user_ids: dict[str, int]) -> list[int]:
+        """
+        Writes a batch of imported messages in one transaction, every table with
+        a single executemany. No events are published, the views are reloaded
+        after the import instead of receiving one event per row. The search
+        index is filled once for the whole batch instead of by the row trigger.
+
+        user_ids maps addresses to user ids. It's extended with the users of the
+        batch, so the importer keeps it to skip the lookups in the next batches.
+        Returns the ids of the inserted emails.
+        """
+        if not emails:
+            return []
+
+        with self.transaction():
+            self.conn.execute("INSERT INTO bulk_import(active) VALUES (1)")
+
+            self._insert_import_users(emails, user_ids)
+
+            first_email_id = self._next_autoincrement_id("email")
+            email_ids = list(range(first_email_id, first_email_id + len(emails)))
+            thread_ids = self._insert_import_threads(emails, email_ids, user_ids)
+
+            self.conn.executemany("""
+                INSERT INTO email(email_id, sender_id, subject, snippet, status, sent_at, thread_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (email_id, user_ids[e.sender_email], e.subject, body_snippet(e.body), e.status, e.sent_at, thread_id)
+                for email_id, e, thread_id in zip(email_ids, emails, thread_ids)
+            ])
+
+            self.conn.executemany("""
+                INSERT INTO email_body(email_id, body)
+                VALUES (?, ?)
+            """, [
+                (email_id, encode_body(e.body))
+                for email_id, e in zip(email_ids, emails)
+            ])
+
+            # sent_at is given, so the row trigger doesn't have to copy it
+            self.conn.executemany("""
+                INSERT INTO email_recipient(email_id, recipient_id, sent_at)
+                VALUES (?, ?, ?)
+            """, [
+                (email_id, user_ids[r], e.sent_at)
+                for email_id, e in zip(email_ids, emails)
+                for r in dict.fromkeys(e.recipient_emails)
+            ])
+
+            self._insert_import_attachments(email_ids, emails)
+
+            self.conn.execute("""
+                INSERT INTO email_fts(rowid, subject, body, sender)
+                SELECT e.email_id, e.subject, decompress(b.body), trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || u.email)
+                FROM email e
+                JOIN email_body b ON b.email_id = e.email_id
+                JOIN user u ON u.user_id = e.sender_id
+                WHERE e.email_id BETWEEN ? AND ?
+            """, (email_ids[0], email_ids[-1]))
+
+            self.conn.execute("""
+                INSERT INTO changelog(table_name, op, row_id)
+                SELECT 'email', 'insert', email_id
+                FROM email
+                WHERE email_id BETWEEN ? AND ?
+            """, (email_ids[0], email_ids[-1]))
+
+            self._count_email_batch("BETWEEN ? AND ?", (email_ids[0], email_ids[-1]))
+            self._thread_import_batch(email_ids[0], email_ids[-1])
+
+            self.conn.execute("DELETE FROM bulk_import")
+
+        return email_ids
+
+    def _insert_import_users(self, emails: list[ParsedEmail], user_ids: dict[str, int]):
+        names: dict[str, tuple[Optional[str], Optional[str]]] = {}
+        for e in emails:
+            if e.sender_first_name or e.sender_last_name or e.sender_email not in names:
+                names[e.sender_email] = (e.sender_first_name, e.sender_last_name)
+            for r in e.recipient_emails:
+                names.setdefault(r, (None, None))
+
+        unknown = [address for address in names if address not in user_ids]
+        if not unknown:
+            return
+
+        user_ids.update(self._fetch_user_ids_by_emails(unknown))
+
+        missing = [address for address in unknown if address not in user_ids]
+        if missing:
+            self.conn.executemany("""
+                INSERT INTO user(email, first_name, last_name)
+                VALUES (?, ?, ?)
+            """, [(address, *names[address]) for address in missing])
+
+            user_ids.update(self._fetch_user_ids_by_emails(missing))
+
+    def _fetch_user_ids_by_emails(self, emails: list[str]) -> dict[str, int]:
+        """Plain lookup on the writer, bypasses the identity map (the importer reads thousands of users)."""
+        user_ids: dict[str, int] = {}
+
+        chunk_size = 500
+        for i in range(0, len(emails), chunk_size):
+            chunk = emails[i:i + chunk_size]
+            cursor = self.conn.execute(f"""
+                SELECT email, user_id
+                FROM user
+                WHERE email IN ({", ".join("?" * len(chunk))})
+            """, chunk)
+            user_ids.update(cursor.fetchall())
+
+        return user_ids
+
+    def _insert_import_threads(self, emails: list[ParsedEmail], email_ids: list[int], user_ids: dict[str, int]) -> list[int]:
+        """
+        Thread id of every email of the batch, the missing threads are inserted (without counts,
+        see _thread_import_batch). The replied emails aren't known, so the emails are threaded by
+        subject and participants like in _thread_id_for, in the order they were sent.
+        """
+        subject_keys = [normalize_subject(e.subject) or None for e in emails]
+        participants = [frozenset([user_ids[e.sender_email], *(user_ids[r] for r in e.recipient_emails)]) for e in emails]
+
+        # subject key -> (sent_at, email_id, participants, thread_id) of the emails the batch may join, in the order they were sent
+        earlier: dict[str, list[tuple[str, int, frozenset[int], int]]] = {}
+        distinct_keys = list(dict.fromkeys(k for k in subject_keys if k is not None))
+        if distinct_keys:
+            window = f"-{THREAD_WINDOW_DAYS} days"
+            first_sent_at = min(e.sent_at for e, k in zip(emails, subject_keys) if k is not None)
+            chunk_size = 500
+            for i in range(0, len(distinct_keys), chunk_size):
+                chunk = distinct_keys[i:i + chunk_size]
+                cursor = self.conn.execute(f"""
+                    SELECT t.subject_key, e.sent_at, e.email_id, e.thread_id, e.sender_id, group_concat(r.recipient_id)
+                    FROM thread t
+                    JOIN email e ON e.thread_id = t.thread_id
+                    LEFT JOIN email_recipient r ON r.email_id = e.email_id
+                    WHERE t.subject_key IN ({", ".join("?" * len(chunk))})
+                        AND t.last_sent_at >= datetime(?, ?)
+                        AND e.sent_at >= datetime(?, ?)
+                    GROUP BY e.email_id
+                """, (*chunk, first_sent_at, window, first_sent_at, window))
+                for subject_key, sent_at, email_id, thread_id, sender_id, recipient_ids in cursor:
+                    email_participants = frozenset([sender_id, *(int(r) for r in recipient_ids.split(",") if recipient_ids)])
+                    earlier.setdefault(subject_key, []).append((sent_at, email_id, email_participants, thread_id))
+            for candidates in earlier.values():
+                candidates.sort(key=sent_order)
+
+        # new threads get their ids upfront, like the emails (emails without a subject get one each)
+        next_thread_id = self._next_autoincrement_id("thread")
+        new_threads: list[tuple[int, Optional[str]]] = []
+        batch_thread_ids: list[int] = [0] * len(emails)
+        window_delta = timedelta(days=THREAD_WINDOW_DAYS)
+        for i in sorted(range(len(emails)), key=lambda i: (emails[i].sent_at, email_ids[i])):
+            subject_key, sent_at = subject_keys[i], emails[i].sent_at
+            candidates = earlier.get(subject_key) if subject_key is not None else None
+
+            thread_id = None
+            if candidates and len(participants[i]) >= THREAD_SHARED_PARTICIPANTS:
+                window_start = str(datetime.fromisoformat(sent_at) - window_delta)
+                for candidate_sent_at, _, candidate_participants, candidate_thread_id in reversed(candidates[:bisect_right(candidates, (sent_at, email_ids[i]), key=sent_order)]):
+                    if candidate_sent_at < window_start:
+                        break
+                    if len(candidate_participants & participants[i]) >= THREAD_SHARED_PARTICIPANTS:
+                        thread_id = candidate_thread_id
+                        break
+
+            if thread_id is None:
+                thread_id = next_thread_id
+                next_thread_id += 1
+                new_threads.append((thread_id, subject_key))
+
+            batch_thread_ids[i] = thread_id
+            if subject_key is not None:
+                insort(earlier.setdefault(subject_key, []), (sent_at, email_ids[i], participants[i], thread_id), key=sent_order)
+
+        self.conn.executemany("""
+            INSERT INTO thread(thread_id, subject_key)
+            VALUES (?, ?)
+        """, new_threads)
+
+        return batch_thread_ids
+
+    def _thread_import_batch(self, first_email_id: int, last_email_id: int):
+        """Adds the batch to the threads' counts and latest messages, what the thread triggers do per row."""
+        self.conn.execute("""
+            UPDATE thread
+            SET email_count = email_count + b.count,
+                (last_sent_at, last_email_id) = (
+                    SELECT sent_at, email_id
+                    FROM email
+                    WHERE thread_id = thread.thread_id
+                    ORDER BY sent_at DESC, email_id DESC
+                    LIMIT 1
+                )
+            FROM (
+                SELECT thread_id, count(*) AS count
+                FROM email
+                WHERE email_id BETWEEN ? AND ?
+                GROUP BY thread_id
+            ) b
+            WHERE thread.thread_id = b.thread_id
+        """, (first_email_id, last_email_id))
+
+    def _insert_import_attachments(self, email_ids: list[int], emails: list[ParsedEmail]):
+        rows = [(email_id, a) for email_id, e in zip(email_ids, emails) for a in e.attachments]
+        if not rows:
+            return
+
+        # each distinct content once, the existing ones are kept (sha256 is unique)
+        blobs = {a.sha256: a for _, a in rows}
+        self.conn.executemany("""
+            INSERT OR IGNORE INTO attachment_blob(sha256, size, data, encoding)
+            VALUES (?, ?, ?, ?)
+        """, [(a.sha256, len(a.data), *encode_attachment(a.filename, a.data)) for a in blobs.values()])
+
+        first_attachment_id = self._next_autoincrement_id("attachment")
+        attachment_ids = range(first_attachment_id, first_attachment_id + len(rows))
+
+        # ref_count of the blobs is bumped by the attachment insert trigger
+        self.conn.executemany("""
+            INSERT INTO attachment(attachment_id, filename, filepath, blob_id)
+            SELECT ?, ?, ?, blob_id
+            FROM attachment_blob
+            WHERE sha256 = ?
+        """, [(attachment_id, a.filename, a.filename, a.sha256) for attachment_id, (_, a) in zip(attachment_ids, rows)])
+
+        self.conn.executemany("""
+            INSERT INTO email_attachment(email_id, attachment_id)
+            VALUES (?, ?)
+        """, [(email_id, attachment_id) for attachment_id, (email_id, _) in zip(attachment_ids, rows)])
 
+    def _count_email_batch(self, email_ids: str, params: tuple):
+        """
+        Adds a batch of emails to the folder counts, what the folder_count triggers do per row.
+        email_ids is the condition on email_id selecting the batch ('BETWEEN ? AND ?').
+        """
+        for query in (
+            f"""
+            SELECT sender_id, 'sender', status, count(*)
+            FROM email
+            WHERE email_id {email_ids}
+            GROUP BY sender_id, status
+            """,
+            f"""
+            SELECT 0, 'all', status, count(*)
+            FROM email
+            WHERE email_id {email_ids}
+            GROUP BY status
+            """,
+            f"""
+            SELECT er.recipient_id, 'recipient', e.status, count(*)
+            FROM email_recipient er
+            JOIN email e ON e.email_id = er.email_id
+            WHERE er.email_id {email_ids}
+            GROUP BY er.recipient_id, e.status
+            """,
+        ):
+            self.conn.execute(f"""
+                INSERT INTO folder_count(user_id, role, status, count)
+                {query}
+                ON CONFLICT (user_id, role, status) DO UPDATE SET count = count + excluded.count
+            """, params)
+
+    def _next_autoincrement_id(self, table: str) -> int:
+        """First id an AUTOINCREMENT table would assign (ids of deleted rows aren't reused)."""
+        row = self.conn.execute(f"""
+            SELECT max(
+                coalesce((SELECT max(rowid) FROM {table}), 0),
+                coalesce((SELECT seq FROM sqlite_sequence WHERE name = ?), 0)
+            ) + 1
+        """, (table, )).fetchone()
+        return row[0]
+
+    ########################################################
+    #### Archive ###########################################
+    ########################################################
+
+    """
+    Emails older than a cutoff are moved into one file per year (db/archive/emails-2019.db
+    next to db/emails.db). The folder pages, the search and the preview continue into the
+    archives when the main database runs out of rows, attaching them to the read
+    connections on demand. Archived emails are read-only. The folder counts keep
+    counting them, the threads (Conversations) list only the main database.
+    """
+
+    def fetch_archives(self) -> list[ArchiveModel]:
+        """The archives, newest year first."""
+        with self._reader(row_factory=rows_of(ArchiveModel)) as cursor:
+            cursor.execute("""
+                SELECT *
+                FROM archive
+                ORDER BY year DESC
+            """)
+            return cursor.fetchall()
+
+    def _load_archives(self):
+        """Caches the paths of the archive files, the reads check them without a query."""
+        rows = self.conn.execute("SELECT year, filename FROM archive ORDER BY year DESC").fetchall()
+        directory = os.path.dirname(os.path.abspath(self.db_file))
+        self._archives = {year: os.path.join(directory, filename) for year, filename in rows}
+
+    def _archive_years_until(self, after_cursor: Optional[PageCursor]) -> list[int]:
+        """Years of the archives that can hold emails older than the cursor, newest first."""
+        last_year = year_of(after_cursor[0]) if after_cursor else None
+        return [year for year in self._archives if last_year is None or year <= last_year]
+
+    def _archive_of_email(self, email_id: int) -> Optional[int]:
+        """Year of the archive the email was moved into, None if it's in the main database."""
+        if not self._archives:
+            return None
+
+        with self._reader() as cursor:
+            cursor.execute("SELECT year FROM archived_email WHERE email_id = ?", (email_id, ))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def _attach_archive(self, conn: sqlite3.Connection, year: int):
+        """Attaches the archive to the read connection (outside of a transaction), unless it's attached already."""
+        attached = self._attached_archives[conn]
+        if attached.get(year) is not None:
+            return
+
+        path = self._archives.get(year)
+        if path is None:
+            raise ValueError(f"There's no archive of {year}.")
+
+        schema = archive_schema_name(year)
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", ("file:" + path + "?mode=ro", ))
+        evicted = attached.put(year, schema)
+        if evicted is not None:
+            conn.execute(f"DETACH DATABASE {evicted[1]}")
+
+    def _archive_filename(self, year: int) -> str:
+        """Path of the year's archive, relative to the directory of the main database."""
+        name = os.path.splitext(os.path.basename(self.db_file))[0]
+        return os.path.join(ARCHIVE_DIRECTORY, f"{name}-{year}.db")
+
+    def archive_emails_before(
+        self,
+        cutoff: str,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        on_progress: Optional[Callable[[int], None]] = None,
+    ) -> int:
+        """
+        Moves the emails sent before the cutoff (compared with sent_at, 'YYYY-MM-DD HH:MM:SS')
+        into the archives of their years, together with their bodies, recipients, attachment
+        links, attachments and blobs, batch_size emails per transaction. Drafts are kept,
+        so they can still be edited. Returns the number of archived emails.
+
+        A batch is committed to the archive and to the main database together, but not
+        atomically across the two files (WAL). If it's interrupted in between, the next
+        run copies the emails again and replaces what the first copy left.
+        """
+        archived = 0
+        while True:
+            with self._write_lock:
+                row = self.conn.execute("""
+                    SELECT sent_at
+                    FROM email
+                    WHERE sent_at < ? AND status <> ?
+                    ORDER BY sent_at
+                    LIMIT 1
+                """, (cutoff, EmailStatus.DRAFT)).fetchone()
+                if row is None:
+                    break
+
+                year = year_of(row[0])
+                archived += self._archive_batch(year, min(cutoff, f"{year + 1}-01-01 00:00:00"), batch_size)
+
+            if on_progress:
+                on_progress(archived)
+
+        return archived
+
+    def _archive_batch(self, year: int, before: str, batch_size: int) -> int:
+        """Moves the oldest emails of the year sent before the given time into its archive."""
+        if self.in_transaction():
+            raise RuntimeError("Emails can't be archived inside a transaction, the archive is attached to the writer.")
+
+        filename = self._archive_filename(year)
+        path = os.path.join(os.path.dirname(os.path.abspath(self.db_file)), filename)
+        self._create_archive_file(path)
+
+        schema = archive_schema_name(year)
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (path, ))
+        try:
+            with self.transaction():
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch(email_id INTEGER PRIMARY KEY)")
+                self.conn.execute("DELETE FROM temp.archive_batch")
+                cursor = self.conn.execute("""
+                    INSERT INTO temp.archive_batch(email_id)
+                    SELECT email_id
+                    FROM main.email
+                    WHERE sent_at >= ? AND sent_at < ? AND status <> ?
+                    ORDER BY sent_at
+                    LIMIT ?
+                """, (f"{year}-01-01 00:00:00", before, EmailStatus.DRAFT, batch_size))
+                count = cursor.rowcount
+
+                self._copy_archive_batch(schema)
+
+                # the archived emails keep counting in their folders, the delete triggers take them out
+                self._count_email_batch("IN temp.archive_batch", ())
+
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch_thread(thread_id INTEGER PRIMARY KEY)")
+                self.conn.execute("DELETE FROM temp.archive_batch_thread")
+                self.conn.execute("""
+                    INSERT INTO temp.archive_batch_thread(thread_id)
+                    SELECT DISTINCT thread_id
+                    FROM main.email
+                    WHERE email_id IN temp.archive_batch AND thread_id IS NOT NULL
+                """)
+
+                # a move, not a delete: the views keep the cards (see migration 0012)
+                self.conn.execute("INSERT INTO archive_move(active) VALUES (1)")
+
+                # their recipients and attachment links go first, the triggers read them through the email
+                self.conn.execute("DELETE FROM main.email_recipient WHERE email_id IN temp.archive_batch")
+                self.conn.execute("DELETE FROM main.email_attachment WHERE email_id IN temp.archive_batch")
+                self.conn.execute("DELETE FROM main.email WHERE email_id IN temp.archive_batch")
+
+                # the conversations are those of the main database: the delete trigger dropped the ones
+                # left without emails (the archived emails keep their thread_id), the others now end
+                # with their latest kept message
+                self.conn.execute("""
+                    INSERT INTO changelog(table_name, op, row_id)
+                    SELECT 'thread', iif(EXISTS (SELECT 1 FROM main.thread t WHERE t.thread_id = b.thread_id), 'update', 'delete'), b.thread_id
+                    FROM temp.archive_batch_thread b
+                """)
+
+                self.conn.execute("DELETE FROM archive_move")
+
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO archived_email(email_id, year)
+                    SELECT email_id, ?
+                    FROM temp.archive_batch
+                """, (year, ))
+                self.conn.execute(f"""
+                    INSERT INTO archive(year, filename, email_count)
+                    VALUES (?, ?, (SELECT count(*) FROM {schema}.email))
+                    ON CONFLICT (year) DO UPDATE SET email_count = excluded.email_count, archived_at = CURRENT_TIMESTAMP
+                """, (year, filename))
+        finally:
+            self.conn.execute(f"DETACH DATABASE {schema}")
+
+        self._load_archives()
+        log.debug(f"Archived {count} emails into '{filename}'")
+        return count
+
+    def _copy_archive_batch(self, schema: str):
+        """Copies the emails of temp.archive_batch with everything they reference into the attached archive."""
+        self.conn.execute(f"""
+            INSERT OR REPLACE INTO {schema}.email(email_id, sender_id, subject, status, sent_at, thread_id, in_reply_to, snippet)
+            SELECT email_id, sender_id, subject, status, sent_at, thread_id, in_reply_to, snippet
+            FROM main.email
+            WHERE email_id IN temp.archive_batch
+        """)
+
+        self.conn.execute(f"""
+            INSERT OR REPLACE INTO {schema}.email_body(email_id, body)
+            SELECT email_id, body
+            FROM main.email_body
+            WHERE email_id IN temp.archive_batch
+        """)
+
+        self.conn.execute(f"""
+            INSERT OR REPLACE INTO {schema}.email_recipient(email_id, recipient_id, sent_at)
+            SELECT email_id, recipient_id, sent_at
+            FROM main.email_recipient
+            WHERE email_id IN temp.archive_batch
+        """)
+
+        # each content once per archive, the blob ids of the archive are its own
+        self.conn.execute(f"""
+            INSERT OR IGNORE INTO {schema}.attachment_blob(sha256, size, data, encoding)
+            SELECT sha256, size, data, encoding
+            FROM main.attachment_blob
+            WHERE blob_id IN (
+                SELECT a.blob_id
+                FROM main.email_attachment ea
+                JOIN main.attachment a ON a.attachment_id = ea.attachment_id
+                WHERE ea.email_id IN temp.archive_batch
+            )
+        """)
+
+        # ref_count of the archive's blobs is bumped by its attachment insert trigger
+        self.conn.execute(f"""
+            INSERT OR IGNORE INTO {schema}.attachment(attachment_id, filename, filepath, create_at, blob_id)
+            SELECT a.attachment_id, a.filename, a.filepath, a.create_at, ab.blob_id
+            FROM main.attachment a
+            JOIN main.attachment_blob b ON b.blob_id = a.blob_id
+            JOIN {schema}.attachment_blob ab ON ab.sha256 = b.sha256
+            WHERE a.attachment_id IN (
+                SELECT attachment_id
+                FROM main.email_attachment
+                WHERE email_id IN temp.archive_batch
+            )
+        """)
+
+        self.conn.execute(f"""
+            INSERT OR IGNORE INTO {schema}.email_attachment(email_id, attachment_id)
+            SELECT email_id, attachment_id
+            FROM main.email_attachment
+            WHERE email_id IN temp.archive_batch
+        """)
+
+        # the search index is copied as it is, the bodies aren't decompressed again
+        self.conn.execute(f"DELETE FROM {schema}.email_fts WHERE rowid IN temp.archive_batch")
+        self.conn.execute(f"""
+            INSERT INTO {schema}.email_fts(rowid, subject, body, sender)
+            SELECT rowid, subject, body, sender
+            FROM main.email_fts
+            WHERE rowid IN temp.archive_batch
+        """)
+
+    @staticmethod
+    def _create_archive_file(path: str):
+        """Creates the archive file with its schema, unless it exists already."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        conn = sqlite3.connect(path)
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version == 0:
+                with open(SQL_SCRIPT_ARCHIVE_SCHEMA_PATH, "r") as f:
+                    conn.executescript(f.read())
+            elif version != ARCHIVE_SCHEMA_VERSION:
+                raise ValueError(f"Archive '{path}' has schema version {version}, expected {ARCHIVE_SCHEMA_VERSION}.")
+        finally:
+            conn.close()
+
+    def vacuum(self):
+        """Rebuilds the main database file, so the pages freed by archiving are returned to the file system."""
+        with self._write_lock:
+            if self.in_transaction():
+                raise RuntimeError("The database can't be vacuumed inside a transaction.")
+            self.conn.execute("VACUUM")
+            # the rebuilt pages are in the WAL until it's checkpointed
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def backup_to(
+        self,
+        path: str,
+        pages_per_step: int = BACKUP_PAGES_PER_STEP,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        """
+        Copies the main database into the file (replacing it) with the SQLite backup API,
+        pages_per_step pages at a time, calling on_progress(copied pages, total pages) after
+        each step. Can run on any thread, it neither holds the write lock nor uses the pool.
+
+        The copy is a snapshot of the last commit before the call: the source connection
+        keeps one read transaction open for the whole copy, so the writer commits (into
+        the WAL) as usual and the copy doesn't restart when it does. The WAL can't be
+        checkpointed past the snapshot until the copy finishes, so it grows meanwhile.
+        The archive files aren't part of the copy.
+        """
+        source = self._open_read_connection()
+        target = sqlite3.connect(path)
+        try:
+            source.execute("BEGIN")
+            # the snapshot starts with the first read
+            source.execute("SELECT count(*) FROM sqlite_schema").fetchone()
+
+            def progress(status: int, remaining: int, total: int):
+                if on_progress:
+                    on_progress(total - remaining, total)
+
+            source.backup(target, pages=pages_per_step, progress=progress)
+            source.execute("COMMIT")
+        finally:
+            target.close()
+            source.close()
+
+    ########################################################
+    #### Schema ############################################
+    ########################################################
+
+    def _map_user(self, user: UserModel) -> UserModel:
+        """The mapped user (see UserIdentityMap), read by the read running on this thread."""
+        return self.users.add(user, getattr(self._read_state, "user_generation", None))
+
+    def _invalidate_users_of(self, publishments: Iterable[eb.EventPublishment]):
+        for publishment in publishments:
+            if publishment.name not in (EventNames.USER_INSERT, EventNames.USER_UPDATE):
+                continue
+
+            user = publishment.data["user"]
+            assert isinstance(user, UserModel)
+
+            self.users.invalidate(user_id=user.user_id)
+            self.users.invalidate(email=user.email)
+
+    def _open_read_connection(self) -> sqlite3.Connection:
+        # autocommit mode, the snapshots are opened explicitly by _reader
+        uri = "file:" + os.path.abspath(self.db_file) + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False, isolation_level=None)
+        register_sql_functions(conn)
+        return conn
+
+    def set_trace_callback(self, callback):
+        """Calls the callback with every SQL statement executed on any of the connections."""
+        self.conn.set_trace_callback(callback)
+
+        connections = [self._read_pool.get() for _ in range(READ_POOL_SIZE)]
+        for conn in connections:
+            conn.set_trace_callback(callback)
+            self._read_pool.put(conn)
+
+    def _migrate(self):
+        applied = migrations.apply_migrations(self.conn)
+
+        for m in applied:
+            log.info(f"Applied database migration {m.version:04d} ({m.name})")
+
+        log.debug(f"Database '{self.db_file}' is at schema version {migrations.current_version(self.conn)}")
+        self._last_change_seq = self._fetch_last_change_seq()
+        self._load_archives()
 
     ########################################################
     #### Dummy Data ########################################
     ########################################################
 
+    def seed_dummy_data(self, reset: bool = True):
+        """Fills the database with dummy data. By default the existing tables are dropped first."""
+        if reset:
+            self._drop_tables()
+            self._migrate()
+        self._insert_dummy_data()
+
     def _drop_tables(self):
         with open(SQL_SCRIPT_DROP_TABLES_PATH, "r") as f:
             content = f.read()
-            log.info(f"Exectuted SQL script ({SQL_SCRIPT_DROP_TABLES_PATH}):")
-            log.info("\n" + content)
-            self.cursor.executescript(content)
+            log.debug(f"Exectuted SQL script ({SQL_SCRIPT_DROP_TABLES_PATH}):")
+            log.debug("\n" + content)
+            self.conn.executescript(content)
             self.conn.commit()
 
-    def _create_tables(self):
-        with open(SQL_SCRIPT_CREATE_TABLES_PATH, "r") as f:
-            content = f.read()
-            log.info(f"Exectuted SQL script ({SQL_SCRIPT_CREATE_TABLES_PATH}):")
-            log.info("\n" + content)
-            self.cursor.executescript(content)
-            self.conn.commit()
+        self.users.clear()
 
     def _insert_dummy_data(self):
         with open(SQL_SCRIPT_INSERT_TABLES_PATH, "r") as f:
             content = f.read()
-            log.info(f"Exectuted SQL script ({SQL_SCRIPT_INSERT_TABLES_PATH}):")
-            log.info("\n" + content)
-            self.cursor.executescript(content)
+            log.debug(f"Exectuted SQL script ({SQL_SCRIPT_INSERT_TABLES_PATH}):")
+            log.debug("\n" + content)
+            self.conn.executescript(content)
             self.conn.commit()
 
         emails = [
@@ -587,7 +2364,9 @@ class Database(Singleton):
     ################################################################ 
 
     def close(self):
-        """Closes the database connection."""
+        """Closes the database connections."""
+        while not self._read_pool.empty():
+            self._read_pool.get_nowait().close()
         self.conn.close()
 
 
@@ -1,3 +1,16 @@
 
 VERBOSE = True
 DEFAULT_LOGGED_IN_EMAIL = "tra0163@vsb.cz"
+
+# database file can be overridden from the environment (e.g. to run against a fixture)
+DATABASE_FILE_ENV = "EMAIL_CLIENT_DB"
+DEFAULT_DATABASE_FILE = "db/emails.db"
+
+# record timings and query plans of the database reads from the start (see query_profiler)
+PROFILE_QUERIES = False
+
+# emails older than this are moved into the yearly archives by 'dev.py archive' (see Database.archive_emails_before)
+ARCHIVE_AFTER_DAYS = 2 * 365
+
+# snapshots kept by the backups ('dev.py backup', File > Back Up Mailbox), see backup.py
+BACKUP_KEEP = 5
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+"""
+Developer commands for the email client.
+
+Usage: python3 ./src/dev.py [--db FILE] <command> [options]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import debug
+
+
+def cmd_seed(args: argparse.Namespace):
+    from database import Database
+
+    db = Database()
+    db.seed_dummy_data(reset=not args.keep)
+    print(f"Seeded dummy data into '{db.db_file}'")
+
+
+def cmd_bench(args: argparse.Namespace):
+    import benchmarks
+    from database import Database
+
+    ok = benchmarks.BENCHMARKS[args.name](Database())
+    if not ok:
+        sys.exit(1)
+
+
+def cmd_profile(args: argparse.Namespace):
+    import benchmarks
+    from database import Database
+
+    ok = benchmarks.profile_hot_queries(Database(), strict=args.strict, json_path=args.json)
+    if not ok:
+        sys.exit(1)
+
+
+def cmd_check_plans(args: argparse.Namespace):
+    import benchmarks
+    from database import Database
+
+    if not benchmarks.check_query_plans(Database()):
+        sys.exit(1)
+
+
+def cmd_generate(args: argparse.Namespace):
+    import mailbox_generator
+    from database import Database
+
+    db = Database()
+    spec = args.spec
+    print(f"Generating {spec.emails} emails of {spec.users} users (seed {spec.seed}) into '{db.db_file}'")
+
+    def on_progress(p: "mailbox_generator.GenerateProgress"):
+        print(f"\r{p.emails}/{p.total} emails ({p.emails_per_second:.0f} emails/s)", end="", flush=True)
+
+    mailbox_generator.generate_mailbox(db, spec, on_progress=on_progress)
+    # closing the last connection checkpoints the WAL, the fixture is a single file
+    db.close()
+    print()
+
+
+def cmd_import(args: argparse.Namespace):
+    import importer
+    from database import Database
+
+    def on_progress(p: "importer.ImportProgress"):
+        print(f"\r{p.messages_read} read, {p.imported} imported, {p.skipped} skipped ({p.messages_per_second:.0f} msg/s)", end="", flush=True)
+
+    try:
+        importer.import_mailbox(Database(), args.path, workers=args.workers, on_progress=on_progress)
+    except ValueError as e:
+        sys.exit(str(e))
+    print()
+
+
+def cmd_archive(args: argparse.Namespace):
+    from datetime import datetime, timedelta, timezone
+    from database import Database
+    from importer import SENT_AT_FORMAT
+
+    if args.before:
+        cutoff = datetime.fromisoformat(args.before)
+    else:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+
+    db = Database()
+    print(f"Archiving the emails sent before {cutoff.strftime(SENT_AT_FORMAT)}")
+
+    def on_progress(archived: int):
+        print(f"\r{archived} emails archived", end="", flush=True)
+
+    db.archive_emails_before(cutoff.strftime(SENT_AT_FORMAT), on_progress=on_progress)
+    print()
+
+    for archive in db.fetch_archives():
+        print(f"{archive.year}  {archive.email_count:>9} emails  {archive.filename}")
+
+    if args.vacuum:
+        db.vacuum()
+    db.close()
+
+
+def cmd_backup(args: argparse.Namespace):
+    import backup
+    from database import Database
+
+    db = Database()
+
+    def on_progress(p: "backup.BackupProgress"):
+        print(f"\r{p.pages_copied}/{p.total_pages} pages ({p.fraction:.0%})", end="", flush=True)
+
+    path = backup.backup_database(db, keep=args.keep, on_progress=on_progress)
+    print()
+
+    for snapshot in backup.snapshot_paths(db):
+        print(f"{os.path.getsize(snapshot) / 2**20:>9.1f} MiB  {snapshot}" + ("  (new)" if snapshot == path else ""))
+
+
+def prepare_generate(args: argparse.Namespace):
+    """Builds the spec and picks a fresh database file, before the database is opened."""
+    import mailbox_generator
+
+    overrides = {name: getattr(args, name) for name in (
+        "emails", "users", "min_recipients", "max_recipients", "inbox_share", "sent_share",
+        "draft_share", "body_words_median", "reply_share", "attachment_share", "distinct_attachments", "seed",
+    )}
+    args.spec = mailbox_generator.spec_of(args.preset, **overrides)
+    args.db = args.db or mailbox_generator.fixture_path(args.spec)
+
+    if os.path.exists(args.db):
+        if not args.force:
+            sys.exit(f"'{args.db}' already exists, pass --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="dev.py", description="Developer commands for the email client.")
+    parser.add_argument("--db", help=f"database file to work with (default: {debug.DEFAULT_DATABASE_FILE})")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="fill the database with dummy data")
+    seed.add_argument("--keep", action="store_true", help="keep the existing data instead of dropping the tables first")
+    seed.set_defaults(handler=cmd_seed)
+
+    bench = commands.add_parser("bench", help="run a benchmark (on a scratch database unless --db is given)")
+    bench.add_argument("name", choices=["folder-queries", "search", "user-lookups", "import", "model-memory", "compression", "archive", "backup"])
+    bench.set_defaults(handler=cmd_bench, scratch_database=True)
+
+    import_ = commands.add_parser("import", help="import an mbox file or a Maildir directory")
+    import_.add_argument("path", help="mbox file or Maildir directory")
+    import_.add_argument("--workers", type=int, help="parser processes (default: number of CPUs)")
+    import_.set_defaults(handler=cmd_import)
+
+    archive = commands.add_parser("archive", help="move the old emails into per-year archive files (db/archive/)")
+    cutoff = archive.add_mutually_exclusive_group()
+    cutoff.add_argument("--before", metavar="DATE", help="archive the emails sent before this date (YYYY-MM-DD)")
+    cutoff.add_argument("--older-than-days", type=int, default=debug.ARCHIVE_AFTER_DAYS, help=f"archive the emails older than this (default: {debug.ARCHIVE_AFTER_DAYS})")
+    archive.add_argument("--vacuum", action="store_true", help="shrink the main database file afterwards")
+    archive.set_defaults(handler=cmd_archive)
+
+    backup = commands.add_parser("backup", help="copy the live database into a snapshot (db/backup/), keeping the last ones")
+    backup.add_argument("--keep", type=int, default=debug.BACKUP_KEEP, help=f"snapshots kept (default: {debug.BACKUP_KEEP})")
+    backup.set_defaults(handler=cmd_backup)
+
+    generate = commands.add_parser("generate", help="generate a deterministic synthetic mailbox (default file: db/fixtures/mailbox-<emails>.db)")
+    generate.add_argument("--preset", choices=["10k", "100k", "1m"], default="10k", help="size preset the other options override (default: 10k)")
+    generate.add_argument("--emails", type=int)
+    generate.add_argument("--users", type=int)
+    generate.add_argument("--min-recipients", type=int)
+    generate.add_argument("--max-recipients", type=int)
+    generate.add_argument("--inbox-share", type=float, help="share of the emails received by the logged-in user")
+    generate.add_argument("--sent-share", type=float, help="share of the emails sent by the logged-in user")
+    generate.add_argument("--draft-share", type=float, help="share of the logged-in user's emails that are drafts")
+    generate.add_argument("--body-words", type=int, dest="body_words_median", help="median body size in words (log-normal)")
+    generate.add_argument("--reply-share", type=float, help="share of the emails replying to a recent one (same thread)")
+    generate.add_argument("--attachment-share", type=float, help="share of the emails with attachments")
+    generate.add_argument("--distinct-attachments", type=int, help="size of the pool the attachments are picked from")
+    generate.add_argument("--seed", type=int)
+    generate.add_argument("--force", action="store_true", help="replace the database file if it exists")
+    generate.set_defaults(handler=cmd_generate, prepare=prepare_generate)
+
+    profile = commands.add_parser("profile", help="profile the hot queries (on a scratch database unless --db is given)")
+    profile.add_argument("--strict", action="store_true", help="fail if any of them does a full table scan")
+    profile.add_argument("--json", metavar="FILE", help="also write the report as JSON")
+    profile.set_defaults(handler=cmd_profile, scratch_database=True)
+
+    check_plans = commands.add_parser("check-plans", help="check the query plans of every fetch_* method (on a scratch database unless --db is given)")
+    check_plans.set_defaults(handler=cmd_check_plans, scratch_database=True)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    # benchmarks shouldn't touch the real mailbox
+    if not args.db and getattr(args, "scratch_database", False):
+        args.db = os.path.join(tempfile.mkdtemp(prefix="email-client-"), "scratch.db")
+
+    if getattr(args, "prepare", None):
+        args.prepare(args)
+
+    # must be set before the database module is imported (it opens the database on import)
+    if args.db:
+        os.environ[debug.DATABASE_FILE_ENV] = args.db
+
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
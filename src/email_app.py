@@ -8,15 +8,18 @@ import tkinter as tk
 from pathlib import Path
 from preferences import FontBuilder, ThemeConfig
 from models import EmailStatus
+from debug import DEFAULT_LOGGED_IN_EMAIL
 from comps import email_editor
 from vendor import sv_ttk
 
-from modals import ModalSendNonValidEmail, ModalShowHierarchy, ModalShowWidgetInfo
+from modals import ModalQueryProfile, ModalSendNonValidEmail, ModalShowHierarchy, ModalShowWidgetInfo
 from lib.utils import get_hierarchy_string
 from lib.application import Application
 from lib.image_manager import ImageManager
 from lib.logger import log
 from database import Database
+from async_database import AsyncDatabase
+from backup import BackupCancelled, BackupService
 from comps.layout_sidebar import LayoutSidebar
 from comps.layout_view import LayoutView
 from comps.menubar import MenuBar
@@ -24,12 +27,18 @@ from comps.statusbar import StatusBar
 from stores import email_with_attachments_store
 
 
+# how often the status bar shows the progress of a running backup
+BACKUP_POLL_MS = 250
+
+
 class EmailClientApp(Application):
     def __init__(self):
         super().__init__()
 
         ThemeConfig(self.tk_instance)
         Database().__init__()
+        self.ensure_logged_in_user()
+        AsyncDatabase().attach(self.tk_instance)
         ImageManager().__init__()
         self.load_assets()
 
@@ -46,8 +55,16 @@ class EmailClientApp(Application):
         log.info(f"Event: {e}")
 
         match e.name:
+            case "menu_bar.file_menu.backup_button#click":
+                self.start_backup()
+
             case "menu_bar.file_menu.quit_button#click":
-                if messagebox.askyesno(title="Quit program", message="Do you really want to quit?"):
+                message = "Do you really want to quit?"
+                if BackupService().is_running():
+                    message += " The running backup will be cancelled."
+                if messagebox.askyesno(title="Quit program", message=message):
+                    AsyncDatabase().shutdown()
+                    BackupService().shutdown()
                     self.tk_instance.destroy()
 
             case "menu_bar.debug_menu.show_hierarchy_button#click":
@@ -59,6 +76,9 @@ class EmailClientApp(Application):
             case "menu_bar.debug_menu.print_comp_detail_button#click":
                 self.start_capture()
 
+            case "menu_bar.debug_menu.show_query_profile_button#click":
+                ModalQueryProfile(self.tk_instance)
+
             case "app_widget_capture#caught":
                 w = e.data.get("captured_widget")
                 assert isinstance(w, tk.Widget), "Failed to captured a widget!"
@@ -71,6 +91,7 @@ class EmailClientApp(Application):
                 action = store_content["action"]
                 is_editing_email = store_content["is_editing_email"]
                 editing_email_id = store_content["editing_email_id"]
+                replying_to_email_id = store_content["replying_to_email_id"]
                 email = store_content["email"]
                 attachments = store_content["attachments"]
                 validation = store_content["validation"]
@@ -81,6 +102,8 @@ class EmailClientApp(Application):
                 assert isinstance(action, email_with_attachments_store.ActionEnum)
 
                 db = Database()
+                # on the writer thread, waiting for the writer (an import, an archive) doesn't freeze the window
+                write = AsyncDatabase().submit_write
 
                 assert email.sender_email, "Should always be set."
 
@@ -96,72 +119,57 @@ class EmailClientApp(Application):
 
                     # if the sent email is email that been sitting in the draft
                     if is_editing_email:
-                        # update the draft to be sent_draft
-                        # draft that has been sent
-                        # now it shouldnt be visible in drafts view
-                        db.update_email_by_id(
+                        # the draft becomes a sent_draft, no longer visible in drafts view,
+                        # and the sent email replies to what the draft replied to
+                        write(
+                            db.send_draft,
                             editing_email_id,
-                            email.subject or "", 
-                            email.body or "", 
-                            status=EmailStatus.SENT_DRAFT
-                        )
-
-                        db.delete_recipients_of_email(editing_email_id)
-                        db.delete_attachments_of_email(editing_email_id)
-
-                        db.insert_email_with_recipients_and_attachments(
                             email.sender_email, 
                             email.subject, 
                             email.body, 
                             email.recipients, 
-                            attachments.attachments
+                            attachments.attachments,
+                            on_error=self.on_write_error,
                         )
                     # if the email is not a draft
                     else:
-                        db.insert_email_with_recipients_and_attachments(
+                        write(
+                            db.insert_email_with_recipients_and_attachments,
                             email.sender_email, 
                             email.subject,
                             email.body,
                             email.recipients, 
                             attachments.attachments,
-                            status=EmailStatus.SENT
+                            status=EmailStatus.SENT,
+                            in_reply_to=replying_to_email_id,
+                            on_error=self.on_write_error,
                         )
                 elif action == email_with_attachments_store.ActionEnum.SAVE:
                     # if this email is already a draft itself
                     # update it instead of creating a new one
                     if is_editing_email:
-                        db.update_email_by_id(
+                        write(
+                            db.save_draft,
                             editing_email_id,
                             email.subject or "", 
                             email.body or "", 
-                            status=EmailStatus.DRAFT,
+                            email.recipients, 
+                            attachments.attachments,
+                            on_error=self.on_write_error,
                         )
 
-                        db.delete_recipients_of_email(editing_email_id)
-
-                        for rec_email in email.recipients:
-                            rec = db.fetch_user_by_email(rec_email)
-                            if not rec:
-                                rec = db.insert_user(rec_email)
-                            db.insert_email_recipient(editing_email_id, rec.user_id)
-
-                        db.delete_attachments_of_email(editing_email_id)
-
-                        for attch_path in attachments.attachments:
-                            with open(attch_path, "r") as f:
-                                blob = f.read()
-                                attch = db.insert_attachment(attch_path, attch_path, blob)
-                                db.insert_email_attachment(editing_email_id, attch.attachment_id)
-
                     # if its a new email we want to save, then create a new email
                     else:
-                        db.insert_email_with_recipients_and_attachments(
+                        write(
+                            db.insert_email_with_recipients_and_attachments,
                             email.sender_email, 
                             email.subject or "", 
                             email.body or "", 
                             email.recipients, 
                             attachments.attachments,
-                            status=EmailStatus.DRAFT
+                            status=EmailStatus.DRAFT,
+                            in_reply_to=replying_to_email_id,
+                            on_error=self.on_write_error,
                         )
 
                 # clear store so no duplication and weird stuff happens
@@ -170,10 +178,48 @@ class EmailClientApp(Application):
 
         return False
 
-                
+
+    def on_write_error(self, error: BaseException):
+        log.error(f"Saving the email failed: {error!r}")
+        messagebox.showerror(title="Email not saved", message=str(error))
+
+    def ensure_logged_in_user(self):
+        """The database is persistent and may be empty on the first start."""
+        db = Database()
+        if db.fetch_user_by_email(DEFAULT_LOGGED_IN_EMAIL) is None:
+            db.insert_user(DEFAULT_LOGGED_IN_EMAIL)
+
+    def start_backup(self):
+        """Backs up the mailbox on the backup worker, the window stays usable and shows the progress."""
+        service = BackupService()
+        if service.is_running():
+            return
+
+        future = service.start()
+
+        def poll():
+            if not future.done():
+                progress = service.progress
+                if progress:
+                    self.statusbar.set_text(f"Backing up the mailbox... {progress.fraction:.0%}")
+                self.tk_instance.after(BACKUP_POLL_MS, poll)
+                return
+
+            error = future.exception()
+            if error is None:
+                self.statusbar.set_text(f"Mailbox backed up into '{future.result()}'")
+            elif not isinstance(error, BackupCancelled):
+                log.error(f"Backup failed: {error!r}")
+                self.statusbar.set_text("")
+                messagebox.showerror(title="Backup failed", message=str(error))
+
+        self.statusbar.set_text("Backing up the mailbox...")
+        poll()
+
     def render(self):
         self.layout_sidebar.pack(side="left", expand=False)
         self.layout_view.pack(side="right")
+        self.statusbar.pack(side="bottom", fill="x", expand=False, padx=0, pady=0, before=self.main_frame)
 
     def load_assets(self):
         @dataclass
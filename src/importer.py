@@ -0,0 +1,246 @@
+"""
+Bulk import of mbox files and Maildir directories.
+
+The messages are parsed in a process pool (in chunks, so the workers aren't
+fed one message at a time) and written by a single writer in large batches,
+see Database.insert_parsed_emails.
+
+    python3 ./src/dev.py import ~/mail/archive.mbox
+"""
+
+import hashlib
+import mailbox
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email import message_from_bytes
+from email.header import decode_header, make_header
+from email.message import Message
+from email.utils import getaddresses, parseaddr, parsedate_to_datetime
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional
+
+from lib.logger import log
+from models import ParsedAttachment, ParsedEmail
+
+if TYPE_CHECKING:
+    # not imported at runtime, the worker processes would open the database on import
+    from database import Database
+
+
+# messages sent to a worker at once
+PARSE_CHUNK_SIZE = 500
+
+# messages written (and committed) together
+WRITE_BATCH_SIZE = 5000
+
+SENT_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@dataclass
+class ImportProgress:
+    messages_read: int
+    imported: int
+    skipped: int  # messages without a sender address
+    elapsed_seconds: float
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages_read / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+ProgressCallback = Callable[[ImportProgress], None]
+
+
+def iter_raw_messages(path: str) -> Iterator[bytes]:
+    """Raw messages of a Maildir directory or an mbox file."""
+    if os.path.isdir(path):
+        source: mailbox.Mailbox = mailbox.Maildir(path, factory=None, create=False)
+    else:
+        source = mailbox.mbox(path, create=False)
+
+    try:
+        for key in source.iterkeys():
+            yield source.get_bytes(key)
+    finally:
+        source.close()
+
+
+def _decode(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except (UnicodeError, LookupError, ValueError):
+        return value
+
+
+def _sent_at_of(message: Message) -> str:
+    date = message.get("Date")
+    try:
+        sent_at = parsedate_to_datetime(date) if date else None
+    except (TypeError, ValueError):
+        sent_at = None
+
+    if sent_at is None:
+        return datetime.now(timezone.utc).strftime(SENT_AT_FORMAT)
+    if sent_at.tzinfo is not None:
+        sent_at = sent_at.astimezone(timezone.utc)
+    return sent_at.strftime(SENT_AT_FORMAT)
+
+
+def _payload_text(part: Message) -> str:
+    payload = part.get_payload(decode=True)
+    if not isinstance(payload, bytes):
+        return ""
+    charset = part.get_content_charset() or "utf-8"
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
+
+
+def _body_and_attachments(message: Message) -> tuple[str, list[ParsedAttachment]]:
+    plain: Optional[str] = None
+    html: Optional[str] = None
+    attachments: list[ParsedAttachment] = []
+
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+
+        filename = part.get_filename()
+        if filename or part.get_content_disposition() == "attachment":
+            data = part.get_payload(decode=True)
+            if isinstance(data, bytes):
+                attachments.append(ParsedAttachment(_decode(filename) or "attachment", hashlib.sha256(data).hexdigest(), data))
+        elif part.get_content_type() == "text/plain" and plain is None:
+            plain = _payload_text(part)
+        elif part.get_content_type() == "text/html" and html is None:
+            html = _payload_text(part)
+
+    return plain if plain is not None else (html or ""), attachments
+
+
+def parse_message(raw: bytes) -> Optional[ParsedEmail]:
+    """Parses one raw message, None if it has no sender address."""
+    message = message_from_bytes(raw)
+
+    sender_name, sender_email = parseaddr(_decode(message.get("From")))
+    sender_email = sender_email.strip().lower()
+    if not sender_email:
+        return None
+
+    recipient_headers = [_decode(v) for header in ("To", "Cc") for v in message.get_all(header, [])]
+    recipient_emails = [address.strip().lower() for _, address in getaddresses(recipient_headers) if address.strip()]
+
+    first_name, _, last_name = sender_name.strip().partition(" ")
+    body, attachments = _body_and_attachments(message)
+
+    return ParsedEmail(
+        sender_email=sender_email,
+        sender_first_name=first_name or None,
+        sender_last_name=last_name or None,
+        recipient_emails=recipient_emails,
+        subject=_decode(message.get("Subject")),
+        body=body,
+        sent_at=_sent_at_of(message),
+        attachments=attachments,
+    )
+
+
+def parse_messages(raws: list[bytes]) -> list[Optional[ParsedEmail]]:
+    """Runs in a worker process."""
+    return [parse_message(raw) for raw in raws]
+
+
+def _chunks(items: Iterable[bytes], size: int) -> Iterator[list[bytes]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _parse_in_pool(pool: ProcessPoolExecutor, chunks: Iterator[list[bytes]], max_in_flight: int) -> Iterator[list[Optional[ParsedEmail]]]:
+    """Like pool.map, but reads the mailbox only as far as the chunks being parsed (map reads it all upfront)."""
+    in_flight: deque[Future] = deque()
+
+    for chunk in chunks:
+        in_flight.append(pool.submit(parse_messages, chunk))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def import_messages(
+    db: "Database",
+    raw_messages: Iterable[bytes],
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> ImportProgress:
+    """
+    Imports the raw messages. With a single worker the messages are parsed in
+    this process, otherwise in a process pool while this process writes.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    progress = ImportProgress(0, 0, 0, 0.0)
+
+    # addresses seen so far -> user id, shared by all the batches
+    user_ids: dict[str, int] = {}
+    batch: list[ParsedEmail] = []
+
+    def write_batch():
+        progress.imported += len(db.insert_parsed_emails(batch, user_ids))
+        batch.clear()
+
+    def report():
+        progress.elapsed_seconds = time.perf_counter() - start
+        if on_progress:
+            on_progress(progress)
+
+    def consume(parsed_chunks: Iterable[list[Optional[ParsedEmail]]]):
+        for parsed_chunk in parsed_chunks:
+            for parsed in parsed_chunk:
+                progress.messages_read += 1
+                if parsed is None:
+                    progress.skipped += 1
+                else:
+                    batch.append(parsed)
+
+            if len(batch) >= WRITE_BATCH_SIZE:
+                write_batch()
+                report()
+
+    chunks = _chunks(raw_messages, PARSE_CHUNK_SIZE)
+    if workers == 1:
+        consume(map(parse_messages, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            consume(_parse_in_pool(pool, chunks, max_in_flight=2 * workers))
+
+    write_batch()
+    report()
+
+    log.info(
+        f"Imported {progress.imported} of {progress.messages_read} messages "
+        f"({progress.skipped} skipped) in {progress.elapsed_seconds:.1f} s"
+    )
+    return progress
+
+
+def import_mailbox(
+    db: "Database",
+    path: str,
+    workers: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> ImportProgress:
+    """Imports an mbox file or a Maildir directory."""
+    if not os.path.exists(path):
+        raise ValueError(f"Mailbox '{path}' doesn't exist.")
+
+    return import_messages(db, iter_raw_messages(path), workers=workers, on_progress=on_progress)
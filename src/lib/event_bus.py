@@ -1,7 +1,7 @@
 import re
 from enum import StrEnum
 from dataclasses import dataclass
-from typing import Callable, Any, Dict, List, Optional, Union, overload
+from typing import Callable, Any, Dict, Iterable, List, Optional, Union, overload
 from lib.types import Singleton
 
 EventName = str
@@ -50,23 +50,32 @@ class EventPatternSubscriber:
 class EventSubscription:
     event_name: EventName 
     event_callback: EventCallback
+    batch: bool = False
 
 
 class EventBus(Singleton):
     _subscribers: Dict[EventName, List[EventCallback]]
+    _batch_subscribers: Dict[EventName, List[EventCallback]]
     _pattern_subscribers: List[EventPatternSubscriber]
 
     def __init__(self):
         self._subscribers = {}
+        self._batch_subscribers = {}
         self._pattern_subscribers = []
 
-    def subscribe(self, event_name: EventName, event_callback: EventCallback):
+    def subscribe(self, event_name: EventName, event_callback: EventCallback, batch: bool = False):
+        """
+        With batch=True the callback gets the events of that name published together
+        (see publish_batch) at once: a single Event whose data["batch"] holds the data
+        of each of them, in order. An event published on its own is a batch of one.
+        """
         if re.match(EventPattern.EXACT, event_name) is None:
             raise ValueError(f"Cannot subscribe to an event: '{event_name}'! (Incorrent naming convention)")
 
-        if event_name not in self._subscribers:
-            self._subscribers[event_name] = []
-        self._subscribers[event_name].append(event_callback)
+        subscribers = self._batch_subscribers if batch else self._subscribers
+        if event_name not in subscribers:
+            subscribers[event_name] = []
+        subscribers[event_name].append(event_callback)
 
     def subscribe_pattern(self, event_name_pattern: str, event_callback: EventCallback):
         subscriber = EventPatternSubscriber(event_name_pattern, event_callback)
@@ -74,6 +83,32 @@ class EventBus(Singleton):
 
 
     def publish(self, event: Union[Event, EventName, EventPublishment], data: Optional[EventData] = None):
+        self._publish_events([self._event_of(event, data)])
+
+    def publish_batch(self, events: Iterable[Union[Event, EventName, EventPublishment]]):
+        """
+        Publishes the events in order to their subscribers, then calls each batch
+        subscriber once with all the (unhandled) events of its name, e.g. the events
+        of a committed transaction, so a view refreshes once for a thousand rows.
+        """
+        self._publish_events([self._event_of(event) for event in events])
+
+    def _publish_events(self, events: List[Event]):
+        batches: Dict[EventName, List[Event]] = {}
+        for event in events:
+            is_handled = self._publish_one(event)
+            if not is_handled and event.name in self._batch_subscribers:
+                batches.setdefault(event.name, []).append(event)
+
+        for event_name, batch in batches.items():
+            batch_event = Event(name=event_name, data={"batch": [e.data for e in batch]})
+            for callback in list(self._batch_subscribers.get(event_name, [])):
+                is_handled = callback(batch_event)
+                if is_handled:
+                    break
+
+    @staticmethod
+    def _event_of(event: Union[Event, EventName, EventPublishment], data: Optional[EventData] = None) -> Event:
         if isinstance(event, EventName):
             event = Event(name=event, data=data)
 
@@ -83,7 +118,10 @@ class EventBus(Singleton):
 
         if re.match(EventPattern.EXACT, event.name) is None:
             raise ValueError(f"Cannot publish an event: '{event.name}'! (Incorrent naming convention)")
-        
+
+        return event
+
+    def _publish_one(self, event: Event) -> bool:
         # call the pattern subscriber's callback if their pattern 
         # captures the published event name 
         for s in self._pattern_subscribers:
@@ -93,27 +131,30 @@ class EventBus(Singleton):
 
             is_handled = s.callback(event)
             if is_handled:
-                return
+                return True
 
         # call the subscriber's callback if they 
         # are subscribed to the published event
         for callback in self._subscribers.get(event.name, []):
             is_handled = callback(event)
             if is_handled:
-                return
+                return True
+
+        return False
     
     def unsubscribe_for(self, obj: object):
         """Unsubscribes all subscriptions of the object (its bound methods) and returns them."""
 
         unsubed_subscriptions: list[EventSubscription] = []
 
-        for event_name, callbacks in self._subscribers.items():
-            for callback in callbacks:
-                # check if the callback is a bound method
-                if hasattr(callback, "__self__") and callback.__self__ is obj:
-                    sub = EventSubscription(event_name, callback)
-                    unsubed_subscriptions.append(sub)
-                    self._subscribers[event_name].remove(callback)
+        for subscribers, batch in ((self._subscribers, False), (self._batch_subscribers, True)):
+            for event_name, callbacks in subscribers.items():
+                for callback in callbacks:
+                    # check if the callback is a bound method
+                    if hasattr(callback, "__self__") and callback.__self__ is obj:
+                        sub = EventSubscription(event_name, callback, batch)
+                        unsubed_subscriptions.append(sub)
+                        subscribers[event_name].remove(callback)
 
         return unsubed_subscriptions
 
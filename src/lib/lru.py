@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Mapping bounded to max_size entries, the least recently used entry is evicted first.
+    Not thread-safe, the owner guards it with its own lock.
+    """
+
+    max_size: int
+    _entries: "OrderedDict[K, V]"
+
+    def __init__(self, max_size: int):
+        if max_size <= 0:
+            raise ValueError(f"LRU cache size must be positive, got {max_size}")
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key: K) -> Optional[V]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> Optional[tuple[K, V]]:
+        """Stores the value, returns the (key, value) evicted to make room (if any)."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self.max_size:
+            return self._entries.popitem(last=False)
+        return None
+
+    def pop(self, key: K) -> Optional[V]:
+        return self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
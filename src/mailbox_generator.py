@@ -0,0 +1,231 @@
+"""
+Deterministic synthetic mailboxes for scale testing.
+
+The same spec (including the seed) always generates the same mailbox, so a
+fixture can be rebuilt instead of shared:
+
+    python3 ./src/dev.py generate --preset 100k
+    EMAIL_CLIENT_DB=db/fixtures/mailbox-100k.db make
+
+The emails are written through the bulk import path (Database.insert_parsed_emails).
+"""
+
+import hashlib
+import math
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+from debug import DEFAULT_LOGGED_IN_EMAIL
+from importer import SENT_AT_FORMAT, WRITE_BATCH_SIZE
+from models import EmailStatus, ParsedAttachment, ParsedEmail
+
+if TYPE_CHECKING:
+    from database import Database
+
+
+# the replies answer one of this many latest emails (a few days of the presets, inside the thread window)
+RECENT_EMAILS = 20
+
+# words of the generated subjects, so the mailbox is searchable
+WORDS = (
+    "meeting report invoice project budget review schedule update release deadline "
+    "contract agenda travel lunch design feedback proposal launch hiring quarterly "
+    "server backup migration database customer support ticket payment order delivery"
+).split()
+
+# the bodies mostly use a larger vocabulary, so a single word matches a realistic share of the mailbox
+BODY_WORDS = WORDS + [f"word{i}" for i in range(2000)]
+
+FIRST_NAMES = "Anna Petr Jana Tomas Eva Martin Lucie Jakub Tereza David Klara Ondrej Marie Filip Alena Lukas".split()
+LAST_NAMES = "Novak Svoboda Dvorak Cerny Prochazka Kucera Vesely Horak Nemec Marek Pospisil Hajek Jelinek Kral".split()
+ATTACHMENT_EXTENSIONS = ("pdf", "xlsx", "docx", "png", "zip")
+
+FIXTURE_DIR = "db/fixtures"
+
+
+@dataclass(frozen=True)
+class MailboxSpec:
+    emails: int = 10_000
+    users: int = 500
+    # per email, uniformly distributed
+    min_recipients: int = 1
+    max_recipients: int = 3
+    # emails received and sent by the logged-in user, the rest are between other users (All Mail only)
+    inbox_share: float = 0.6
+    sent_share: float = 0.3
+    # of the emails sent by the logged-in user
+    draft_share: float = 0.1
+    # body sizes in words are log-normal: median exp(mu), long tail by sigma
+    body_words_median: int = 60
+    body_words_sigma: float = 1.0
+    max_body_words: int = 20_000
+    # emails replying to one of the recent ones ('Re: ' and its subject to its participants, so they share the thread)
+    reply_share: float = 0.3
+    # emails with attachments, picked from a pool of distinct files (stored once each)
+    attachment_share: float = 0.05
+    max_attachments_per_email: int = 3
+    distinct_attachments: int = 200
+    attachment_kib_median: int = 64
+    attachment_kib_max: int = 8 * 1024
+    # the emails are spread evenly over the years before the end date
+    end_date: datetime = datetime(2025, 1, 1)
+    years: int = 10
+    seed: int = 0
+
+
+PRESETS = {
+    "10k": MailboxSpec(emails=10_000, users=500),
+    "100k": MailboxSpec(emails=100_000, users=2_000),
+    "1m": MailboxSpec(emails=1_000_000, users=10_000, distinct_attachments=1_000),
+}
+
+
+@dataclass
+class GenerateProgress:
+    emails: int
+    total: int
+    elapsed_seconds: float
+
+    @property
+    def emails_per_second(self) -> float:
+        return self.emails / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+ProgressCallback = Callable[[GenerateProgress], None]
+
+
+def spec_of(preset: str, **overrides) -> MailboxSpec:
+    """The preset with the given fields replaced (None values are ignored)."""
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset '{preset}', choose from {list(PRESETS)}")
+    return replace(PRESETS[preset], **{k: v for k, v in overrides.items() if v is not None})
+
+
+def fixture_path(spec: MailboxSpec) -> str:
+    name = f"mailbox-{spec.emails}" + (f"-seed{spec.seed}" if spec.seed else "")
+    return f"{FIXTURE_DIR}/{name}.db"
+
+
+class MailboxGenerator:
+    """Generates the users and the emails of a spec, the random state is private to the generator."""
+
+    def __init__(self, spec: MailboxSpec):
+        if spec.min_recipients < 1 or spec.max_recipients < spec.min_recipients:
+            raise ValueError(f"Invalid recipient range {spec.min_recipients}-{spec.max_recipients}")
+        if spec.users <= spec.max_recipients:
+            raise ValueError(f"Need more than {spec.max_recipients} users, got {spec.users}")
+        if spec.inbox_share + spec.sent_share > 1:
+            raise ValueError("inbox_share and sent_share must add up to at most 1")
+
+        self.spec = spec
+        self.rnd = random.Random(spec.seed)
+        self.me = DEFAULT_LOGGED_IN_EMAIL
+        self.others = [f"user{i}@example.com" for i in range(spec.users - 1)]
+        self._attachments: dict[int, ParsedAttachment] = {}
+
+    def users(self) -> Iterator[tuple[str, str, str]]:
+        """(email, first name, last name) of every user, the logged-in user first."""
+        names = random.Random(self.spec.seed)
+        for email in [self.me, *self.others]:
+            yield email, names.choice(FIRST_NAMES), names.choice(LAST_NAMES)
+
+    def emails(self) -> Iterator[ParsedEmail]:
+        spec, rnd = self.spec, self.rnd
+        first_sent_at = spec.end_date - timedelta(days=365 * spec.years)
+        step = (spec.end_date - first_sent_at) / spec.emails
+        mu = math.log(spec.body_words_median)
+        # (subject, participants) of the latest emails
+        recent_emails: deque[tuple[str, list[str]]] = deque(maxlen=RECENT_EMAILS)
+
+        for i in range(spec.emails):
+            recipient_count = rnd.randint(spec.min_recipients, spec.max_recipients)
+            # one extra, so there are enough left when the sender is among them
+            recipients = rnd.sample(self.others, recipient_count + 1)
+            status = EmailStatus.SENT
+
+            share = rnd.random()
+            if share < spec.inbox_share:
+                sender = rnd.choice(self.others)
+                recipients[0] = self.me
+            elif share < spec.inbox_share + spec.sent_share:
+                sender = self.me
+                if rnd.random() < spec.draft_share:
+                    status = EmailStatus.DRAFT
+            else:
+                sender = rnd.choice(self.others)
+
+            if recent_emails and rnd.random() < spec.reply_share:
+                # to everyone of the replied email (and the user in the inbox share)
+                subject, participants = rnd.choice(recent_emails)
+                subject = "Re: " + subject
+                recipients = [p for p in participants if p != sender]
+                if share < spec.inbox_share and self.me not in recipients:
+                    recipients.insert(0, self.me)
+                recipient_count = len(recipients)
+            else:
+                subject = " ".join(rnd.choices(WORDS, k=rnd.randint(2, 6))).capitalize()
+
+            recipient_emails = [r for r in recipients if r != sender][:recipient_count]
+            if not subject.startswith("Re: "):
+                recent_emails.append((subject, [sender, *recipient_emails]))
+
+            body_words = min(spec.max_body_words, max(1, int(rnd.lognormvariate(mu, spec.body_words_sigma))))
+            attachment_count = rnd.randint(1, spec.max_attachments_per_email) if rnd.random() < spec.attachment_share else 0
+
+            yield ParsedEmail(
+                sender_email=sender,
+                sender_first_name=None,
+                sender_last_name=None,
+                recipient_emails=recipient_emails,
+                subject=subject,
+                body=" ".join(rnd.choices(BODY_WORDS, k=body_words)),
+                sent_at=(first_sent_at + step * i + timedelta(seconds=rnd.randrange(60))).strftime(SENT_AT_FORMAT),
+                attachments=[self._attachment(rnd.randrange(spec.distinct_attachments)) for _ in range(attachment_count)],
+                status=status,
+            )
+
+    def _attachment(self, index: int) -> ParsedAttachment:
+        """The index-th file of the pool, its content depends only on the seed and the index."""
+        attachment = self._attachments.get(index)
+        if attachment is None:
+            rnd = random.Random(f"{self.spec.seed}-attachment-{index}")
+            kib = rnd.lognormvariate(math.log(self.spec.attachment_kib_median), 1.0)
+            data = rnd.randbytes(int(min(self.spec.attachment_kib_max, max(1, kib)) * 1024))
+            filename = f"{rnd.choice(WORDS)}-{index}.{rnd.choice(ATTACHMENT_EXTENSIONS)}"
+            attachment = ParsedAttachment(filename, hashlib.sha256(data).hexdigest(), data)
+            self._attachments[index] = attachment
+        return attachment
+
+
+def generate_mailbox(db: "Database", spec: MailboxSpec, on_progress: Optional[ProgressCallback] = None) -> GenerateProgress:
+    """Writes the spec's mailbox into the database in import batches."""
+    generator = MailboxGenerator(spec)
+    start = time.perf_counter()
+    progress = GenerateProgress(0, spec.emails, 0.0)
+
+    # named users first, the import path would add the recipients without names
+    user_ids: dict[str, int] = {}
+    with db.transaction():
+        for email, first_name, last_name in generator.users():
+            user_ids[email] = db.insert_user(email, first_name, last_name).user_id
+
+    batch: list[ParsedEmail] = []
+
+    def write_batch():
+        progress.emails += len(db.insert_parsed_emails(batch, user_ids))
+        progress.elapsed_seconds = time.perf_counter() - start
+        batch.clear()
+        if on_progress:
+            on_progress(progress)
+
+    for email in generator.emails():
+        batch.append(email)
+        if len(batch) >= WRITE_BATCH_SIZE:
+            write_batch()
+    write_batch()
+
+    return progress
@@ -0,0 +1,94 @@
+import re
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+
+
+MIGRATIONS_DIRECTORY = "db/migrations"
+
+# migration files are named like '0001_initial_schema.sql'
+MIGRATION_FILENAME_PATTERN = re.compile(r"^(\d+)_([a-zA-Z0-9_]+)\.sql$")
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    filepath: Path
+
+    def read_script(self) -> str:
+        with open(self.filepath, "r") as f:
+            return f.read()
+
+
+def load_migrations(directory: str = MIGRATIONS_DIRECTORY) -> list[Migration]:
+    """Returns the migrations found in the directory ordered by their version."""
+    migrations: list[Migration] = []
+
+    for path in Path(directory).glob("*.sql"):
+        match = MIGRATION_FILENAME_PATTERN.match(path.name)
+        if match is None:
+            raise ValueError(f"Migration file '{path}' doesn't follow the '<version>_<name>.sql' naming.")
+        migrations.append(Migration(int(match.group(1)), match.group(2), path))
+
+    migrations.sort(key=lambda m: m.version)
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in '{directory}': {versions}")
+
+    return migrations
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Returns the schema version of the database (0 if it has never been migrated)."""
+    row = conn.execute("""
+        SELECT 1
+        FROM sqlite_master
+        WHERE type = 'table' AND name = 'schema_version'
+    """).fetchone()
+
+    if row is None:
+        return 0
+
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def pending_migrations(conn: sqlite3.Connection, migrations: list[Migration]) -> list[Migration]:
+    version = current_version(conn)
+    return [m for m in migrations if m.version > version]
+
+
+def apply_migration(conn: sqlite3.Connection, migration: Migration):
+    """Applies a single migration and records it, all in one transaction."""
+    script = "\n".join([
+        "BEGIN;",
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        migration.read_script(),
+        f"INSERT INTO schema_version(version, name) VALUES ({migration.version}, '{migration.name}');",
+        "COMMIT;",
+    ])
+
+    try:
+        conn.executescript(script)
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def apply_migrations(conn: sqlite3.Connection, directory: str = MIGRATIONS_DIRECTORY) -> list[Migration]:
+    """Brings the database schema up to date. Returns the migrations that were applied."""
+    pending = pending_migrations(conn, load_migrations(directory))
+
+    for migration in pending:
+        apply_migration(conn, migration)
+
+    return pending
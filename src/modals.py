@@ -1,8 +1,9 @@
-from tkinter import Misc, Widget, Toplevel, Tk, Wm, ttk, font
+from tkinter import Misc, Widget, Toplevel, Tk, Wm, filedialog, ttk, font
 import tkinter as tk
 from typing import Dict
 from lib.utils import get_hierarchy_string
 from preferences import FontBuilder
+from database import Database
 
 
 MODAL_DEBUG_STYLE = False
@@ -187,3 +188,96 @@ class ModalSendNonValidEmail(CustomModal):
 
 
     
+
+
+class ModalQueryProfile(CustomModal):
+    """Report of the query profiler: timings, row counts and query plans of the database reads."""
+
+    COLUMNS = ("calls", "rows", "p50_ms", "p95_ms", "max_ms", "full_scans")
+
+    def __init__(self, parent: Tk | Toplevel):
+        super().__init__(parent, "Query Profile")
+        self.resizable(True, True)
+
+        font_mono = FontBuilder().mono().size("normal").weight("normal").buildTk()
+
+        self.status_var = tk.StringVar()
+        ttk.Label(self.message_frame, textvariable=self.status_var, anchor="w").pack(fill="x", padx=10, pady=(0, 4))
+
+        self.tree = ttk.Treeview(self.message_frame, columns=self.COLUMNS, height=12)
+        self.tree.heading("#0", text="query")
+        self.tree.column("#0", width=260)
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=80, anchor="e")
+        self.tree.pack(fill="both", expand=True, padx=10, pady=4)
+
+        self.plan_text = tk.Text(self.message_frame, height=12, wrap="none", font=font_mono, state="disabled")
+        self.plan_text.pack(fill="both", expand=True, padx=10, pady=4)
+
+        self.tree.bind("<<TreeviewSelect>>", lambda _: self._show_selected_plans())
+
+        self.toggle_button = ttk.Button(self.action_frame, command=self._toggle_profiling)
+        self.toggle_button.pack(side="left", padx=(10, 2), pady=10)
+        ttk.Button(self.action_frame, text="Refresh", command=self.refresh).pack(side="left", padx=2, pady=10)
+        ttk.Button(self.action_frame, text="Reset", command=self._reset).pack(side="left", padx=2, pady=10)
+        ttk.Button(self.action_frame, text="Dump JSON", command=self._dump_json).pack(side="left", padx=2, pady=10)
+        ttk.Button(self.action_frame, text="OK", command=self.close).pack(side="right", padx=10, pady=10)
+
+        self.reports: Dict[str, dict] = {}
+        self.refresh()
+        self.finalize()
+
+    def refresh(self):
+        profiler = Database().profiler
+
+        self.toggle_button.configure(text="Disable Profiling" if profiler else "Enable Profiling")
+        self.status_var.set("Profiling the database reads." if profiler else "Profiling is disabled.")
+
+        self.tree.delete(*self.tree.get_children())
+        self.reports = {}
+        if profiler is None:
+            return
+
+        for report in profiler.report():
+            values = [report[c] if c != "full_scans" else len(report[c]) for c in self.COLUMNS]
+            item_id = self.tree.insert("", "end", text=report["name"], values=values)
+            self.reports[item_id] = report
+
+    def _show_selected_plans(self):
+        selection = self.tree.selection()
+        report = self.reports.get(selection[0]) if selection else None
+
+        lines: list[str] = []
+        for p in report["plans"] if report else []:
+            lines.append(" ".join(p["sql"].split()))
+            lines.extend("    " + step for step in p["plan"])
+            lines.append("")
+
+        self.plan_text.configure(state="normal")
+        self.plan_text.delete("1.0", "end")
+        self.plan_text.insert("end", "\n".join(lines))
+        self.plan_text.configure(state="disabled")
+
+    def _toggle_profiling(self):
+        db = Database()
+        if db.profiler:
+            db.disable_profiling()
+        else:
+            db.enable_profiling()
+        self.refresh()
+
+    def _reset(self):
+        profiler = Database().profiler
+        if profiler:
+            profiler.reset()
+        self.refresh()
+
+    def _dump_json(self):
+        profiler = Database().profiler
+        if profiler is None:
+            return
+
+        filepath = filedialog.asksaveasfilename(parent=self, defaultextension=".json", initialfile="query_profile.json")
+        if filepath:
+            profiler.dump_json(filepath)
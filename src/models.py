@@ -4,6 +4,9 @@ from dataclasses import dataclass
 
 
 class DatabaseModel():
+    # no __dict__ for the slotted models deriving from it
+    __slots__ = ()
+
     # static methods wont be added to __annotations__ of derived classes
     @staticmethod
     def get_field_count(model: Type["DatabaseModel"]):
@@ -26,7 +29,17 @@ class EmailStatus(StrEnum):
         raise ValueError(f"Invalid status: {value}. Must be one of {list(cls)}")
 
 
-@dataclass
+class Folder(StrEnum):
+    """Folders listed by the email list views (values match the category list items)."""
+    INBOX = "inbox"
+    DRAFTS = "drafts"
+    SENT = "sent_mail"
+    ALL = "all_mail"
+
+
+# the rows are slotted (no per-instance __dict__), see row_factory for building them.
+# Users are frozen, the identity map shares one instance between all the views.
+@dataclass(slots=True, frozen=True)
 class UserModel(DatabaseModel):
     user_id: int
     email: str
@@ -35,23 +48,58 @@ class UserModel(DatabaseModel):
     created_at: str
 
 
-@dataclass
+@dataclass(slots=True)
 class EmailModel(DatabaseModel):
+    """Row of the email table, the body is in email_body (see Database.fetch_email_body)."""
     email_id: int
     sender_id: int
     subject: str 
-    body: str 
     status: EmailStatus
     sent_at: str
+    thread_id: Optional[int]
+    in_reply_to: Optional[int]  # email_id of the replied email
+    snippet: str
+
+
+@dataclass(slots=True)
+class EmailSummary(DatabaseModel):
+    """Email without its body, what the list views show (see database.EMAIL_SUMMARY_COLUMNS)."""
+    email_id: int
+    sender_id: int
+    subject: str
+    snippet: str  # start of the body, computed when the body is written
+    status: EmailStatus
+    sent_at: str
+    thread_id: Optional[int]
+    in_reply_to: Optional[int]
+
+
+@dataclass(slots=True)
+class ThreadModel(DatabaseModel):
+    """Conversation, its count and latest message are kept by triggers (migration 0009)."""
+    thread_id: int
+    subject_key: Optional[str]
+    email_count: int
+    last_email_id: int
+    last_sent_at: str
+
+
+@dataclass(slots=True)
+class ArchiveModel(DatabaseModel):
+    """Per-year file the old emails were moved into (see Database.archive_emails_before)."""
+    year: int
+    filename: str  # relative to the directory of the main database
+    email_count: int
+    archived_at: str
 
 
-@dataclass
+@dataclass(slots=True)
 class EmailRecipientModel(DatabaseModel):
     email_id: int
     recepient_id: int 
 
 
-@dataclass
+@dataclass(slots=True)
 class AttachmentModel(DatabaseModel):
     attachment_id: int
     filename: str
@@ -60,9 +108,56 @@ class AttachmentModel(DatabaseModel):
     create_at: str
 
 
-@dataclass
+@dataclass(slots=True)
+class AttachmentMeta(DatabaseModel):
+    """Attachment without its data (size is the data length in bytes)."""
+    attachment_id: int
+    filename: str
+    filepath: str
+    size: int
+    created_at: str
+
+
+class ChangeOp(StrEnum):
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+@dataclass(slots=True)
+class ChangeModel(DatabaseModel):
+    """Row of the changelog (row_id is an email id, a user id for the user table or a thread id for the thread table)."""
+    seq: int
+    table_name: str
+    op: ChangeOp
+    row_id: int
+
+
+@dataclass(slots=True)
 class EmailAttachmentModel:
     email_id: int
     attachment_id: int
 
 
+
+
+@dataclass(slots=True)
+class ParsedAttachment:
+    """Attachment of an imported message (sha256 of the data is computed by the parser)."""
+    filename: str
+    sha256: str
+    data: bytes
+
+
+@dataclass(slots=True)
+class ParsedEmail:
+    """Message parsed by the importer, not yet in the database (users are referenced by address)."""
+    sender_email: str
+    sender_first_name: Optional[str]
+    sender_last_name: Optional[str]
+    recipient_emails: list[str]
+    subject: str
+    body: str
+    sent_at: str
+    attachments: list[ParsedAttachment]
+    status: EmailStatus = EmailStatus.SENT
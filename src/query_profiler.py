@@ -0,0 +1,190 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+
+# latencies kept per query for the percentiles (the oldest are dropped)
+MAX_SAMPLES_PER_QUERY = 1000
+
+# a plan step reading every row of a table, not through an index or a virtual table (FTS)
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (?!CONSTANT ROW|\()(?!.*\b(?:USING|VIRTUAL TABLE)\b)(\S+)")
+
+# a plan step sorting the rows instead of reading them in index order
+TEMP_SORT_PATTERN = re.compile(r"^USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY|LAST TERM OF ORDER BY)")
+
+
+class FullTableScanError(Exception):
+    """Raised by a strict profiler when a query's plan scans a whole table."""
+
+
+def full_scans_of(plan: Iterable[str]) -> list[str]:
+    """Plan steps of the EXPLAIN QUERY PLAN output that scan a whole table."""
+    return [step for step in plan if FULL_SCAN_PATTERN.match(step)]
+
+
+def temp_sorts_of(plan: Iterable[str]) -> list[str]:
+    """Plan steps of the EXPLAIN QUERY PLAN output that sort the rows in a temporary b-tree."""
+    return [step for step in plan if TEMP_SORT_PATTERN.match(step)]
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+@dataclass
+class QueryStats:
+    name: str
+    calls: int = 0
+    rows: int = 0
+    max_ms: float = 0.0
+    samples_ms: deque = field(default_factory=lambda: deque(maxlen=MAX_SAMPLES_PER_QUERY))
+    # SQL -> its EXPLAIN QUERY PLAN steps, captured on the first run of every distinct statement
+    plans: dict[str, list[str]] = field(default_factory=dict)
+
+    def report(self) -> dict[str, Any]:
+        samples = sorted(self.samples_ms)
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "rows": self.rows,
+            "p50_ms": round(percentile(samples, 0.50), 3),
+            "p95_ms": round(percentile(samples, 0.95), 3),
+            "max_ms": round(self.max_ms, 3),
+            "plans": [{"sql": sql, "plan": plan} for sql, plan in self.plans.items()],
+            "full_scans": sorted({s for plan in self.plans.values() for s in full_scans_of(plan)}),
+            "temp_sorts": sorted({s for plan in self.plans.values() for s in temp_sorts_of(plan)}),
+        }
+
+
+class QueryProfiler:
+    """
+    Collects the latency, the row count and the query plan of the named queries.
+    Database feeds it through ProfiledCursor when profiling is enabled.
+
+    A strict profiler raises FullTableScanError when a query (not listed in
+    allow_full_scan) is planned as a full table scan, so a missing index fails loudly.
+    """
+
+    strict: bool
+    allow_full_scan: set[str]
+    stats: dict[str, QueryStats]
+
+    def __init__(self, strict: bool = False, allow_full_scan: Iterable[str] = ()):
+        self.strict = strict
+        self.allow_full_scan = set(allow_full_scan)
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def needs_plan(self, name: str, sql: str) -> bool:
+        with self._lock:
+            stats = self.stats.get(name)
+            return stats is None or sql not in stats.plans
+
+    def record(self, name: str, sql: str, elapsed_ms: float, rows: int, plan: Optional[list[str]] = None):
+        with self._lock:
+            stats = self.stats.setdefault(name, QueryStats(name))
+            stats.calls += 1
+            stats.rows += rows
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.samples_ms.append(elapsed_ms)
+            if plan is not None:
+                stats.plans[sql] = plan
+
+        if plan is not None and self.strict and name not in self.allow_full_scan:
+            scans = full_scans_of(plan)
+            if scans:
+                raise FullTableScanError(f"Query '{name}' scans a whole table ({'; '.join(scans)}):\n{sql.strip()}")
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def report(self) -> list[dict[str, Any]]:
+        """Stats of every query, the slowest (p95) first."""
+        with self._lock:
+            reports = [s.report() for s in self.stats.values()]
+        return sorted(reports, key=lambda r: r["p95_ms"], reverse=True)
+
+    def dump_json(self, filepath: str):
+        with open(filepath, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, params: Any = ()) -> list[str]:
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[3] for row in rows]
+
+
+class ProfiledCursor:
+    """
+    Cursor wrapper timing each statement from execute until its rows are fetched.
+    A statement is recorded when the next one starts or when the cursor is finished.
+    """
+
+    def __init__(self, cursor: sqlite3.Cursor, profiler: QueryProfiler, name: str):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._name = name
+        self._sql: Optional[str] = None
+        self._params: Any = ()
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def execute(self, sql: str, params: Any = ()):
+        self.finish()
+
+        self._sql, self._params = sql, params
+        start = time.perf_counter()
+        self._cursor.execute(sql, params)
+        self._elapsed = time.perf_counter() - start
+        return self
+
+    def _timed_fetch(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        self._elapsed += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._timed_fetch(self._cursor.fetchone)
+        self._rows += row is not None
+        return row
+
+    def fetchmany(self, size: int = 1):
+        rows = self._timed_fetch(self._cursor.fetchmany, size)
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        while (row := self.fetchone()) is not None:
+            yield row
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+    def finish(self):
+        if self._sql is None:
+            return
+
+        sql, params = self._sql, self._params
+        elapsed_ms, rows = self._elapsed * 1000, self._rows
+        self._sql, self._params, self._elapsed, self._rows = None, (), 0.0, 0
+
+        plan = None
+        if self._profiler.needs_plan(self._name, sql):
+            plan = explain_query_plan(self._cursor.connection, sql, params)
+
+        self._profiler.record(self._name, sql, elapsed_ms, rows, plan)
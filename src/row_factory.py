@@ -0,0 +1,71 @@
+"""
+Row factories building the models straight from the sqlite3 rows.
+
+    with self._reader(row_factory=rows_of(UserModel, EmailModel)) as cursor:
+        cursor.execute("SELECT u.*, e.* ...")
+        pairs = cursor.fetchall()  # [(UserModel, EmailModel), ...]
+
+The columns are mapped to the models once per statement (when its
+cursor.description is first seen), each row is then split by precomputed slices.
+"""
+
+import sqlite3
+from dataclasses import fields
+from functools import cache
+from typing import Any, Callable, Optional
+
+
+class ModelRowFactory:
+    """cursor.row_factory returning a model per row, or a tuple of models for joined rows ('u.*, e.*')."""
+
+    models: tuple[type, ...]
+    column_count: int
+
+    def __init__(self, *models: type):
+        if not models:
+            raise ValueError("A row factory needs at least one model")
+
+        self.models = models
+        field_counts = [len(fields(m)) for m in models]
+        self.column_count = sum(field_counts)
+        self._build = self._builder(models, field_counts)
+        # description of the last statement checked, every row of a statement shares it
+        self._checked_description: Optional[tuple] = None
+
+    @staticmethod
+    def _builder(models: tuple[type, ...], field_counts: list[int]) -> Callable[[tuple], Any]:
+        if len(models) == 1:
+            model = models[0]
+            return lambda row: model(*row)
+
+        if len(models) == 2:
+            first, second = models
+            split = field_counts[0]
+            return lambda row: (first(*row[:split]), second(*row[split:]))
+
+        slices = []
+        start = 0
+        for count in field_counts:
+            slices.append(slice(start, start + count))
+            start += count
+        parts = list(zip(models, slices))
+        return lambda row: tuple(model(*row[s]) for model, s in parts)
+
+    def __call__(self, cursor: sqlite3.Cursor, row: tuple) -> Any:
+        description = cursor.description
+        if description is not self._checked_description:
+            self._check(description)
+        return self._build(row)
+
+    def _check(self, description: tuple):
+        if len(description) != self.column_count:
+            names = " + ".join(m.__name__ for m in self.models)
+            columns = ", ".join(d[0] for d in description)
+            raise ValueError(f"{names} have {self.column_count} fields, the statement returns {len(description)} columns ({columns})")
+        self._checked_description = description
+
+
+@cache
+def rows_of(*models: type) -> ModelRowFactory:
+    """Shared row factory of the models (one per combination)."""
+    return ModelRowFactory(*models)
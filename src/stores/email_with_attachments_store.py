@@ -31,6 +31,7 @@ class ActionEnum(StrEnum):
 
 class EventNames(StrEnum):
     EDITING_EMAIL_SET = "email_with_attachments_store.editing_email_id#set"
+    REPLYING_TO_EMAIL_SET = "email_with_attachments_store.replying_to_email_id#set"
     EMAIL_SET = "email_with_attachments_store.email#set"
     ATTACHMENTS_SET = "email_with_attachments_store.attachments#set"
     VALIDATION_SET = "email_with_attachments_store.validation#set"
@@ -38,6 +39,7 @@ class EventNames(StrEnum):
 
     EDITING_EMAIL_CLEARED = \
         "email_with_attachments_store.editinig_email_id#cleared"
+    REPLYING_TO_EMAIL_CLEARED = "email_with_attachments_store.replying_to_email_id#cleared"
     EMAIL_CLEARED = "email_with_attachments_store.email#cleared"
     ATTACHMENTS_CLEARED = "email_with_attachments_store.attachments#cleared"
     VALIDATION_CLEARED = "email_with_attachments_store.validation#cleared"
@@ -49,6 +51,7 @@ class EmailWithAttachmentsStore(Singleton):
     # email: Optional[EmailModel]
     # attachments: list[AttachmentModel]
     editing_email_id: Optional[int]
+    replying_to_email_id: Optional[int]  # the composed email replies to it (joins its thread)
     email_state: Optional[EmailState]
     attachments_state: Optional[AttachmentsState]
     validation_state: ValidationState
@@ -56,6 +59,7 @@ class EmailWithAttachmentsStore(Singleton):
     
     def __init__(self):
         self.editing_email_id = None
+        self.replying_to_email_id = None
         self.email_state = None
         self.attachments_state = None 
         self.validation_state = ValidationState(True, [])
@@ -73,6 +77,10 @@ class EmailWithAttachmentsStore(Singleton):
         self.editing_email_id = None
         eb.bus.publish(EventNames.EDITING_EMAIL_CLEARED)
 
+    def clear_replying_to_email_id(self):
+        self.replying_to_email_id = None
+        eb.bus.publish(EventNames.REPLYING_TO_EMAIL_CLEARED)
+
     def clear_validation(self):
         self.validation_state = ValidationState(True, [])
         eb.bus.publish(EventNames.VALIDATION_CLEARED)
@@ -81,6 +89,7 @@ class EmailWithAttachmentsStore(Singleton):
         self.clear_email()
         self.clear_attachments()
         self.clear_editing_email_id()
+        self.clear_replying_to_email_id()
         self.clear_validation()
 
     def set_action(self, action: ActionEnum):
@@ -95,6 +104,12 @@ class EmailWithAttachmentsStore(Singleton):
             "editing_email_id": self.editing_email_id
         })
 
+    def set_replying_to_email_id(self, id: int):
+        self.replying_to_email_id = id
+        eb.bus.publish(EventNames.REPLYING_TO_EMAIL_SET, data={
+            "replying_to_email_id": self.replying_to_email_id
+        })
+
     def set_attachments(self, attchs: AttachmentsState):
         self.attachments_state = attchs
         eb.bus.publish(EventNames.ATTACHMENTS_SET, data={ 
@@ -128,6 +143,7 @@ class EmailWithAttachmentsStore(Singleton):
         return {
             "is_editing_email": self.editing_email_id is not None,
             "editing_email_id": self.editing_email_id,
+            "replying_to_email_id": self.replying_to_email_id,
             "email": self.email_state,
             "attachments": self.attachments_state,
             "validation": self.validation_state,
@@ -0,0 +1,38 @@
+"""
+The tests run against a scratch database: the database module opens it on import,
+so its file is set before anything from src/ is imported.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the schema scripts and the migrations are found relative to the project root
+os.chdir(ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import debug  # noqa: E402
+
+os.environ[debug.DATABASE_FILE_ENV] = os.path.join(tempfile.mkdtemp(prefix="email-client-tests-"), "scratch.db")
+
+
+@pytest.fixture(scope="session")
+def db():
+    """The scratch database with the benchmark mailbox."""
+    import benchmarks
+    from database import Database
+
+    db = Database()
+    benchmarks.seed_benchmark_mailbox(db, 2000)
+    return db
+
+
+@pytest.fixture
+def me(db):
+    user = db.fetch_user_by_email(debug.DEFAULT_LOGGED_IN_EMAIL)
+    assert user
+    return user
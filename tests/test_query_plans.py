@@ -0,0 +1,31 @@
+"""The plan regression suite of 'dev.py check-plans' (see benchmarks.PLAN_CASES)."""
+
+import pytest
+
+from benchmarks import FULL_SCAN_QUERIES, PLAN_CASES
+from database import Database
+from query_profiler import full_scans_of, temp_sorts_of
+
+
+def test_every_fetch_method_has_a_plan_case():
+    fetches = {name for name in dir(Database) if name.startswith("fetch_")}
+    assert fetches - {case.query for case in PLAN_CASES} == set()
+
+
+@pytest.mark.parametrize("case", PLAN_CASES, ids=lambda case: case.query)
+def test_plan(db, me, case):
+    profiler = db.enable_profiling()
+    try:
+        # the identity map would serve the user lookups without a query
+        db.users.clear()
+        case.run(db, me)
+    finally:
+        db.disable_profiling()
+
+    stats = profiler.stats.get(case.query)
+    assert stats is not None, f"{case.query} ran no query"
+    for sql, plan in stats.plans.items():
+        if case.query not in FULL_SCAN_QUERIES:
+            assert full_scans_of(plan) == [], sql
+        if not case.may_sort:
+            assert temp_sorts_of(plan) == [], sql
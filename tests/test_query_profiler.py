@@ -0,0 +1,33 @@
+"""The strict mode of the query profiler ('dev.py profile --strict')."""
+
+import pytest
+
+from benchmarks import FULL_SCAN_QUERIES, run_hot_queries
+from query_profiler import FullTableScanError
+
+
+@pytest.fixture
+def strict_profiler(db):
+    profiler = db.enable_profiling(strict=True, allow_full_scan=FULL_SCAN_QUERIES)
+    yield profiler
+    db.disable_profiling()
+
+
+def test_hot_queries_scan_no_table(db, strict_profiler):
+    run_hot_queries(db)
+
+    assert strict_profiler.stats
+    assert all(not report["full_scans"] for report in strict_profiler.report())
+
+
+def test_full_scan_fails(db, strict_profiler):
+    strict_profiler.allow_full_scan.discard("fetch_all_users")
+
+    with pytest.raises(FullTableScanError, match="fetch_all_users"):
+        db.fetch_all_users()
+
+
+def test_allowed_full_scan_is_recorded(db, strict_profiler):
+    db.fetch_all_users()
+
+    assert strict_profiler.stats["fetch_all_users"].calls == 1